@@ -1,9 +1,7 @@
 
 from typing import Dict, Any
 
-from utils.text_cleaning import clean_text
-from utils.sentence_parser import segment_sections
-from nlp.metadata import extract_metadata
+from analyzer.executor import run_analysis
 
 def build_analysis(full_text: str) -> Dict[str, Any]:
     """
@@ -18,25 +16,16 @@ def build_analysis(full_text: str) -> Dict[str, Any]:
     Returns:
         Un diccionario que contiene el análisis estructurado.
     """
-    # 1. Limpieza inicial del texto
-    cleaned_text = clean_text(full_text)
-    
-    # 2. Segmentación de secciones del documento
-    sections = segment_sections(cleaned_text)
-    
-    # 3. Extracción de metadatos de las secciones
-    # Se extraen los metadatos de la sección de "consideraciones"
-    # y de la sección de "actuacion_procesal_relevante" ya que pueden contener información
-    # relevante para los metadatos.
-    all_metadata = {}
-    for section_name, section_text in sections.items():
-        extracted_metadata = extract_metadata(section_text)
-        all_metadata.update(extracted_metadata)
+    # 1-3. Limpieza, segmentación y metadatos: el ejecutor de etapas calcula cada
+    # artefacto una sola vez y no ejecuta las etapas de spaCy, que aquí no se piden.
+    # extract_metadata examina primero la portada y el bloque de firmas, y solo
+    # recurre al resto del documento para los campos que no encontró.
+    analisis = run_analysis(full_text, fields=("segment", "metadata"))
     
     # 4. Complementar la segmentación con los metadatos
     result = {
-        "metadata": all_metadata,
-        "secciones": sections
+        "metadata": analisis["metadatos"],
+        "secciones": analisis["secciones"]
     }
     
-    return result
\ No newline at end of file
+    return result
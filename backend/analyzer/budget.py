@@ -0,0 +1,191 @@
+import time
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from utils.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+# Niveles de degradación, de menor a mayor. Cada nivel incluye las omisiones del anterior.
+NIVEL_COMPLETO = 0
+NIVEL_SIN_SPACY = 1               # se omiten las etapas que ejecutan spaCy
+NIVEL_SECCIONES_RECORTADAS = 2    # además, las reglas se aplican a secciones recortadas
+NIVEL_SOLO_METADATOS = 3          # solo se extraen los metadatos
+
+NOMBRES_NIVELES = ("completo", "sin_spacy", "secciones_recortadas", "solo_metadatos")
+
+SPACY_STAGES = frozenset({"entities", "hechos"})
+
+# Etapas omitidas en cada nivel ('clean', 'document' y 'metadata' siempre se ejecutan)
+_OMITIDAS = {
+    NIVEL_COMPLETO: frozenset(),
+    NIVEL_SIN_SPACY: SPACY_STAGES,
+    NIVEL_SECCIONES_RECORTADAS: SPACY_STAGES,
+    NIVEL_SOLO_METADATOS: frozenset({"segment", "entities", "hechos", "normas", "fallo", "classification",
+                                     "resolution", "sentence_class"}),
+}
+
+# Separador entre el inicio y el final de un texto recortado
+_CORTE = "\n[…]\n"
+
+
+class AnalysisBudget:
+    """
+    Presupuesto de un documento: tiempo total, tiempo por etapa, páginas y caracteres.
+
+    El presupuesto no interrumpe una etapa en curso (una búsqueda de re o una llamada a
+    spaCy no se pueden detener desde Python); se revisa entre páginas durante la
+    extracción y entre etapas durante el análisis. Cuando se agota, el análisis se
+    degrada paso a paso en lugar de seguir:
+
+      1. sin_spacy: se omiten entities y hechos.
+      2. secciones_recortadas: normas y fallo reciben secciones de a lo sumo
+         'max_caracteres_seccion' caracteres (así los patrones con DOTALL tienen un
+         costo acotado).
+      3. solo_metadatos: solo se extraen los metadatos (de un texto recortado a
+         'max_caracteres', conservando la portada y el bloque de firmas).
+
+    Un documento con más de 'max_caracteres_spacy' o 'max_caracteres' caracteres
+    empieza directamente en el nivel correspondiente. Si una etapa supera su tiempo
+    ('segundos_etapa') se sube un nivel; si se agota 'segundos_documento', se pasa a
+    solo_metadatos. report() indica el nivel, las etapas omitidas y los motivos.
+    """
+
+    def __init__(self, segundos_documento: Optional[float] = None,
+                 segundos_etapa: Optional[Dict[str, float]] = None,
+                 max_paginas: Optional[int] = None,
+                 max_caracteres_spacy: Optional[int] = None,
+                 max_caracteres_seccion: Optional[int] = None,
+                 max_caracteres: Optional[int] = None):
+        self.segundos_documento = segundos_documento
+        self.segundos_etapa = dict(segundos_etapa or {})
+        self.max_paginas = max_paginas
+        self.max_caracteres_spacy = max_caracteres_spacy
+        self.max_caracteres_seccion = max_caracteres_seccion
+        self.max_caracteres = max_caracteres
+
+        self.inicio = time.monotonic()
+        self.nivel = NIVEL_COMPLETO
+        self.motivos: List[str] = []
+        self.omitidas: List[str] = []
+        self.tiempos: Dict[str, float] = {}
+        self.paginas_leidas = 0
+        self.extraccion_truncada = False
+
+    @classmethod
+    def from_config(cls) -> Optional["AnalysisBudget"]:
+        """Presupuesto según 'config.json' (sección 'budgets'); None si está desactivado."""
+        config = get_section("budgets")
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            segundos_documento=config.get("segundos_documento"),
+            segundos_etapa=config.get("segundos_etapa"),
+            max_paginas=config.get("max_paginas"),
+            max_caracteres_spacy=config.get("max_caracteres_spacy"),
+            max_caracteres_seccion=config.get("max_caracteres_seccion"),
+            max_caracteres=config.get("max_caracteres"),
+        )
+
+    # --- Estado ---
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.inicio
+
+    def degrade(self, nivel: int, motivo: str):
+        """Sube al nivel indicado (nunca baja) y registra el motivo."""
+        if nivel <= self.nivel:
+            return
+        self.nivel = min(nivel, NIVEL_SOLO_METADATOS)
+        self.motivos.append(motivo)
+        logger.warning(f"⏱️ Presupuesto: {motivo} → {NOMBRES_NIVELES[self.nivel]}")
+
+    def _deadline_passed(self) -> bool:
+        return self.segundos_documento is not None and self.elapsed() > self.segundos_documento
+
+    # --- Extracción ---
+
+    def limit_pages(self, pages: Iterable[Any]) -> Iterator[Any]:
+        """
+        Deja pasar páginas mientras haya presupuesto de páginas y de tiempo de
+        extracción; después cierra el lector y marca la extracción como truncada.
+        """
+        limite_tiempo = self.segundos_etapa.get("extraccion")
+        iterador = iter(pages)
+        try:
+            for page in iterador:
+                if self.max_paginas is not None and self.paginas_leidas >= self.max_paginas:
+                    self._truncate(f"más de {self.max_paginas} páginas")
+                    return
+                if limite_tiempo is not None and self.elapsed() > limite_tiempo:
+                    self._truncate(f"extracción de más de {limite_tiempo:g}s")
+                    return
+                self.paginas_leidas += 1
+                yield page
+        finally:
+            self.tiempos["extraccion"] = round(self.elapsed(), 3)
+            cerrar = getattr(iterador, "close", None)
+            if cerrar:
+                cerrar()
+
+    def _truncate(self, motivo: str):
+        self.extraccion_truncada = True
+        self.motivos.append(f"extracción truncada en la página {self.paginas_leidas}: {motivo}")
+        logger.warning(f"⏱️ Presupuesto: {self.motivos[-1]}")
+
+    # --- Análisis ---
+
+    def check_text(self, caracteres: int):
+        """Nivel inicial según el tamaño del texto."""
+        if self.max_caracteres is not None and caracteres > self.max_caracteres:
+            self.degrade(NIVEL_SOLO_METADATOS, f"{caracteres} caracteres (máximo {self.max_caracteres})")
+        elif self.max_caracteres_spacy is not None and caracteres > self.max_caracteres_spacy:
+            self.degrade(NIVEL_SIN_SPACY, f"{caracteres} caracteres (máximo para spaCy {self.max_caracteres_spacy})")
+
+    def allows(self, stage: str) -> bool:
+        """Indica si una etapa se ejecuta; si no, la registra como omitida."""
+        if self._deadline_passed():
+            self.degrade(NIVEL_SOLO_METADATOS, f"documento de más de {self.segundos_documento:g}s")
+        if stage in _OMITIDAS[self.nivel]:
+            if stage not in self.omitidas:
+                self.omitidas.append(stage)
+            return False
+        return True
+
+    def record(self, stage: str, segundos: float):
+        """Registra la duración de una etapa; si superó su presupuesto, se sube un nivel."""
+        self.tiempos[stage] = round(segundos, 3)
+        limite = self.segundos_etapa.get(stage)
+        if limite is not None and segundos > limite:
+            self.degrade(self.nivel + 1, f"etapa '{stage}' de {segundos:.1f}s (máximo {limite:g}s)")
+
+    def cap_sections(self, secciones: Dict[str, str]) -> Dict[str, str]:
+        """Secciones recortadas a 'max_caracteres_seccion' (desde el nivel secciones_recortadas)."""
+        if self.nivel < NIVEL_SECCIONES_RECORTADAS or self.max_caracteres_seccion is None:
+            return secciones
+        return {clave: _cap(texto, self.max_caracteres_seccion) for clave, texto in secciones.items()}
+
+    def cap_text(self, texto: str) -> str:
+        """Texto recortado a 'max_caracteres' (en el nivel solo_metadatos)."""
+        if self.nivel < NIVEL_SOLO_METADATOS or self.max_caracteres is None:
+            return texto
+        return _cap(texto, self.max_caracteres)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "nivel": NOMBRES_NIVELES[self.nivel],
+            "etapas_omitidas": list(self.omitidas),
+            "motivos": list(self.motivos),
+            "paginas_leidas": self.paginas_leidas,
+            "extraccion_truncada": self.extraccion_truncada,
+            "segundos": round(self.elapsed(), 3),
+            "segundos_por_etapa": dict(self.tiempos),
+        }
+
+
+def _cap(texto: str, limite: int) -> str:
+    """Conserva el inicio y el final del texto (la portada y el bloque de firmas/resolutivo)."""
+    if len(texto) <= limite:
+        return texto
+    mitad = max((limite - len(_CORTE)) // 2, 0)
+    return texto[:mitad] + _CORTE + texto[len(texto) - mitad:]
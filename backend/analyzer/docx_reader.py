@@ -0,0 +1,101 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, List
+
+from analyzer.extractor import PageText
+
+# Espacio de nombres de WordprocessingML (word/document.xml)
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_TEXT = _W + "t"
+_TAB = _W + "tab"
+_BREAK = _W + "br"
+_CARRIAGE_RETURN = _W + "cr"
+_PARAGRAPH = _W + "p"
+_BODY = _W + "body"
+_PAGE_BREAK_BEFORE = _W + "pageBreakBefore"
+_LAST_RENDERED_PAGE_BREAK = _W + "lastRenderedPageBreak"
+_TYPE_ATTR = _W + "type"
+_VAL_ATTR = _W + "val"
+# Valores de una propiedad booleana (ST_OnOff) que la desactivan; sin w:val, está activada
+_OFF_VALUES = frozenset({"0", "false", "off"})
+
+
+def iter_docx_pages(file_path: str) -> Iterator[PageText]:
+    """
+    Recorre un documento de Word (.docx) página a página, con la misma forma que
+    analyzer.extractor.iter_pdf_pages.
+
+    'word/document.xml' se lee del zip con iterparse: cada párrafo se procesa a medida
+    que se analiza y los elementos ya leídos se descartan, así que la memoria no depende
+    del tamaño del documento (solo de la página en curso). Los saltos de página son los
+    explícitos (<w:br w:type="page"/>, pageBreakBefore) y los que Word guardó al
+    paginar el documento (lastRenderedPageBreak). Los encabezados y pies de página de
+    Word están en otras partes del zip y no se incluyen.
+
+    Args:
+        file_path: Ruta del archivo .docx.
+
+    Yields:
+        PageText por cada página con texto.
+    """
+    numero = 1
+    offset = 0
+    lineas: List[str] = []   # párrafos de la página en curso
+    partes: List[str] = []   # fragmentos de texto del párrafo en curso
+
+    def cerrar_pagina():
+        nonlocal numero, offset, lineas, partes
+        if partes:
+            lineas.append("".join(partes))
+            partes = []
+        texto = "\n".join(lineas).strip()
+        lineas = []
+        if not texto:
+            return None
+        pagina = PageText(numero, offset, texto)
+        numero += 1
+        offset += len(texto) + 1
+        return pagina
+
+    with zipfile.ZipFile(file_path) as docx, docx.open("word/document.xml") as xml:
+        body = None
+        profundidad = 0
+        for evento, elem in ET.iterparse(xml, events=("start", "end")):
+            if evento == "start":
+                profundidad += 1
+                if elem.tag == _BODY:
+                    body = elem
+                elif elem.tag == _LAST_RENDERED_PAGE_BREAK or (
+                        elem.tag == _PAGE_BREAK_BEFORE and elem.get(_VAL_ATTR, "true").lower() not in _OFF_VALUES):
+                    pagina = cerrar_pagina()
+                    if pagina:
+                        yield pagina
+                continue
+
+            profundidad -= 1
+            tag = elem.tag
+            if tag == _TEXT:
+                partes.append(elem.text or "")
+            elif tag == _TAB:
+                partes.append("\t")
+            elif tag == _CARRIAGE_RETURN:
+                partes.append("\n")
+            elif tag == _BREAK:
+                if elem.get(_TYPE_ATTR) == "page":
+                    pagina = cerrar_pagina()
+                    if pagina:
+                        yield pagina
+                else:
+                    partes.append("\n")
+            elif tag == _PARAGRAPH:
+                lineas.append("".join(partes))
+                partes = []
+
+            # Al cerrar un bloque de primer nivel (párrafo, tabla...) se descarta su árbol
+            if profundidad == 2 and body is not None:
+                body.clear()
+
+    pagina = cerrar_pagina()
+    if pagina:
+        yield pagina
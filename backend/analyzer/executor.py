@@ -0,0 +1,390 @@
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from analyzer.budget import AnalysisBudget
+from utils.text_cleaning import clean_text
+from utils.document import SentenciaDocument
+from utils.rules import CompiledRules, get_rules
+from nlp.tiers import AnalysisTier, get_tier
+from utils.sentence_parser import segment_sections
+
+# Secciones a las que se aplica cada análisis específico (igual que el pipeline histórico).
+SECCIONES_HECHOS = ("hechos", "actuacion_procesal_relevante")
+SECCIONES_NORMAS = ("consideraciones",)
+SECCIONES_FALLO = ("fallo",)
+
+
+class Stage(NamedTuple):
+    """Una etapa del análisis: el artefacto que produce a partir de sus entradas."""
+    name: str
+    inputs: Tuple[str, ...]
+    func: Callable[..., Any]
+
+
+# --- Funciones de las etapas ---
+# Los módulos que cargan spaCy se importan dentro de la etapa que los usa, para que
+# una petición que no los necesita (p. ej. solo metadatos) nunca cargue el modelo.
+
+def _stage_clean(texto: str) -> str:
+    return clean_text(texto)
+
+def _stage_document(texto_limpio: str) -> SentenciaDocument:
+    return SentenciaDocument(texto_limpio)
+
+def _stage_segment(documento: SentenciaDocument, reglas: CompiledRules) -> Dict[str, str]:
+    secciones = segment_sections(documento, reglas)
+    for key in reglas.nombres_secciones: # las secciones esperadas, en el orden de 'rules.json'
+        if key not in secciones:
+            secciones[key] = ""
+    return secciones
+
+def _stage_section_documents(secciones: Dict[str, str]) -> Dict[str, SentenciaDocument]:
+    # Un documento por sección: sus vistas (minúsculas, espacios colapsados) se calculan
+    # una vez y las comparten todas las etapas por sección
+    return {clave: SentenciaDocument(texto) for clave, texto in secciones.items()}
+
+def _stage_metadata(texto_limpio: str) -> Dict[str, Any]:
+    from nlp.metadata import extract_metadata
+    return extract_metadata(texto_limpio)
+
+# Las etapas por sección se definen para una sola sección: la etapa completa las aplica
+# a todas, y AnalysisRun.stream las ejecuta de a una sección para emitir resultados
+# parciales.
+
+def _section_entities(documento: SentenciaDocument, reglas: CompiledRules, nivel: AnalysisTier) -> Dict[str, List[str]]:
+    from models.nlp_analyzer import extract_entities
+    return extract_entities(documento, reglas, nivel)
+
+def _section_hechos(documento: SentenciaDocument, reglas: CompiledRules, nivel: AnalysisTier) -> List[str]:
+    from models.section_analyzer import analyze_hechos
+    return analyze_hechos(documento, reglas, nivel)
+
+def _section_normas(documento: SentenciaDocument, reglas: CompiledRules, nivel: AnalysisTier) -> List[str]:
+    from nlp.normas import extract_normas
+    return extract_normas(documento, reglas)
+
+def _section_fallo(documento: SentenciaDocument, reglas: CompiledRules, nivel: AnalysisTier) -> Dict[str, Any]:
+    from models.section_analyzer import analyze_fallo
+    return analyze_fallo(documento, reglas)
+
+
+class SectionStage(NamedTuple):
+    """Una etapa que se calcula sección por sección."""
+    name: str
+    salida: str                            # clave del resultado en 'analisis' de cada sección
+    secciones: Optional[Tuple[str, ...]]   # secciones a las que se aplica (None: todas)
+    func: Callable[[SentenciaDocument, CompiledRules, AnalysisTier], Any]
+
+    def applies_to(self, seccion: str) -> bool:
+        return self.secciones is None or seccion in self.secciones
+
+
+SECTION_STAGES: Dict[str, SectionStage] = {
+    stage.name: stage for stage in [
+        SectionStage("entities", "entidades", None, _section_entities),
+        SectionStage("hechos", "hechos_relevantes", SECCIONES_HECHOS, _section_hechos),
+        SectionStage("normas", "normas_detectadas", SECCIONES_NORMAS, _section_normas),
+        SectionStage("fallo", "resumen_fallo", SECCIONES_FALLO, _section_fallo),
+    ]
+}
+
+
+def _all_sections(etapa: SectionStage) -> Callable[..., Dict[str, Any]]:
+    def func(documentos: Dict[str, SentenciaDocument], reglas: CompiledRules, nivel: AnalysisTier) -> Dict[str, Any]:
+        claves = documentos if etapa.secciones is None else [clave for clave in etapa.secciones if clave in documentos]
+        return {clave: etapa.func(documentos[clave], reglas, nivel) for clave in claves}
+    return func
+
+def _stage_classification(documento: SentenciaDocument, reglas: CompiledRules) -> str:
+    from analyzer.dispatcher import detect_sentence_type
+    return detect_sentence_type(documento, reglas)
+
+def _stage_sentence_class(texto_limpio: str) -> Dict[str, Any]:
+    from models.sentence_classifier import get_classifier
+    modelo = get_classifier()
+    return modelo.classify([texto_limpio])[0] if modelo is not None else {}
+
+def _stage_resolution(entidades: Dict[str, Dict[str, List[str]]], metadatos: Dict[str, Any],
+                      reglas: CompiledRules) -> Dict[str, List[Dict[str, Any]]]:
+    from nlp.entity_resolution import resolve_entities
+    return resolve_entities(entidades, metadatos, reglas)
+
+
+STAGES: Dict[str, Stage] = {
+    stage.name: stage for stage in [
+        Stage("clean", ("texto",), _stage_clean),
+        Stage("document", ("clean",), _stage_document),
+        Stage("segment", ("document", "reglas"), _stage_segment),
+        Stage("section_documents", ("segment",), _stage_section_documents),
+        Stage("metadata", ("clean",), _stage_metadata),
+        Stage("classification", ("document", "reglas"), _stage_classification),
+        Stage("sentence_class", ("clean",), _stage_sentence_class),
+        Stage("resolution", ("entities", "metadata", "reglas"), _stage_resolution),
+    ] + [
+        Stage(etapa.name, ("section_documents", "reglas", "nivel"), _all_sections(etapa)) for etapa in SECTION_STAGES.values()
+    ]
+}
+
+
+def _section_inputs(name: str) -> Set[str]:
+    """Etapas por sección de las que depende (directa o indirectamente) una etapa de documento."""
+    if name in SECTION_STAGES:
+        return {name}
+    if name not in STAGES:
+        return set()
+    return {entrada for dependencia in STAGES[name].inputs for entrada in _section_inputs(dependencia)}
+
+
+# Artefacto de las etapas omitidas por el presupuesto (por defecto, un diccionario vacío)
+_SKIPPED_ARTIFACTS: Dict[str, Any] = {"classification": None}
+
+# Campos que produce build_analysis por defecto (la salida de main.py, de la cola, de la
+# carpeta vigilada y de los lotes). 'classification' da 'tipo_sentencia', que usa
+# corpus.analytics
+DEFAULT_FIELDS: Tuple[str, ...] = ("segment", "metadata", "classification", "entities", "hechos", "normas", "fallo",
+                                  "resolution", "sentence_class")
+
+
+class AnalysisRun:
+    """
+    Ejecución del grafo de etapas sobre un documento.
+
+    Cada artefacto se calcula como máximo una vez y queda memorizado en la instancia:
+    pedir 'hechos' y luego 'normas' reutiliza la misma segmentación.
+
+    Las reglas vigentes (utils.rules.get_rules) se toman al crear la ejecución y son
+    una entrada más del grafo ('reglas'): aunque el archivo de reglas se recargue a
+    mitad del análisis, todas las etapas de un documento usan el mismo conjunto. El
+    nivel de análisis (nlp.tiers: modelo de spaCy y componentes) es otra entrada,
+    'nivel', que solo leen las etapas que usan spaCy.
+
+    Con un presupuesto (analyzer.budget.AnalysisBudget), antes de cada etapa se
+    consulta si se ejecuta y después se registra su duración; las etapas omitidas
+    producen un artefacto vacío y no aparecen en to_result.
+    """
+
+    def __init__(self, texto: str, reglas: Optional[CompiledRules] = None, budget: Optional[AnalysisBudget] = None,
+                 tier: Optional[AnalysisTier] = None):
+        self.artifacts: Dict[str, Any] = {"texto": texto, "reglas": reglas or get_rules(), "nivel": tier or get_tier()}
+        self.budget = budget
+        self.skipped: List[str] = []
+        if budget is not None:
+            budget.check_text(len(texto))
+
+    @property
+    def rules_version(self) -> str:
+        """Versión de las reglas usadas (para claves de caché de resultados)."""
+        return self.artifacts["reglas"].version
+
+    @classmethod
+    def from_clean_text(cls, texto_limpio: str, budget: Optional[AnalysisBudget] = None,
+                        tier: Optional[AnalysisTier] = None) -> "AnalysisRun":
+        """Crea una ejecución a partir de texto ya limpio (p. ej. del almacén del corpus)."""
+        run = cls(texto_limpio, budget=budget, tier=tier)
+        run.artifacts["clean"] = texto_limpio
+        return run
+
+    def get(self, name: str) -> Any:
+        """
+        Retorna un artefacto, ejecutando antes (una sola vez) las etapas de las que depende.
+
+        Args:
+            name: Nombre de la etapa (ver STAGES), 'texto', 'reglas' o 'nivel'.
+
+        Returns:
+            El artefacto producido por la etapa.
+        """
+        if name in self.artifacts:
+            return self.artifacts[name]
+        if name not in STAGES:
+            raise KeyError(f"Etapa de análisis desconocida: {name}")
+
+        stage = STAGES[name]
+        if self.budget is None:
+            args = [self.get(dependencia) for dependencia in stage.inputs]
+            self.artifacts[name] = stage.func(*args)
+            return self.artifacts[name]
+
+        if not self.budget.allows(name):
+            self.skipped.append(name)
+            self.artifacts[name] = _SKIPPED_ARTIFACTS.get(name, {})
+            return self.artifacts[name]
+        args = [self._budgeted_input(dependencia) for dependencia in stage.inputs]
+        inicio = time.monotonic()
+        self.artifacts[name] = stage.func(*args)
+        self.budget.record(name, time.monotonic() - inicio)
+        return self.artifacts[name]
+
+    def _budgeted_input(self, name: str) -> Any:
+        """Entrada de una etapa recortada según el nivel de degradación del presupuesto."""
+        valor = self.get(name)
+        if name == "segment":
+            return self.budget.cap_sections(valor)
+        if name == "section_documents":
+            # Si el nivel subió después de crear los documentos, las secciones que ahora
+            # se recortan se vuelven a envolver; las demás conservan sus vistas
+            secciones = self.budget.cap_sections(self.artifacts["segment"])
+            return {clave: documento if documento.raw == secciones[clave] else SentenciaDocument(secciones[clave])
+                    for clave, documento in valor.items()}
+        if name == "clean":
+            return self.budget.cap_text(valor)
+        return valor
+
+    def compute(self, fields: Iterable[str]) -> "AnalysisRun":
+        """Calcula los campos pedidos (y solo sus dependencias)."""
+        for field in fields:
+            self.get(field)
+        return self
+
+    def stream(self, fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Calcula los campos pedidos emitiendo resultados parciales a medida que están
+        listos, para que un cliente no espere al análisis completo:
+
+          1. {"evento": "metadatos", ...}: 'secciones', 'metadatos', 'tipo_sentencia' y
+             'clase_providencia' (las etapas baratas de documento) y 'orden', las secciones en el orden
+             en que se emitirán.
+          2. {"evento": "seccion", "seccion": ..., "analisis": {...}} por cada sección,
+             de la más corta a la más larga (el costo de spaCy crece con el texto): las
+             etapas por sección pedidas se ejecutan para una sección antes de pasar a
+             la siguiente.
+          3. {"evento": "fin", ...}: 'nivel_analisis', 'presupuesto' y 'segundos', y
+             las etapas de documento que dependen de las de sección (p. ej.
+             'entidades_resueltas'), que se calculan al terminar las secciones.
+
+        Con presupuesto, cada etapa se consulta antes de cada sección: si el documento
+        se degrada a mitad, las secciones restantes se emiten sin esa etapa. Al terminar,
+        to_result() retorna el análisis completo, igual que después de compute().
+        """
+        inicio = time.monotonic()
+        fields = list(dict.fromkeys(fields))
+        posteriores = [field for field in fields if field not in SECTION_STAGES and _section_inputs(field)]
+        necesarias = fields + [entrada for field in posteriores for entrada in sorted(_section_inputs(field))]
+        por_seccion = [SECTION_STAGES[field] for field in dict.fromkeys(necesarias) if field in SECTION_STAGES]
+        self.compute(field for field in fields if field not in SECTION_STAGES and field not in posteriores)
+        documentos: Dict[str, SentenciaDocument] = {}
+        if por_seccion:
+            documentos = (self.get("section_documents") if self.budget is None
+                          else self._budgeted_input("section_documents"))
+        orden = sorted(documentos, key=lambda clave: len(documentos[clave]))
+        cabecera = {clave: valor for clave, valor in self.to_result().items()
+                    if clave in ("secciones", "metadatos", "tipo_sentencia", "clase_providencia")}
+        yield {"evento": "metadatos", **cabecera, "orden": orden if por_seccion else []}
+
+        calculadas = {etapa.name for etapa in por_seccion if etapa.name in self.artifacts}
+        for etapa in por_seccion:
+            self.artifacts.setdefault(etapa.name, {})
+        tiempos = {etapa.name: 0.0 for etapa in por_seccion}
+        ejecutadas: Set[str] = set()
+        denegadas: Set[str] = set()
+        registradas: Set[str] = set()
+        for clave in orden if por_seccion else []:
+            analisis: Dict[str, Any] = {}
+            for etapa in por_seccion:
+                if not etapa.applies_to(clave):
+                    continue
+                if etapa.name in calculadas:
+                    if clave in self.artifacts[etapa.name]:
+                        analisis[etapa.salida] = self.artifacts[etapa.name][clave]
+                    continue
+                if self.budget is not None and not self.budget.allows(etapa.name):
+                    denegadas.add(etapa.name)
+                    continue
+                comienzo = time.monotonic()
+                valor = etapa.func(documentos[clave], self.artifacts["reglas"], self.artifacts["nivel"])
+                tiempos[etapa.name] += time.monotonic() - comienzo
+                ejecutadas.add(etapa.name)
+                self.artifacts[etapa.name][clave] = analisis[etapa.salida] = valor
+                limite = self.budget.segundos_etapa.get(etapa.name) if self.budget is not None else None
+                if limite is not None and tiempos[etapa.name] > limite and etapa.name not in registradas:
+                    # Se registra una sola vez: record() sube un nivel en cada llamada excedida
+                    self.budget.record(etapa.name, tiempos[etapa.name])
+                    registradas.add(etapa.name)
+            yield {"evento": "seccion", "seccion": clave, "analisis": analisis}
+
+        for etapa in por_seccion:
+            if etapa.name in calculadas:
+                continue
+            if etapa.name in denegadas and etapa.name not in ejecutadas:
+                self.skipped.append(etapa.name)
+            elif self.budget is not None and etapa.name not in registradas:
+                self.budget.record(etapa.name, tiempos[etapa.name])
+
+        self.compute(posteriores)
+        fin: Dict[str, Any] = {"evento": "fin"}
+        if posteriores:
+            fin.update({clave: valor for clave, valor in self.to_result().items() if clave == "entidades_resueltas"})
+        if ejecutadas or calculadas:
+            fin["nivel_analisis"] = self.artifacts["nivel"].nombre
+        if self.budget is not None:
+            fin["presupuesto"] = self.budget.report()
+        fin["segundos"] = round(time.monotonic() - inicio, 3)
+        yield fin
+
+    def to_result(self) -> Dict[str, Any]:
+        """
+        Ensambla los artefactos ya calculados con la forma de salida de build_analysis:
+        'secciones', 'analisis' (por sección), 'metadatos', 'tipo_sentencia',
+        'clase_providencia' (si hay un clasificador entrenado) y 'entidades_resueltas'.
+        Solo se incluyen las partes que se calcularon.
+        """
+        resultado: Dict[str, Any] = {}
+        if self._computed("segment"):
+            resultado["secciones"] = self.artifacts["segment"]
+
+        partes = [(etapa.name, etapa.salida) for etapa in SECTION_STAGES.values()]
+        if any(self._computed(etapa) for etapa, _ in partes):
+            analisis: Dict[str, Dict[str, Any]] = {
+                clave: {} for clave in self.artifacts.get("segment", {})
+            }
+            for etapa, clave_salida in partes:
+                for seccion, valor in self.artifacts.get(etapa, {}).items():
+                    analisis.setdefault(seccion, {})[clave_salida] = valor
+            resultado["analisis"] = {seccion: datos for seccion, datos in analisis.items() if datos}
+        if self._computed("entities") or self._computed("hechos"):
+            resultado["nivel_analisis"] = self.artifacts["nivel"].nombre
+
+        if self._computed("metadata"):
+            resultado["metadatos"] = self.artifacts["metadata"]
+        if self._computed("classification"):
+            resultado["tipo_sentencia"] = self.artifacts["classification"]
+        if self._computed("sentence_class") and self.artifacts["sentence_class"]:
+            resultado["clase_providencia"] = self.artifacts["sentence_class"]
+        if self._computed("resolution"):
+            resultado["entidades_resueltas"] = self.artifacts["resolution"]
+        if self.budget is not None:
+            resultado["presupuesto"] = self.budget.report()
+        return resultado
+
+    def _computed(self, name: str) -> bool:
+        return name in self.artifacts and name not in self.skipped
+
+
+def run_analysis(text: str, fields: Optional[Iterable[str]] = None,
+                 budget: Optional[AnalysisBudget] = None, tier: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Punto de entrada único del análisis de una sentencia.
+
+    Args:
+        text: El texto completo de la sentencia.
+        fields: Etapas cuyo resultado se necesita (p. ej. ["metadata", "normas"]).
+                Las etapas que no se piden ni son dependencia de otra no se ejecutan.
+                Por defecto, DEFAULT_FIELDS.
+        budget: Presupuesto de tiempo y tamaño del documento (analyzer.budget); sin
+                presupuesto, todas las etapas pedidas se ejecutan completas.
+        tier: Nombre del nivel de análisis (sección 'tiers' de config.json) para las
+              etapas que usan spaCy; por defecto, 'tiers.default'.
+
+    Returns:
+        Un diccionario con el análisis estructurado (ver AnalysisRun.to_result).
+    """
+    return AnalysisRun(text, budget=budget, tier=get_tier(tier)).compute(fields or DEFAULT_FIELDS).to_result()
+
+
+def stream_analysis(text: str, fields: Optional[Iterable[str]] = None,
+                    budget: Optional[AnalysisBudget] = None, tier: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Como run_analysis, pero emite resultados parciales: primero los metadatos y luego
+    el análisis de cada sección, de la más barata a la más cara (ver AnalysisRun.stream).
+    """
+    return AnalysisRun(text, budget=budget, tier=get_tier(tier)).stream(fields or DEFAULT_FIELDS)
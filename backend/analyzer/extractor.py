@@ -1,107 +1,289 @@
-import pdfplumber
+import os
 import re # Necesario para normalize_text y otros patrones si se usan internamente
-import spacy # Necesario si analyze_text usa spacy y se carga aquí
-from typing import List, Dict, Union
+import logging
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Any, List, Dict, Union, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
 
-# --- Cargar el modelo de SpaCy una sola vez (si analyze_text depende de él y no se carga globalmente) ---
-# Si nlp_analyzer.py carga y expone el modelo, esta parte no sería necesaria aquí.
-try:
-    nlp = spacy.load("es_core_news_md")
-except OSError:
-    print("Descargando el modelo 'es_core_news_md' de SpaCy. Esto solo sucederá una vez.")
-    spacy.cli.download("es_core_news_md")
-    nlp = spacy.load("es_core_news_md")
+from pdfminer.pdfparser import PDFSyntaxError
 
-from utils.sentence_parser import segment_sections, SECTION_PATTERNS 
-from models.nlp_analyzer import extract_entities as analyze_text
-from models.section_analyzer import extract_normas, analyze_hechos, analyze_fallo
-from nlp.metadata import extract_metadata
+from analyzer.budget import AnalysisBudget
+from analyzer.executor import DEFAULT_FIELDS, run_analysis
+from analyzer.pdf_backends import PageReader, get_backend, open_pages
+from utils.document import collapse_whitespace
+from utils.page_boilerplate import strip_repeated_page_lines
+from utils.rules import get_rules
+from utils.settings import get_section
+from utils.text_cleaning import clean_text
+
+logger = logging.getLogger(__name__)
+
+
+class PageText(NamedTuple):
+    """Una página del documento: número (desde 1), desplazamiento en el texto completo y texto."""
+    numero: int
+    offset: int
+    texto: str
 
 
 def normalize_text(text: str) -> str:
     """Normaliza el texto: espacios, elimina caracteres no deseados."""
-    text = re.sub(r"\s+", " ", text.strip())
+    text = collapse_whitespace(text)
     text = re.sub(r"[^\w\sÁÉÍÓÚáéíóúñÑ.,-]", "", text)
     return text
 
-# Necesaria para filtrar entidades en extract_entities/analyze_text
-IGNORED_ENTITY_TERMS = {
-    "cui", "ley", "sentencia", "norma", "artículo", "folio", "número interno",
-    "segunda instancia", "registro", "sala", "instancia", "providencia",
-    "documento", "magistrado", "magistrada", "corte", "tribunal", "fiscalía",
-    "departamento", "gobernación", "ministro", "ministerio", "proceso",
-    "código", "general", "penal", "justicia", "administración", "república",
-    "colombia", "judicial", "actuación", "derecho", "principios", "artículos",
-    "incisos", "parágrafo", "ley estatutaria", "parte"
-}
 def is_valid_entity(ent_text: str) -> bool:
-    """Valida si una entidad extraída es relevante o debe ser ignorada."""
+    """Valida si una entidad extraída es relevante o debe ser ignorada ('rules.json', sección 'entidades')."""
+    rules = get_rules()
     norm = normalize_text(ent_text).lower()
-    if len(norm) < 4 or norm.isdigit():
+    if len(norm) < rules.entidades_longitud_minima or norm.isdigit():
         return False
-    if norm in IGNORED_ENTITY_TERMS:
+    if norm in rules.entidades_ignorar:
         return False
-    if re.match(r"^(ap\d{4,6}|[a-z]{2,4}\d{5,})$", norm):
+    if rules.entidades_codigos.match(norm):
         return False
     return True
 
 
-def extract_text_from_pdf(file_path: str) -> str:
+def iter_pdf_pages(file_path: str, backend: Optional[str] = None) -> Iterator[PageText]:
+    """
+    Recorre las páginas de un PDF a medida que se extraen.
+
+    El desplazamiento de cada página es su posición en el texto que resulta de unir
+    las páginas con saltos de línea (las páginas sin texto se omiten).
+
+    Args:
+        file_path: Ruta del PDF.
+        backend: 'pdfplumber', 'pdfminer' o 'auto' (ver analyzer.pdf_backends);
+                 por defecto, el de config.json.
+    """
+    offset = 0
+    for numero, text in enumerate(get_backend(backend)(file_path), start=1):
+        if text:
+            yield PageText(numero, offset, text)
+            offset += len(text) + 1
+
+
+def join_pages(pages: Iterable[PageText]) -> str:
+    """
+    Une las páginas en el texto del documento, eliminando antes los encabezados y pies
+    de página repetidos (ver utils.page_boilerplate) para que no lleguen a la segmentación
+    ni a spaCy.
+    """
+    textos, eliminados = strip_repeated_page_lines([page.texto for page in pages])
+    full_text = "\n".join(textos).strip()
+    if eliminados:
+        total = len(full_text) + eliminados
+        logger.info(f"🧹 Encabezados/pies de página repetidos: {eliminados} caracteres eliminados "
+                    f"({100 * eliminados / total:.1f}% del texto)")
+    return full_text
+
+
+def _limited(pages: Iterator[PageText], budget: Optional[AnalysisBudget]) -> Iterable[PageText]:
+    return pages if budget is None else budget.limit_pages(pages)
+
+
+def extract_text_from_pdf(file_path: str, backend: Optional[str] = None,
+                          budget: Optional[AnalysisBudget] = None) -> str:
     """
     Extrae texto de un archivo PDF de manera robusta.
     Maneja excepciones para archivos no encontrados o corruptos.
+    Con un presupuesto, la extracción se detiene al agotar sus páginas o su tiempo.
     """
-    full_text = ""
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    full_text += text + "\n"
+        return join_pages(_limited(iter_pdf_pages(file_path, backend), budget))
     except FileNotFoundError:
         print(f"Error: El archivo PDF no fue encontrado en la ruta: {file_path}")
         return ""
-    except pdfplumber.PDFSyntaxError as e:
+    except PDFSyntaxError as e:
         print(f"Error de sintaxis en el PDF: {e}. El archivo podría estar corrupto o no ser un PDF válido.")
         return ""
     except Exception as e:
         print(f"Ocurrió un error inesperado al extraer texto del PDF: {e}")
         return ""
-    return full_text.strip()
 
 
-def build_analysis(text: str) -> dict:
+# Formatos de entrada admitidos y su lector de páginas
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+
+def iter_document_pages(file_path: str) -> Iterator[PageText]:
+    """Recorre las páginas de un PDF o de un documento de Word según su extensión."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".docx":
+        from analyzer.docx_reader import iter_docx_pages
+        return iter_docx_pages(file_path)
+    if extension == ".pdf":
+        return iter_pdf_pages(file_path)
+    raise ValueError(f"Formato no soportado: {extension} (se admiten {', '.join(SUPPORTED_EXTENSIONS)})")
+
+
+def extract_text_from_document(file_path: str, budget: Optional[AnalysisBudget] = None) -> str:
+    """
+    Extrae el texto de una sentencia en PDF o DOCX, con el mismo tratamiento de páginas
+    (eliminación de encabezados repetidos) y del presupuesto en ambos casos.
+    """
+    if file_path.lower().endswith(".pdf"):
+        return extract_text_from_pdf(file_path, budget=budget)
+    try:
+        return join_pages(_limited(iter_document_pages(file_path), budget))
+    except FileNotFoundError:
+        print(f"Error: El archivo no fue encontrado en la ruta: {file_path}")
+        return ""
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        print(f"Error: El documento de Word no es válido o está corrupto: {e}")
+        return ""
+
+
+# --- Extracción guiada por los campos pedidos ---
+# Los metadatos (CUI, número interno, fecha, ponente, sala) están en la portada y en el
+# bloque de firmas, y el fallo al final del documento: para esos campos no hace falta
+# extraer todas las páginas.
+#
+#   - metadata: las primeras 'paginas_inicio' y las últimas 'paginas_final' páginas
+#     (sección 'pdf' de config.json); si falta algún campo, se leen más páginas desde
+#     ambos extremos hacia el centro, en tandas que se duplican, hasta
+#     'max_paginas_metadatos' (un campo que no está en la portada ni en las firmas casi
+#     nunca aparece en medio del expediente).
+#   - fallo: desde la última página hacia atrás, hasta la que contiene el encabezado
+#     'RESUELVE:' (el patrón de la sección 'fallo' en 'rules.json'), más la anterior,
+#     donde suele empezar la frase que lo introduce ("LA CORTE ... RESUELVE").
+#
+# Cualquier otro campo (segmentación, entidades, normas…) necesita el documento completo.
+PARTIAL_FIELDS = frozenset({"metadata", "fallo"})
+
+# Separador entre páginas leídas no contiguas (el mismo de los textos recortados por el presupuesto)
+_SALTO_PAGINAS = "\n[…]\n"
+
+
+def _read_pages(lector: PageReader, indices: Iterable[int], leidas: Dict[int, str],
+                budget: Optional[AnalysisBudget]) -> bool:
+    """Lee las páginas indicadas (desde 0) que falten; False si el presupuesto cortó la extracción."""
+    pendientes = (PageText(i + 1, 0, lector.text(i)) for i in indices if i + 1 not in leidas)
+    for pagina in _limited(pendientes, budget):
+        leidas[pagina.numero] = pagina.texto
+    return budget is None or not budget.extraccion_truncada
+
+
+def join_read_pages(leidas: Dict[int, str]) -> str:
+    """
+    Une las páginas leídas en orden, sin los encabezados y pies repetidos; entre páginas
+    no contiguas queda el separador '[…]'.
+    """
+    numeros = [numero for numero in sorted(leidas) if leidas[numero]]
+    textos, _ = strip_repeated_page_lines([leidas[numero] for numero in numeros])
+    partes: List[str] = []
+    for i, (numero, texto) in enumerate(zip(numeros, textos)):
+        if i:
+            partes.append("\n" if numero == numeros[i - 1] + 1 else _SALTO_PAGINAS)
+        partes.append(texto)
+    return "".join(partes).strip()
+
+
+def _seek_fallo(lector: PageReader, leidas: Dict[int, str], budget: Optional[AnalysisBudget]):
+    """Lee desde el final hacia atrás hasta la página con el encabezado del fallo."""
+    patron = dict(get_rules().secciones).get("fallo")
+    for indice in reversed(range(len(lector))):
+        if not _read_pages(lector, [indice], leidas, budget):
+            return
+        if patron is None or patron.search(clean_text(leidas[indice + 1]).lower()):
+            if indice > 0:
+                _read_pages(lector, [indice - 1], leidas, budget)
+            return
+
+
+def _complete_metadata(lector: PageReader, leidas: Dict[int, str], budget: Optional[AnalysisBudget],
+                       inicio: int, final: int, maximo: int, requeridos: Optional[List[str]]):
+    """
+    Lee portada y firmas y, mientras falte alguno de los campos 'requeridos' (ver
+    nlp.metadata.missing_fields), más páginas hacia el centro.
+    """
+    from nlp.metadata import extract_metadata, missing_fields
+
+    total = len(lector)
+    tanda = max(inicio + final, 1)
+    while True:
+        indices = list(range(min(inicio, total))) + list(range(max(total - final, 0), total))
+        if not _read_pages(lector, indices, leidas, budget):
+            return
+        if len(leidas) >= total or not missing_fields(extract_metadata(clean_text(join_read_pages(leidas))), requeridos):
+            return
+        # Cada tanda duplica la anterior, repartida entre ambos extremos, sin pasar de 'maximo'
+        crecimiento = min(tanda, maximo - inicio - final)
+        if crecimiento <= 0:
+            return
+        inicio, final, tanda = inicio + (crecimiento + 1) // 2, final + crecimiento // 2, tanda * 2
+
+
+def extract_text_for_fields(file_path: str, fields: Optional[Sequence[str]] = None,
+                            budget: Optional[AnalysisBudget] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Extrae solo las páginas que necesitan los campos pedidos (ver arriba). Si algún
+    campo necesita el documento completo, o no es un PDF, equivale a
+    extract_text_from_document.
+
+    Args:
+        file_path: Ruta del documento.
+        fields: Etapas pedidas (ver analyzer.executor.STAGES); por defecto, DEFAULT_FIELDS.
+        budget: Presupuesto del documento; cuenta las páginas leídas igual que en la
+                extracción completa.
+
+    Returns:
+        (texto, páginas): 'páginas' es None si se extrajo el documento completo; si no,
+        {"leidas": [números de página, desde 1], "total": número de páginas del PDF}.
+    """
+    campos = set(fields or DEFAULT_FIELDS)
+    if not campos <= PARTIAL_FIELDS or not file_path.lower().endswith(".pdf"):
+        return extract_text_from_document(file_path, budget), None
+
+    config = get_section("pdf")
+    leidas: Dict[int, str] = {}
+    try:
+        with open_pages(file_path) as lector:
+            if "fallo" in campos:
+                _seek_fallo(lector, leidas, budget)
+            if "metadata" in campos:
+                _complete_metadata(lector, leidas, budget, int(config.get("paginas_inicio", 3)),
+                                   int(config.get("paginas_final", 2)), int(config.get("max_paginas_metadatos", 8)),
+                                   config.get("campos_metadatos"))
+            total = len(lector)
+    except FileNotFoundError:
+        print(f"Error: El archivo PDF no fue encontrado en la ruta: {file_path}")
+        return "", None
+    except PDFSyntaxError as e:
+        print(f"Error de sintaxis en el PDF: {e}. El archivo podría estar corrupto o no ser un PDF válido.")
+        return "", None
+    except Exception as e:
+        print(f"Ocurrió un error inesperado al extraer texto del PDF: {e}")
+        return "", None
+    logger.info(f"📄 {file_path}: {len(leidas)} de {total} páginas extraídas para {', '.join(sorted(campos))}")
+    return join_read_pages(leidas), {"leidas": sorted(leidas), "total": total}
+
+
+def mark_partial_result(resultado: Dict[str, Any], paginas: Dict[str, Any]):
+    """Anota en el resultado las páginas leídas y que sus metadatos salen solo de ellas."""
+    from nlp.metadata import mark_partial_pages
+
+    if "metadatos" in resultado:
+        mark_partial_pages(resultado["metadatos"])
+    resultado["paginas_extraidas"] = paginas
+
+
+def build_analysis(text: str, fields: Optional[Iterable[str]] = None,
+                   budget: Optional[AnalysisBudget] = None, tier: Optional[str] = None) -> dict:
     """
     Construye el análisis completo de la sentencia dividiéndola en secciones
     y aplicando análisis específicos a cada una.
+
+    Delega en el ejecutor de etapas (analyzer.executor), que calcula cada artefacto
+    una sola vez y solo ejecuta las etapas necesarias para los campos pedidos.
+
+    Args:
+        text: El texto completo de la sentencia.
+        fields: Etapas requeridas (ver analyzer.executor.STAGES); por defecto, todas
+                las de la salida histórica.
+        budget: Presupuesto del documento (ver analyzer.budget), el mismo que se usó
+                en la extracción.
+        tier: Nivel de análisis (sección 'tiers' de config.json); por defecto, 'tiers.default'.
     """
-    secciones = segment_sections(text)
-    
-    for key in SECTION_PATTERNS.keys(): # SECTION_PATTERNS define las secciones esperadas
-        if key not in secciones:
-            secciones[key] = ""
-
-    resultado = {
-        "secciones": secciones,
-        "analisis": {},
-        "metadatos": extract_metadata(text) # Viene de nlp.metadata
-    }
-
-    # Analizar cada sección
-    for clave, contenido in secciones.items():
-        analisis_seccion = {}
-        
-        
-        analisis_seccion["entidades"] = analyze_text(contenido)
-
-        # Aplicar análisis específicos por sección
-        if clave == "hechos" or clave == "actuacion_procesal_relevante":
-            analisis_seccion["hechos_relevantes"] = analyze_hechos(contenido) # Viene de models.section_analyzer
-        elif clave == "consideraciones":
-            analisis_seccion["normas_detectadas"] = extract_normas(contenido) # Viene de models.section_analyzer
-        elif clave == "fallo":
-            analisis_seccion["resumen_fallo"] = analyze_fallo(contenido) # Viene de models.section_analyzer
-        
-        resultado["analisis"][clave] = analisis_seccion
-
-    return resultado
\ No newline at end of file
+    return run_analysis(text, fields, budget, tier)
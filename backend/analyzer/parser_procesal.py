@@ -2,6 +2,7 @@ import re
 from typing import List, Dict, Union
 from models.nlp_analyzer import extract_entities # Usamos extract_entities para consistencia
 from nlp.normas import extract_normas # Asegúrate de que esta función está actualizada con el refactor
+from utils.document import collapse_whitespace
 
 def extract_tema_procesal(text: str) -> List[str]:
     """
@@ -22,7 +23,7 @@ def extract_tema_procesal(text: str) -> List[str]:
         matches = re.findall(patron, text, flags=re.IGNORECASE | re.DOTALL)
         for m in matches:
             # Limpiar y normalizar el texto encontrado para evitar duplicados por espacios/capitalización
-            cleaned_match = re.sub(r"\s+", " ", m).strip()
+            cleaned_match = collapse_whitespace(m)
             # Opcional: Filtrar coincidencias muy cortas o no significativas
             if len(cleaned_match) > 15 and cleaned_match.lower() not in ["motivo no identificado", "apelación"]:
                 temas_encontrados.append(cleaned_match)
@@ -0,0 +1,240 @@
+import io
+import abc
+import logging
+from typing import Callable, Dict, Iterator, Optional
+
+from utils.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+# Backends de extracción de texto de PDF. Cada uno recorre las páginas del documento y
+# produce el texto de cada una (cadena vacía si la página no tiene texto), de modo que
+# analyzer.extractor construye el mismo flujo de páginas sea cual sea el backend.
+#
+#   - pdfplumber: análisis de layout a nivel de carácter. Más lento, más fiel en
+#     documentos con tablas o columnas.
+#   - pdfminer:   conversión de solo texto de pdfminer.six con LAParams ajustados para
+#     sentencias nacidas digitales (una columna, texto horizontal).
+#   - auto:       pdfminer, salvo que la primera página con texto parezca mal
+#     decodificada; en ese caso se usa pdfplumber para todo el documento.
+
+PageIterator = Callable[[str], Iterator[str]]
+
+# Ajustes de layout para sentencias de una sola columna: sin detección de texto vertical
+# ni ordenamiento avanzado de cajas (boxes_flow=None), que es la parte más costosa.
+PDFMINER_LAPARAMS = {
+    "line_margin": 0.5,
+    "char_margin": 2.0,
+    "word_margin": 0.1,
+    "boxes_flow": None,
+    "detect_vertical": False,
+    "all_texts": False,
+}
+
+# Una página con menos caracteres que esto, o con glifos sin mapa Unicode ("(cid:NN)"),
+# se considera mal extraída por pdfminer en el modo 'auto'.
+AUTO_MIN_CHARS = 200
+AUTO_MAX_CID_RATIO = 0.01
+
+
+def iter_pages_pdfplumber(file_path: str) -> Iterator[str]:
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+
+
+def _pdfminer_page_text(page, recursos, laparams) -> str:
+    from pdfminer.converter import TextConverter
+    from pdfminer.pdfinterp import PDFPageInterpreter
+
+    salida = io.StringIO()
+    device = TextConverter(recursos, salida, laparams=laparams)
+    try:
+        PDFPageInterpreter(recursos, device).process_page(page)
+    finally:
+        device.close()
+    # TextConverter marca el fin de página con '\f'
+    return salida.getvalue().replace("\f", "").strip()
+
+
+def iter_pages_pdfminer(file_path: str) -> Iterator[str]:
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    laparams = LAParams(**PDFMINER_LAPARAMS)
+    recursos = PDFResourceManager(caching=True)
+    with open(file_path, "rb") as f:
+        for page in PDFPage.get_pages(f):
+            yield _pdfminer_page_text(page, recursos, laparams)
+
+
+def _looks_garbled(text: str) -> bool:
+    if len(text) < AUTO_MIN_CHARS:
+        return True
+    # Cada glifo sin mapa ocupa unos 8 caracteres: "(cid:123)"
+    return text.count("(cid:") * 8 > len(text) * AUTO_MAX_CID_RATIO
+
+
+def iter_pages_auto(file_path: str) -> Iterator[str]:
+    paginas = iter_pages_pdfminer(file_path)
+    pendientes = []
+    for texto in paginas:
+        pendientes.append(texto)
+        if texto.strip():
+            break
+    if not pendientes or _looks_garbled(pendientes[-1]):
+        logger.info(f"📄 {file_path}: extracción rápida insuficiente, se usa pdfplumber")
+        yield from iter_pages_pdfplumber(file_path)
+        return
+    yield from pendientes
+    yield from paginas
+
+
+BACKENDS: Dict[str, PageIterator] = {
+    "pdfplumber": iter_pages_pdfplumber,
+    "pdfminer": iter_pages_pdfminer,
+    "auto": iter_pages_auto,
+}
+
+
+# --- Acceso a páginas sueltas ---
+# Para extraer solo las páginas que necesitan los campos pedidos (analyzer.extractor.
+# extract_text_for_fields): abrir el documento solo recorre el árbol de páginas, y el
+# texto de cada página se extrae (una vez) cuando se pide.
+
+class PageReader(abc.ABC):
+    """Páginas de un PDF en cualquier orden; text(i) extrae y memoriza la página i (desde 0)."""
+
+    def __init__(self):
+        self._textos: Dict[int, str] = {}
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Número de páginas del documento."""
+
+    @abc.abstractmethod
+    def _extract(self, indice: int) -> str:
+        """Texto de la página 'indice' (desde 0), cadena vacía si no tiene texto."""
+
+    def text(self, indice: int) -> str:
+        if indice not in self._textos:
+            self._textos[indice] = self._extract(indice)
+        return self._textos[indice]
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "PageReader":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+
+class PdfminerPages(PageReader):
+    def __init__(self, file_path: str):
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        super().__init__()
+        self._archivo = open(file_path, "rb")
+        try:
+            self._paginas = list(PDFPage.create_pages(PDFDocument(PDFParser(self._archivo))))
+        except BaseException:
+            self._archivo.close()
+            raise
+        self._laparams = LAParams(**PDFMINER_LAPARAMS)
+        self._recursos = PDFResourceManager(caching=True)
+
+    def __len__(self) -> int:
+        return len(self._paginas)
+
+    def _extract(self, indice: int) -> str:
+        return _pdfminer_page_text(self._paginas[indice], self._recursos, self._laparams)
+
+    def close(self):
+        self._archivo.close()
+
+
+class PdfplumberPages(PageReader):
+    def __init__(self, file_path: str):
+        import pdfplumber
+
+        super().__init__()
+        self._pdf = pdfplumber.open(file_path)
+
+    def __len__(self) -> int:
+        return len(self._pdf.pages)
+
+    def _extract(self, indice: int) -> str:
+        page = self._pdf.pages[indice]
+        texto = page.extract_text() or ""
+        # Libera los objetos de layout de la página (no se vuelve a leer)
+        cerrar = getattr(page, "close", None)
+        if cerrar:
+            cerrar()
+        return texto
+
+    def close(self):
+        self._pdf.close()
+
+
+class AutoPages(PageReader):
+    """
+    Como iter_pages_auto: la primera página con texto decide el backend, aunque se
+    pidan primero otras páginas (p. ej. las últimas).
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__()
+        self._file_path = file_path
+        self._lector: PageReader = PdfminerPages(file_path)
+        indice = 0
+        while indice < len(self._lector) and not self._lector.text(indice).strip():
+            indice += 1
+        if indice == len(self._lector) or _looks_garbled(self._lector.text(indice)):
+            logger.info(f"📄 {file_path}: extracción rápida insuficiente, se usa pdfplumber")
+            self._lector.close()
+            self._lector = PdfplumberPages(file_path)
+
+    def __len__(self) -> int:
+        return len(self._lector)
+
+    def _extract(self, indice: int) -> str:
+        return self._lector.text(indice)
+
+    def close(self):
+        self._lector.close()
+
+
+PAGE_READERS: Dict[str, Callable[[str], PageReader]] = {
+    "pdfplumber": PdfplumberPages,
+    "pdfminer": PdfminerPages,
+    "auto": AutoPages,
+}
+
+
+def open_pages(file_path: str, name: Optional[str] = None) -> PageReader:
+    """Abre un PDF para leer páginas sueltas con el backend indicado (por defecto, el de config.json)."""
+    name = name or get_section("pdf").get("backend", "auto")
+    if name not in PAGE_READERS:
+        raise ValueError(f"Backend de PDF desconocido: {name} (opciones: {', '.join(PAGE_READERS)})")
+    return PAGE_READERS[name](file_path)
+
+
+def get_backend(name: Optional[str] = None) -> PageIterator:
+    """
+    Retorna el backend de extracción indicado o, por defecto, el de la sección 'pdf'
+    de config.json ('backend': 'auto' | 'pdfminer' | 'pdfplumber').
+    """
+    name = name or get_section("pdf").get("backend", "auto")
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de PDF desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
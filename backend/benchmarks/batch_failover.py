@@ -0,0 +1,95 @@
+"""
+Simula en una sola máquina un lote repartido entre varios nodos (service/batch.py) y
+mata uno de ellos a mitad de un shard.
+
+Cada "nodo" es un proceso con su propio worker_id; el análisis se reemplaza por una
+espera de --segundos por archivo para medir solo la coordinación. Al final se verifica
+que todos los archivos tengan exactamente un resultado, que todos los shards estén
+completados y cuántos análisis se repitieron al reclamar la reserva del nodo muerto.
+
+Uso (desde 'backend/'):
+    python benchmarks/batch_failover.py --nodos 4 --archivos 200 --lease 2
+"""
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from collections import Counter
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from service.batch import BatchCoordinator, create_batch
+
+_SEGUNDOS = 0.01
+_REGISTRO = ""
+
+
+def _analisis_simulado(archivo: str, opciones: dict) -> dict:
+    time.sleep(_SEGUNDOS)
+    # Una línea corta con O_APPEND es atómica: sirve para contar análisis repetidos
+    with open(_REGISTRO, "a", encoding="utf-8") as f:
+        f.write(archivo + "\n")
+    return {"archivo": archivo}
+
+
+def _nodo(lote_dir: str, nombre: str, lease: float, segundos: float, registro: str):
+    global _SEGUNDOS, _REGISTRO
+    _SEGUNDOS, _REGISTRO = segundos, registro
+    BatchCoordinator(lote_dir, lease_seconds=lease, poll_seconds=lease / 4).run_worker(nombre, _analisis_simulado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodos", type=int, default=4)
+    parser.add_argument("--archivos", type=int, default=200)
+    parser.add_argument("--shard-size", type=int, default=10)
+    parser.add_argument("--segundos", type=float, default=0.02, help="Duración simulada de cada análisis.")
+    parser.add_argument("--lease", type=float, default=2.0, help="Segundos de vencimiento de una reserva.")
+    parser.add_argument("--matar-en", type=float, default=0.5, help="Segundos antes de matar el primer nodo.")
+    args = parser.parse_args()
+
+    lote_dir = tempfile.mkdtemp(prefix="lote_")
+    registro = os.path.join(lote_dir, "analisis.log")
+    archivos = [os.path.join(lote_dir, f"sentencia_{i:05d}.pdf") for i in range(args.archivos)]
+    create_batch(lote_dir, archivos, args.shard_size)
+
+    inicio = time.time()
+    nodos = [
+        multiprocessing.Process(target=_nodo, args=(lote_dir, f"nodo-{i}", args.lease, args.segundos, registro))
+        for i in range(args.nodos)
+    ]
+    for nodo in nodos:
+        nodo.start()
+    time.sleep(args.matar_en)
+    os.kill(nodos[0].pid, signal.SIGKILL)
+    print(f"💀 nodo-0 muerto a los {args.matar_en}s")
+    for nodo in nodos:
+        nodo.join()
+    duracion = time.time() - inicio
+
+    coordinador = BatchCoordinator(lote_dir, lease_seconds=args.lease)
+    estado = coordinador.status()
+    with open(registro, "r", encoding="utf-8") as f:
+        analizados = Counter(linea.strip() for linea in f)
+
+    print(json.dumps({
+        "segundos": round(duracion, 2),
+        "ideal_segundos": round(args.archivos * args.segundos / max(args.nodos - 1, 1), 2),
+        "shards_completados": f"{estado['shards_completados']}/{estado['shards']}",
+        "resultados": estado["correctos"],
+        "sin_resultado": sum(1 for a in archivos if not os.path.exists(coordinador._result_path(a))),
+        "analisis_ejecutados": sum(analizados.values()),
+        "analisis_repetidos": sum(n - 1 for n in analizados.values() if n > 1),
+        "reservas_restantes": len(estado["reservas_activas"]) + len(estado["reservas_vencidas"]),
+    }, indent=2, ensure_ascii=False))
+    shutil.rmtree(lote_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compara la extracción completa con la extracción guiada por los campos pedidos
+(analyzer.extractor.extract_text_for_fields) para las peticiones de solo metadatos,
+solo fallo y ambos.
+
+Para cada PDF y petición se mide el tiempo de extracción + análisis de las dos formas,
+las páginas leídas y si el resultado coincide con el del texto completo:
+  - metadatos: los campos de portada y firma (sin 'referencias', que se citan en todo
+    el documento y con páginas parciales son un subconjunto, ni 'ubicacion_campos').
+  - fallo: el tipo de fallo y el resumen.
+
+Uso (desde 'backend/'):
+    python benchmarks/lazy_pages.py ../docs/*.pdf
+"""
+import os
+import sys
+import time
+import glob
+import argparse
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from analyzer.extractor import build_analysis, extract_text_for_fields, extract_text_from_document
+
+PETICIONES = {
+    "metadata": ["metadata"],
+    "fallo": ["fallo"],
+    "metadata+fallo": ["metadata", "fallo"],
+}
+
+
+def comparable(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    metadatos = {clave: valor for clave, valor in resultado.get("metadatos", {}).items()
+                 if clave not in ("referencias", "ubicacion_campos")}
+    return {"metadatos": metadatos, "fallo": resultado.get("analisis", {}).get("fallo")}
+
+
+def run(archivo: str, campos: List[str], parcial: bool) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    if parcial:
+        texto, paginas = extract_text_for_fields(archivo, campos)
+    else:
+        texto, paginas = extract_text_from_document(archivo), None
+    resultado = build_analysis(texto, campos)
+    return {"segundos": time.perf_counter() - inicio, "paginas": paginas, "resultado": comparable(resultado)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracción completa vs. guiada por los campos pedidos.")
+    parser.add_argument("archivos", nargs="*", help="PDFs a comparar (por defecto, docs/*.pdf).")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Corridas por documento y petición.")
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted(glob.glob(os.path.join(BACKEND_DIR, "..", "docs", "*.pdf")))
+    if not archivos:
+        parser.error("No se encontraron PDFs.")
+
+    print(f"{'documento':<28}{'petición':<16}{'páginas':>9}{'completa ms':>13}{'parcial ms':>12}{'igual':>7}")
+    for archivo in archivos:
+        for nombre, campos in PETICIONES.items():
+            completa = min((run(archivo, campos, False) for _ in range(args.repeticiones)), key=lambda r: r["segundos"])
+            parcial = min((run(archivo, campos, True) for _ in range(args.repeticiones)), key=lambda r: r["segundos"])
+            paginas = parcial["paginas"] or {"leidas": [], "total": 0}
+            igual = "sí" if parcial["resultado"] == completa["resultado"] else "no"
+            print(f"{os.path.basename(archivo)[:27]:<28}{nombre:<16}"
+                  f"{len(paginas['leidas']):>4}/{paginas['total']:<4}"
+                  f"{completa['segundos'] * 1000:>13.0f}{parcial['segundos'] * 1000:>12.0f}{igual:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compara los backends de extracción de PDF (analyzer/pdf_backends.py) en velocidad y en
+fidelidad respecto a pdfplumber.
+
+Para cada PDF y backend se mide el tiempo de extracción (páginas/s) y se segmenta el
+texto resultante con el mismo pipeline que el análisis (limpieza + segment_sections).
+La concordancia con pdfplumber se reporta por documento:
+  - secciones: fracción de secciones esperadas cuya presencia coincide.
+  - jaccard:   similitud media de palabras entre las secciones homólogas.
+
+Uso (desde 'backend/'):
+    python benchmarks/pdf_backends.py ../docs/*.pdf
+"""
+import os
+import re
+import sys
+import time
+import glob
+import argparse
+from typing import Dict, List, Set
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from analyzer.extractor import iter_pdf_pages, join_pages
+from analyzer.pdf_backends import BACKENDS
+from utils.rules import get_rules
+from utils.sentence_parser import segment_sections
+from utils.text_cleaning import clean_text
+
+REFERENCE = "pdfplumber"
+_WORD_RE = re.compile(r"\w+")
+
+
+def extract(file_path: str, backend: str) -> Dict[str, object]:
+    inicio = time.perf_counter()
+    paginas = list(iter_pdf_pages(file_path, backend))
+    duracion = time.perf_counter() - inicio
+    secciones = segment_sections(clean_text(join_pages(paginas)))
+    return {"paginas": len(paginas), "segundos": duracion, "secciones": secciones}
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def agreement(referencia: Dict[str, str], candidato: Dict[str, str]) -> Dict[str, float]:
+    """Concordancia de la segmentación de un backend con la de referencia."""
+    nombres = get_rules().nombres_secciones
+    coinciden = sum((clave in referencia) == (clave in candidato) for clave in nombres)
+    similitudes: List[float] = []
+    for clave in nombres:
+        if clave in referencia and clave in candidato:
+            a, b = _words(referencia[clave]), _words(candidato[clave])
+            similitudes.append(len(a & b) / len(a | b) if a | b else 1.0)
+    return {
+        "secciones": coinciden / len(nombres),
+        "jaccard": sum(similitudes) / len(similitudes) if similitudes else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocidad y fidelidad de los backends de PDF.")
+    parser.add_argument("archivos", nargs="*", help="PDFs a comparar (por defecto, docs/*.pdf).")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Extracciones por documento y backend.")
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted(glob.glob(os.path.join(BACKEND_DIR, "..", "docs", "*.pdf")))
+    if not archivos:
+        parser.error("No se encontraron PDFs.")
+
+    totales = {nombre: {"paginas": 0, "segundos": 0.0, "secciones": 0.0, "jaccard": 0.0} for nombre in BACKENDS}
+    for archivo in archivos:
+        resultados = {}
+        for nombre in BACKENDS:
+            corridas = [extract(archivo, nombre) for _ in range(args.repeticiones)]
+            resultados[nombre] = min(corridas, key=lambda r: r["segundos"])
+        referencia = resultados[REFERENCE]["secciones"]
+        for nombre, resultado in resultados.items():
+            concordancia = agreement(referencia, resultado["secciones"])
+            totales[nombre]["paginas"] += resultado["paginas"]
+            totales[nombre]["segundos"] += resultado["segundos"]
+            totales[nombre]["secciones"] += concordancia["secciones"]
+            totales[nombre]["jaccard"] += concordancia["jaccard"]
+
+    n = len(archivos)
+    print(f"{len(archivos)} documento(s); concordancia respecto a {REFERENCE}")
+    print(f"{'backend':<12}{'páginas':>9}{'páginas/s':>11}{'secciones':>11}{'jaccard':>9}")
+    for nombre, t in totales.items():
+        velocidad = t["paginas"] / t["segundos"] if t["segundos"] else 0.0
+        print(f"{nombre:<12}{t['paginas']:>9}{velocidad:>11.1f}{t['secciones'] / n:>11.2f}{t['jaccard'] / n:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compara la memoria por worker del servidor pre-fork con la de procesos independientes.
+
+Cada modo levanta N procesos que cargan el modelo y analizan el mismo texto; luego se
+lee /proc/<pid>/smaps_rollup de cada uno:
+  - USS (Private_Clean + Private_Dirty): memoria exclusiva del proceso.
+  - PSS: memoria proporcional (las páginas compartidas se reparten entre quienes las usan).
+  - RSS: memoria residente total, incluyendo la compartida.
+
+Uso (desde 'backend/', Linux):
+    python benchmarks/prefork_memory.py --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.request
+from typing import Dict, List
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """Lee USS, PSS y RSS (en KiB) de /proc/<pid>/smaps_rollup."""
+    valores: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].endswith(":") and partes[1].isdigit():
+                valores[partes[0][:-1]] = int(partes[1])
+    return {
+        "uss_kib": valores.get("Private_Clean", 0) + valores.get("Private_Dirty", 0),
+        "pss_kib": valores.get("Pss", 0),
+        "rss_kib": valores.get("Rss", 0),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _post(url: str, body: Dict) -> Dict:
+    peticion = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(peticion, timeout=600) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def measure_prefork(workers: int, port: int, text: str) -> List[Dict[str, int]]:
+    """Mide los workers de service/prefork.py tras atender varias peticiones cada uno."""
+    servidor = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "service", "prefork.py"),
+         "--workers", str(workers), "--port", str(port), "--max-documents", "100000"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(600):
+            try:
+                urllib.request.urlopen(f"{url}/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.5)
+        # Las conexiones se reparten entre los workers que esperan en accept()
+        for _ in range(workers * 3):
+            _post(f"{url}/analyze", {"texto": text})
+        return [read_memory(pid) for pid in child_pids(servidor.pid)]
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def measure_independent(workers: int, text: str) -> List[Dict[str, int]]:
+    """Mide N procesos que cargan el modelo cada uno por su cuenta."""
+    procesos = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--standalone-worker"],
+            cwd=BACKEND_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        for proceso in procesos:
+            proceso.stdin.write(json.dumps({"texto": text}) + "\n")
+            proceso.stdin.flush()
+        for proceso in procesos:
+            proceso.stdout.readline()  # "listo"
+        return [read_memory(proceso.pid) for proceso in procesos]
+    finally:
+        for proceso in procesos:
+            proceso.kill()
+            proceso.wait()
+
+
+def _standalone_worker():
+    """Proceso independiente: carga todo por su cuenta, analiza y espera a ser medido."""
+    from analyzer.extractor import build_analysis
+
+    peticion = json.loads(sys.stdin.readline())
+    build_analysis(peticion["texto"])
+    print("listo", flush=True)
+    time.sleep(3600)
+
+
+def _summary(nombre: str, medidas: List[Dict[str, int]]) -> Dict[str, float]:
+    n = len(medidas) or 1
+    return {
+        "modo": nombre,
+        "workers": len(medidas),
+        "uss_mib_por_worker": round(sum(m["uss_kib"] for m in medidas) / n / 1024, 1),
+        "pss_mib_por_worker": round(sum(m["pss_kib"] for m in medidas) / n / 1024, 1),
+        "rss_mib_por_worker": round(sum(m["rss_kib"] for m in medidas) / n / 1024, 1),
+        "pss_mib_total": round(sum(m["pss_kib"] for m in medidas) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por worker: pre-fork vs procesos independientes.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--texto", default=None, help="Archivo de texto a analizar (por defecto, la muestra de outputs/).")
+    parser.add_argument("--standalone-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.standalone_worker:
+        _standalone_worker()
+        return
+
+    if args.texto:
+        with open(args.texto, "r", encoding="utf-8") as f:
+            texto = f.read()
+    else:
+        muestra = os.path.join(BACKEND_DIR, "..", "outputs", "sentencia_analisis.json")
+        with open(muestra, "r", encoding="utf-8") as f:
+            texto = "\n".join(json.load(f)["secciones"].values())
+
+    resultados = [
+        _summary("independientes", measure_independent(args.workers, texto)),
+        _summary("prefork", measure_prefork(args.workers, args.port, texto)),
+    ]
+
+    print(f"{'modo':<16}{'workers':>8}{'USS/worker':>12}{'PSS/worker':>12}{'RSS/worker':>12}{'PSS total':>12}")
+    for r in resultados:
+        print(f"{r['modo']:<16}{r['workers']:>8}{r['uss_mib_por_worker']:>11}M{r['pss_mib_por_worker']:>11}M"
+              f"{r['rss_mib_por_worker']:>11}M{r['pss_mib_total']:>11}M")
+
+
+if __name__ == "__main__":
+    main()
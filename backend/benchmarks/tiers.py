@@ -0,0 +1,163 @@
+"""
+Compara los niveles de análisis (nlp/tiers.py, sección 'tiers' de config.json) en
+velocidad, memoria y calidad, para elegir un nivel con números.
+
+Cada nivel se evalúa en un proceso nuevo, de modo que la memoria de un modelo no se
+suma a la del siguiente:
+  - carga_s:  tiempo de carga del pipeline.
+  - docs/s:   documentos por segundo en las etapas entities, hechos y normas (sin la
+              caché de Doc en disco, que ocultaría el costo del modelo).
+  - rss_mib:  memoria residente máxima del proceso.
+  - P/R/F1 de entidades, hechos y normas frente a un conjunto de referencia: pares
+    documento=análisis, donde el análisis tiene la forma de la salida de main.py
+    (p. ej. outputs/sentencia_analisis.json). Se comparan conjuntos de
+    (sección, categoría, texto normalizado).
+
+Una referencia generada con main.py es la salida del nivel por defecto: mide cuánto se
+aleja cada nivel de él. Para medir la calidad real, corregir a mano la referencia.
+
+Uso (desde 'backend/'):
+    python benchmarks/tiers.py
+    python benchmarks/tiers.py --oro ../docs/sentencia.pdf=../outputs/sentencia_analisis.json \\
+        --niveles reglas,rapido,estandar --repeticiones 5 --json ../outputs/niveles.json
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import resource
+import multiprocessing
+from typing import Any, Dict, List, Set, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.document import collapse_whitespace
+
+FIELDS = ("entities", "hechos", "normas")
+DEFAULT_GOLD = f"{os.path.join(BACKEND_DIR, '..', 'docs', 'sentencia.pdf')}={os.path.join(BACKEND_DIR, '..', 'outputs', 'sentencia_analisis.json')}"
+
+
+def _evaluate_tier(nombre: str, textos: List[str], repeticiones: int, cola: "multiprocessing.Queue"):
+    """Proceso hijo: carga el nivel, analiza los textos y reporta tiempos, memoria y resultados."""
+    try:
+        from utils.settings import load_settings
+        from nlp.tiers import get_tier
+        from analyzer.executor import run_analysis
+
+        load_settings().setdefault("doc_cache", {})["enabled"] = False
+        inicio = time.perf_counter()
+        get_tier(nombre).load()
+        carga = time.perf_counter() - inicio
+
+        resultados = [run_analysis(texto, FIELDS, tier=nombre) for texto in textos]  # también calienta
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for texto in textos:
+                run_analysis(texto, FIELDS, tier=nombre)
+        duracion = time.perf_counter() - inicio
+
+        cola.put({
+            "nivel": nombre,
+            "carga_s": round(carga, 2),
+            "docs_s": round(repeticiones * len(textos) / duracion, 2) if duracion else None,
+            "rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "resultados": resultados,
+        })
+    except Exception as e:
+        cola.put({"nivel": nombre, "error": f"{type(e).__name__}: {e}"})
+
+
+def _wait_result(nombre: str, proceso: "multiprocessing.Process", cola: "multiprocessing.Queue") -> Dict[str, Any]:
+    """Espera la medida del nivel; si el proceso muere sin enviarla (p. ej. sin memoria), la reporta como error."""
+    while True:
+        try:
+            return cola.get(timeout=1.0)
+        except queue.Empty:
+            if not proceso.is_alive():
+                break
+    try:
+        # Lo que el proceso puso justo antes de terminar puede tardar en llegar
+        return cola.get(timeout=1.0)
+    except queue.Empty:
+        return {"nivel": nombre, "error": f"el proceso terminó sin resultado (código de salida {proceso.exitcode})"}
+
+
+def _items(analisis: Dict[str, Any], campo: str) -> Set[Tuple[str, str, str]]:
+    """(sección, categoría, texto normalizado) de un campo del análisis por sección."""
+    items: Set[Tuple[str, str, str]] = set()
+    for seccion, datos in (analisis.get("analisis") or {}).items():
+        valor = datos.get(campo)
+        grupos = valor.items() if isinstance(valor, dict) else [("", valor or [])]
+        for categoria, textos in grupos:
+            for texto in textos:
+                items.add((seccion, categoria, collapse_whitespace(texto).lower()))
+    return items
+
+
+def score(referencias: List[Dict[str, Any]], resultados: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Precisión, exhaustividad y F1 (micro, sobre todos los documentos) de cada campo."""
+    metricas: Dict[str, Dict[str, float]] = {}
+    for campo, salida in (("entidades", "entidades"), ("hechos_relevantes", "hechos"), ("normas_detectadas", "normas")):
+        aciertos = esperados = obtenidos = 0
+        for referencia, resultado in zip(referencias, resultados):
+            oro, pred = _items(referencia, campo), _items(resultado, campo)
+            aciertos += len(oro & pred)
+            esperados += len(oro)
+            obtenidos += len(pred)
+        p = aciertos / obtenidos if obtenidos else 0.0
+        r = aciertos / esperados if esperados else 0.0
+        metricas[salida] = {"p": round(p, 3), "r": round(r, 3), "f1": round(2 * p * r / (p + r), 3) if p + r else 0.0}
+    return metricas
+
+
+def main():
+    from nlp.tiers import tier_names
+    from analyzer.extractor import extract_text_from_document
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--oro", nargs="+", default=[DEFAULT_GOLD], help="Pares documento=análisis de referencia.")
+    parser.add_argument("--niveles", default=",".join(tier_names()), help="Niveles a comparar, separados por comas.")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Pasadas sobre los documentos para medir docs/s.")
+    parser.add_argument("--json", default=None, help="Guarda el informe completo en este archivo.")
+    args = parser.parse_args()
+
+    textos, referencias = [], []
+    for par in args.oro:
+        documento, referencia = par.split("=", 1)
+        textos.append(extract_text_from_document(documento))
+        with open(referencia, "r", encoding="utf-8") as f:
+            referencias.append(json.load(f))
+
+    contexto = multiprocessing.get_context("spawn")
+    informe = []
+    for nombre in args.niveles.split(","):
+        cola = contexto.Queue()
+        proceso = contexto.Process(target=_evaluate_tier, args=(nombre, textos, args.repeticiones, cola))
+        proceso.start()
+        medida = _wait_result(nombre, proceso, cola)
+        proceso.join()
+        if "resultados" in medida:
+            medida["calidad"] = score(referencias, medida.pop("resultados"))
+        informe.append(medida)
+
+    print(f"{len(textos)} documento(s) de referencia, {args.repeticiones} repeticiones")
+    print(f"{'nivel':<10}{'carga_s':>8}{'docs/s':>8}{'rss_mib':>9}   {'entidades P/R/F1':<19}{'hechos F1':>10}{'normas F1':>10}")
+    for medida in informe:
+        if "error" in medida:
+            print(f"{medida['nivel']:<10}  error: {medida['error']}")
+            continue
+        calidad = medida["calidad"]
+        ent = calidad["entidades"]
+        print(f"{medida['nivel']:<10}{medida['carga_s']:>8.2f}{medida['docs_s']:>8.2f}{medida['rss_mib']:>9.1f}   "
+              f"{ent['p']:.2f}/{ent['r']:.2f}/{ent['f1']:.2f}{'':<7}{calidad['hechos']['f1']:>10.2f}{calidad['normas']['f1']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
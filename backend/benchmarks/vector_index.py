@@ -0,0 +1,72 @@
+"""
+Latencia y exhaustividad (recall@10) del índice vectorial de secciones (corpus/vector_index.py)
+sobre vectores sintéticos agrupados, comparando contra la búsqueda exacta por coseno.
+
+Uso (desde 'backend/'):
+    python benchmarks/vector_index.py --filas 500000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from corpus.vector_index import VectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y recall del índice vectorial.")
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--grupos", type=int, default=5000, help="Temas alrededor de los que se agrupan los vectores.")
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--candidatos", type=int, nargs="+", default=[500, 2000, 5000])
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="vector_index_")
+    try:
+        rng = np.random.default_rng(0)
+        centros = rng.standard_normal((args.grupos, args.dim)).astype(np.float32)
+        indice = VectorIndex(directorio, dim=args.dim)
+
+        inicio = time.perf_counter()
+        for base in range(0, args.filas, 50_000):
+            n = min(50_000, args.filas - base)
+            v = centros[rng.integers(0, args.grupos, n)] + 0.8 * rng.standard_normal((n, args.dim)).astype(np.float32)
+            v /= np.linalg.norm(v, axis=1, keepdims=True)
+            indice.add_many((str(base + i), "consideraciones", v[i]) for i in range(n))
+        print(f"{len(indice)} filas agregadas en {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        indice = VectorIndex(directorio)
+        print(f"Índice abierto (memmap) en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        exactos = np.asarray(indice._vectores, dtype=np.float32)
+        consultas = []
+        for _ in range(args.consultas):
+            q = exactos[rng.integers(0, len(indice))] + 0.02 * rng.standard_normal(args.dim).astype(np.float32)
+            consultas.append(q / np.linalg.norm(q))
+        verdad = [set(np.argsort(-(exactos @ q))[:10]) for q in consultas]
+
+        print(f"{'candidatos':>11}{'ms/consulta':>13}{'recall@10':>11}")
+        for candidatos in args.candidatos:
+            indice.query(consultas[0], candidatos=candidatos)
+            inicio = time.perf_counter()
+            resultados = [indice.query(q, k=10, candidatos=candidatos) for q in consultas]
+            ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+            recall = np.mean([
+                len(v & {int(r["doc_id"]) for r in res}) / 10 for v, res in zip(verdad, resultados)
+            ])
+            print(f"{candidatos:>11}{ms:>13.1f}{recall:>11.2f}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import base64
+import hashlib
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from corpus.citation_graph import TIPO_NORMA, citations_from_analysis
+from utils.document import collapse_whitespace
+from utils.settings import get_section
+
+# Estadísticas del corpus en memoria constante: los análisis se pliegan uno a uno en
+# agregados que se pueden combinar (merge) entre workers o entre corridas.
+#
+#   - Conteos exactos para lo que tiene pocos valores: tipo de fallo, tipo de sentencia,
+#     sala, mes de la sentencia.
+#   - Count-min sketch + candidatos para lo que tiene alta cardinalidad: normas,
+#     precedentes, entidades por categoría y ponentes por sala. La memoria depende de
+#     'ancho', 'profundidad' y 'top_k' (sección 'analytics' de config.json), no del
+#     número de documentos.
+#
+# Cada documento cuenta una vez por valor distinto: "normas más citadas" es el número
+# de sentencias que citan la norma, no el de menciones.
+
+_MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_FECHA_RE = re.compile(r"\b(" + "|".join(_MESES) + r")\s+(?:de\s+|del\s+)?((?:19|20)\d{2})\b", re.IGNORECASE)
+
+OTRAS_SALAS = "(otras)"
+SIN_DATO = "(sin dato)"
+
+
+def _key(texto: str) -> str:
+    return collapse_whitespace(texto).lower()
+
+
+def month_of(fecha: Optional[str]) -> str:
+    """'10 de junio de 2025' -> '2025-06' ('(sin dato)' si no se reconoce)."""
+    coincidencia = _FECHA_RE.search(fecha or "")
+    if not coincidencia:
+        return SIN_DATO
+    return f"{coincidencia.group(2)}-{_MESES[coincidencia.group(1).lower()]:02d}"
+
+
+class CountMinSketch:
+    """
+    Count-min sketch: 'profundidad' filas de 'ancho' contadores. estimate() nunca
+    subestima y sobreestima en a lo sumo e/ancho del total con probabilidad
+    1 - exp(-profundidad). Dos sketches con las mismas dimensiones y semilla se
+    combinan sumando sus tablas.
+    """
+
+    def __init__(self, ancho: int = 2048, profundidad: int = 4, semilla: int = 0):
+        self.ancho = ancho
+        self.profundidad = profundidad
+        self.semilla = semilla
+        self.tabla = np.zeros((profundidad, ancho), dtype=np.int64)
+        self._plana = self.tabla.reshape(-1)  # vista, no copia
+        self.total = 0
+        self._salt = semilla.to_bytes(8, "little")
+
+    def _celdas(self, item: str) -> List[int]:
+        # Doble hashing (h1 + i*h2): una sola llamada a blake2b por ítem. Estable entre
+        # procesos, a diferencia de hash(), para que los sketches de distintos workers coincidan.
+        # Retorna posiciones en la tabla aplanada: con enteros de Python cada acceso es
+        # más barato que un índice avanzado de NumPy por ítem.
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16, salt=self._salt).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [fila * self.ancho + (h1 + fila * h2) % self.ancho for fila in range(self.profundidad)]
+
+    def add(self, item: str, n: int = 1) -> int:
+        """Suma n al ítem y retorna su nueva estimación."""
+        plana = self._plana
+        estimacion = None
+        for celda in self._celdas(item):
+            plana[celda] += n
+            valor = plana[celda]
+            estimacion = valor if estimacion is None or valor < estimacion else estimacion
+        self.total += n
+        return int(estimacion)
+
+    def estimate(self, item: str) -> int:
+        return int(min(self._plana[celda] for celda in self._celdas(item)))
+
+    def merge(self, otro: "CountMinSketch"):
+        if (otro.ancho, otro.profundidad, otro.semilla) != (self.ancho, self.profundidad, self.semilla):
+            raise ValueError("Solo se combinan sketches con el mismo ancho, profundidad y semilla.")
+        self.tabla += otro.tabla
+        self.total += otro.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ancho": self.ancho, "profundidad": self.profundidad, "semilla": self.semilla, "total": self.total,
+            "tabla": base64.b64encode(self.tabla.astype("<i8").tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, datos: Dict[str, Any]) -> "CountMinSketch":
+        sketch = cls(datos["ancho"], datos["profundidad"], datos["semilla"])
+        tabla = np.frombuffer(base64.b64decode(datos["tabla"]), dtype="<i8")
+        sketch.tabla = tabla.reshape(sketch.profundidad, sketch.ancho).astype(np.int64)
+        sketch._plana = sketch.tabla.reshape(-1)
+        sketch.total = int(datos["total"])
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Los top_k ítems más frecuentes según un count-min sketch. Se guardan a lo sumo
+    2*top_k candidatos con su texto original; al superarlos se conservan los top_k de
+    mayor estimación.
+
+    Al combinar, los candidatos de ambos lados se re-estiman con el sketch combinado.
+    Un ítem frecuente en total pero que no fue candidato en ninguna parte se pierde:
+    con las distribuciones muy sesgadas de normas y entidades esto no ocurre en la
+    práctica para los primeros puestos.
+    """
+
+    def __init__(self, top_k: int = 100, ancho: int = 2048, profundidad: int = 4, semilla: int = 0):
+        self.top_k = top_k
+        self.sketch = CountMinSketch(ancho, profundidad, semilla)
+        self.candidatos: Dict[str, Tuple[str, int]] = {}  # clave normalizada -> (texto, estimación)
+
+    def add(self, texto: str, n: int = 1):
+        clave = _key(texto)
+        if not clave:
+            return
+        estimacion = self.sketch.add(clave, n)
+        original = self.candidatos.get(clave, (texto, 0))[0]
+        self.candidatos[clave] = (original, estimacion)
+        if len(self.candidatos) > 2 * self.top_k:
+            self._prune()
+
+    def _prune(self):
+        mejores = sorted(self.candidatos.items(), key=lambda par: -par[1][1])[:self.top_k]
+        self.candidatos = dict(mejores)
+
+    def merge(self, otro: "HeavyHitters"):
+        self.sketch.merge(otro.sketch)
+        for clave, (texto, _) in otro.candidatos.items():
+            self.candidatos.setdefault(clave, (texto, 0))
+        self.candidatos = {clave: (texto, self.sketch.estimate(clave)) for clave, (texto, _) in self.candidatos.items()}
+        if len(self.candidatos) > 2 * self.top_k:
+            self._prune()
+
+    def top(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Los n ítems más frecuentes con su conteo estimado (cota superior)."""
+        ordenados = sorted(self.candidatos.values(), key=lambda par: (-par[1], par[0]))
+        return [{"texto": texto, "conteo": conteo} for texto, conteo in ordenados[:n or self.top_k]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"top_k": self.top_k, "sketch": self.sketch.to_dict(),
+                "candidatos": [[clave, texto, conteo] for clave, (texto, conteo) in self.candidatos.items()]}
+
+    @classmethod
+    def from_dict(cls, datos: Dict[str, Any]) -> "HeavyHitters":
+        hh = cls(datos["top_k"])
+        hh.sketch = CountMinSketch.from_dict(datos["sketch"])
+        hh.candidatos = {clave: (texto, conteo) for clave, texto, conteo in datos["candidatos"]}
+        return hh
+
+
+class CorpusStats:
+    """
+    Agregado de estadísticas del corpus. add() pliega un análisis (la salida de
+    main.py, de la cola, de un lote o una línea de 'corpus_cli.py rerun'); merge()
+    combina agregados parciales; to_dict()/from_dict() los guardan como JSON.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config if config is not None else get_section("analytics")
+        self.config = {
+            "ancho": int(config.get("ancho", 2048)),
+            "profundidad": int(config.get("profundidad", 4)),
+            "top_k": int(config.get("top_k", 100)),
+            "ancho_ponentes": int(config.get("ancho_ponentes", 256)),
+            "top_k_ponentes": int(config.get("top_k_ponentes", 20)),
+            "max_salas": int(config.get("max_salas", 64)),
+            "categorias_entidades": list(config.get("categorias_entidades") or ["PERSONAS", "ORGANIZACIONES", "LUGARES"]),
+        }
+        self.documentos = 0
+        self.exactos: Dict[str, Counter] = {
+            "tipo_fallo": Counter(), "tipo_sentencia": Counter(), "corporacion_sala": Counter(), "mes": Counter(),
+        }
+        # Todas las estructuras comparten la semilla 0: deben coincidir entre workers
+        self.frecuentes: Dict[str, HeavyHitters] = {
+            nombre: self._heavy_hitters() for nombre in ("normas", "precedentes", *self.config["categorias_entidades"])
+        }
+        self.ponentes: Dict[str, HeavyHitters] = {}  # sala -> ponentes más frecuentes
+
+    def _heavy_hitters(self) -> HeavyHitters:
+        return HeavyHitters(self.config["top_k"], self.config["ancho"], self.config["profundidad"])
+
+    def _sala(self, sala: str) -> str:
+        # Las salas son pocas; un valor mal extraído no debe hacer crecer la memoria sin límite
+        if sala in self.exactos["corporacion_sala"] or len(self.exactos["corporacion_sala"]) < self.config["max_salas"]:
+            return sala
+        return OTRAS_SALAS
+
+    def _ponentes_de(self, sala: str) -> HeavyHitters:
+        if sala not in self.ponentes:
+            self.ponentes[sala] = HeavyHitters(self.config["top_k_ponentes"], self.config["ancho_ponentes"],
+                                               self.config["profundidad"])
+        return self.ponentes[sala]
+
+    def add(self, resultado: Dict[str, Any]):
+        """Pliega un análisis en el agregado."""
+        self.documentos += 1
+        metadatos = resultado.get("metadatos") or {}
+        analisis = resultado.get("analisis") or {}
+
+        fallo = (analisis.get("fallo") or {}).get("resumen_fallo") or {}
+        self.exactos["tipo_fallo"][fallo.get("tipo_fallo") or SIN_DATO] += 1
+        self.exactos["tipo_sentencia"][resultado.get("tipo_sentencia") or SIN_DATO] += 1
+        self.exactos["mes"][month_of(metadatos.get("fecha_sentencia"))] += 1
+        sala = self._sala(collapse_whitespace(metadatos.get("corporacion_sala") or "") or SIN_DATO)
+        self.exactos["corporacion_sala"][sala] += 1
+
+        ponente = collapse_whitespace(metadatos.get("magistrado_ponente") or "")
+        if ponente:
+            self._ponentes_de(sala).add(ponente)
+
+        _, citas = citations_from_analysis(resultado)
+        for tipo, texto in citas:
+            self.frecuentes["normas" if tipo == TIPO_NORMA else "precedentes"].add(texto)
+
+        entidades: Dict[str, Dict[str, str]] = {}
+        for datos in analisis.values():
+            for categoria, textos in (datos.get("entidades") or {}).items():
+                if categoria in self.frecuentes:
+                    for texto in textos:
+                        entidades.setdefault(categoria, {}).setdefault(_key(texto), texto)
+        for categoria, textos in entidades.items():
+            for texto in textos.values():
+                self.frecuentes[categoria].add(texto)
+
+    def merge(self, otro: "CorpusStats"):
+        """Combina otro agregado (p. ej. el de otro worker) en este."""
+        if otro.config != self.config:
+            raise ValueError("Solo se combinan agregados con la misma configuración de 'analytics'.")
+        self.documentos += otro.documentos
+        for nombre, contador in otro.exactos.items():
+            if nombre != "corporacion_sala":
+                self.exactos[nombre].update(contador)
+        # Las salas del otro agregado también pasan por el límite de 'max_salas'
+        for sala, conteo in otro.exactos["corporacion_sala"].items():
+            self.exactos["corporacion_sala"][self._sala(sala)] += conteo
+        for nombre, hh in otro.frecuentes.items():
+            self.frecuentes[nombre].merge(hh)
+        for sala, hh in otro.ponentes.items():
+            # Siempre en uno propio: el del otro agregado no se comparte ni se modifica
+            self._ponentes_de(self._sala(sala)).merge(hh)
+
+    def report(self, n: int = 20) -> Dict[str, Any]:
+        """Informe legible: conteos exactos completos y los n primeros de cada estructura aproximada."""
+        return {
+            "documentos": self.documentos,
+            **{nombre: dict(contador.most_common()) for nombre, contador in self.exactos.items() if nombre != "mes"},
+            "por_mes": dict(sorted(self.exactos["mes"].items())),
+            "normas_mas_citadas": self.frecuentes["normas"].top(n),
+            "precedentes_mas_citados": self.frecuentes["precedentes"].top(n),
+            "entidades_frecuentes": {c: self.frecuentes[c].top(n) for c in self.config["categorias_entidades"]},
+            "ponentes_por_sala": {sala: hh.top(n) for sala, hh in sorted(self.ponentes.items())},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "config": self.config,
+            "documentos": self.documentos,
+            "exactos": {nombre: dict(contador) for nombre, contador in self.exactos.items()},
+            "frecuentes": {nombre: hh.to_dict() for nombre, hh in self.frecuentes.items()},
+            "ponentes": {sala: hh.to_dict() for sala, hh in self.ponentes.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, datos: Dict[str, Any]) -> "CorpusStats":
+        stats = cls(datos["config"])
+        stats.documentos = datos["documentos"]
+        stats.exactos = {nombre: Counter(valores) for nombre, valores in datos["exactos"].items()}
+        stats.frecuentes = {nombre: HeavyHitters.from_dict(hh) for nombre, hh in datos["frecuentes"].items()}
+        stats.ponentes = {sala: HeavyHitters.from_dict(hh) for sala, hh in datos["ponentes"].items()}
+        return stats
+
+    def save(self, ruta: str):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, ruta: str) -> "CorpusStats":
+        with open(ruta, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def expand_paths(rutas: Iterable[str]) -> List[str]:
+    """
+    Archivos de análisis a partir de archivos '*_analisis.json', JSONL de
+    'corpus_cli.py rerun' y directorios (donde se buscan recursivamente los
+    '*_analisis.json', p. ej. outputs/ o los 'resultados' de un lote).
+    """
+    archivos: List[str] = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, _, nombres in sorted(os.walk(ruta)):
+                archivos.extend(os.path.join(raiz, n) for n in sorted(nombres) if n.endswith("_analisis.json"))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+def iter_analyses(archivos: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Recorre los análisis de los archivos uno a uno, sin cargarlos todos (un JSONL, línea a línea)."""
+    for archivo in archivos:
+        with open(archivo, "r", encoding="utf-8") as f:
+            if archivo.endswith(".jsonl"):
+                for linea in f:
+                    if linea.strip():
+                        yield json.loads(linea)
+            else:
+                yield json.load(f)
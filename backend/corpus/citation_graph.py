@@ -0,0 +1,297 @@
+import os
+import re
+import fcntl
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.document import collapse_whitespace
+from utils.settings import get_section, resolve_path
+
+# Grafo de citas del corpus: sentencia -> precedentes (AP/SP/SL..., sentencias de la
+# Corte Constitucional) y normas citadas, como arreglos de adyacencia CSR de enteros.
+#
+# Archivos (todos de solo-anexado, escritos bajo flock):
+#   documentos.tsv   fila -> doc_id \t año \t inicio \t fin (posición de sus citas en citas.u32)
+#   destinos.tsv     id de destino -> tipo \t texto
+#   citas.u32        ids de destino de todas las filas, concatenados (indices)
+#
+# Una fila se publica al escribir su línea en documentos.tsv, después de sus citas:
+# si un proceso muere a mitad de una escritura, lo escrito queda huérfano e invisible.
+# Volver a agregar un documento anexa una fila nueva; la última fila de cada doc_id es
+# la vigente y las anteriores se ignoran en las consultas.
+
+DOCS_FILE = "documentos.tsv"
+TARGETS_FILE = "destinos.tsv"
+INDICES_FILE = "citas.u32"
+LOCK_FILE = ".lock"
+
+TIPO_PRECEDENTE = "precedente"
+TIPO_NORMA = "norma"
+
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+def default_graph_dir() -> str:
+    """Directorio del grafo según 'config.json' (sección 'citation_graph')."""
+    return resolve_path(get_section("citation_graph").get("dir", "outputs/corpus_citas"))
+
+
+def _target_key(texto: str) -> str:
+    return collapse_whitespace(texto).lower()
+
+
+def citations_from_analysis(resultado: Dict[str, Any]) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Extrae de un resultado de análisis el año de la sentencia y sus citas.
+
+    Returns:
+        Una tupla (año o 0 si no se detectó, lista de (tipo, texto) sin duplicados).
+    """
+    metadatos = resultado.get("metadatos") or {}
+    años = _YEAR_RE.findall(metadatos.get("fecha_sentencia") or "")
+    año = int(años[-1]) if años else 0
+
+    citas: Dict[str, Tuple[str, str]] = {}
+    for referencia in metadatos.get("referencias") or []:
+        citas.setdefault(_target_key(referencia), (TIPO_PRECEDENTE, referencia))
+    for seccion in (resultado.get("analisis") or {}).values():
+        for norma in seccion.get("normas_detectadas") or []:
+            tipo = TIPO_PRECEDENTE if norma.lower().startswith("sentencia") else TIPO_NORMA
+            citas.setdefault(_target_key(norma), (tipo, norma))
+    return año, list(citas.values())
+
+
+class CitationGraph:
+    """
+    Grafo de citas persistente con actualización incremental.
+
+    Las filas nuevas se anexan a los archivos y a búferes en memoria; las consultas
+    consolidan los búferes en arreglos NumPy y construyen (una vez, hasta el siguiente
+    cambio) la transpuesta destino -> sentencias con un ordenamiento estable por destino.
+    """
+
+    def __init__(self, graph_dir: Optional[str] = None):
+        self.graph_dir = graph_dir or default_graph_dir()
+        os.makedirs(self.graph_dir, exist_ok=True)
+
+        self.doc_ids: List[str] = []
+        self.doc_years: List[int] = []
+        self.targets: List[Tuple[str, str]] = []      # id -> (tipo, texto)
+        self._target_ids: Dict[str, int] = {}         # clave normalizada -> id
+        self._leidos = {DOCS_FILE: 0, TARGETS_FILE: 0, INDICES_FILE: 0}
+
+        self._spans: List[Tuple[int, int]] = []  # (inicio, fin) de las citas de cada fila
+        # Trozos consecutivos de citas.u32 (leídos o escritos por este proceso), que se
+        # concatenan al construir los arreglos de consulta
+        self._index_chunks: List[np.ndarray] = []
+        self._cache: Optional[Dict[str, np.ndarray]] = None
+        self.refresh()
+
+    def __len__(self) -> int:
+        """Número de sentencias distintas del grafo."""
+        return len(set(self.doc_ids))
+
+    def _path(self, nombre: str) -> str:
+        return os.path.join(self.graph_dir, nombre)
+
+    def _read_new(self, nombre: str, dtype: Optional[str] = None):
+        """Lee lo anexado a un archivo desde la última lectura (solo registros completos)."""
+        with open(self._path(nombre), "ab+") as f:
+            f.seek(self._leidos[nombre])
+            nuevos = f.read()
+        if dtype:
+            nuevos = nuevos[:len(nuevos) - len(nuevos) % np.dtype(dtype).itemsize]
+        else:
+            nuevos = nuevos[:nuevos.rfind(b"\n") + 1]
+        self._leidos[nombre] += len(nuevos)
+        return np.frombuffer(nuevos, dtype=dtype) if dtype else nuevos.decode("utf-8").splitlines()
+
+    def refresh(self):
+        """
+        Incorpora lo que otros procesos anexaron desde la última lectura. Sin bloqueo, los
+        archivos se leen en el orden inverso al de escritura (filas, citas, destinos): toda
+        fila leída tiene ya escritas sus citas, y toda cita, su destino.
+        """
+        documentos = self._read_new(DOCS_FILE)
+        indices = self._read_new(INDICES_FILE, "<u4")
+        destinos = self._read_new(TARGETS_FILE)
+        for linea in destinos:
+            tipo, texto = linea.split("\t", 1)
+            self._target_ids[_target_key(texto)] = len(self.targets)
+            self.targets.append((tipo, texto))
+        for linea in documentos:
+            doc_id, año, inicio, fin = linea.rsplit("\t", 3)
+            self.doc_ids.append(doc_id)
+            self.doc_years.append(int(año))
+            self._spans.append((int(inicio), int(fin)))
+        if len(indices):
+            self._index_chunks.append(indices)
+        if destinos or documentos:
+            self._cache = None
+
+    def add(self, doc_id: str, año: int, citas: Iterable[Tuple[str, str]]) -> int:
+        """
+        Agrega (o reemplaza) las citas de una sentencia.
+
+        Args:
+            doc_id: Identificador de la sentencia.
+            año: Año de la sentencia (0 si se desconoce).
+            citas: Pares (tipo, texto) con tipo 'precedente' o 'norma'.
+
+        Returns:
+            El número de citas registradas.
+        """
+        return self.add_many([(doc_id, año, citas)])
+
+    def add_many(self, documentos: Iterable[Tuple[str, int, Iterable[Tuple[str, str]]]]) -> int:
+        """Agrega varias sentencias (doc_id, año, citas) con una sola toma del bloqueo."""
+        with open(self._path(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                with open(self._path(INDICES_FILE), "ab") as f:
+                    # Un registro incompleto de una escritura interrumpida se descarta
+                    f.truncate(f.seek(0, os.SEEK_END) // 4 * 4)
+                    inicio = f.seek(0, os.SEEK_END) // 4
+
+                nuevos_destinos: List[str] = []
+                lineas: List[str] = []
+                filas: List[np.ndarray] = []
+                for doc_id, año, citas in documentos:
+                    ids = []
+                    for tipo, texto in citas:
+                        texto = collapse_whitespace(texto)
+                        clave = _target_key(texto)
+                        if clave not in self._target_ids:
+                            self._target_ids[clave] = len(self.targets)
+                            self.targets.append((tipo, texto))
+                            nuevos_destinos.append(f"{tipo}\t{texto}\n")
+                        ids.append(self._target_ids[clave])
+                    fila = np.unique(np.asarray(ids, dtype="<u4"))
+                    doc_id = doc_id.replace("\t", " ").replace("\n", " ")
+                    lineas.append(f"{doc_id}\t{int(año)}\t{inicio}\t{inicio + len(fila)}\n")
+                    self.doc_ids.append(doc_id)
+                    self.doc_years.append(int(año))
+                    self._spans.append((inicio, inicio + len(fila)))
+                    filas.append(fila)
+                    inicio += len(fila)
+
+                # Destinos y citas antes que las filas que los usan
+                with open(self._path(TARGETS_FILE), "a", encoding="utf-8") as f:
+                    f.writelines(nuevos_destinos)
+                with open(self._path(INDICES_FILE), "ab") as f:
+                    for fila in filas:
+                        f.write(fila.tobytes())
+                with open(self._path(DOCS_FILE), "a", encoding="utf-8") as f:
+                    f.writelines(lineas)
+
+                for nombre in (TARGETS_FILE, INDICES_FILE, DOCS_FILE):
+                    self._leidos[nombre] = os.path.getsize(self._path(nombre))
+                self._index_chunks.extend(filas)
+                self._cache = None
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return sum(len(fila) for fila in filas)
+
+    def add_analysis(self, doc_id: str, resultado: Dict[str, Any]) -> int:
+        """Agrega las citas de un resultado de build_analysis (metadatos + normas detectadas)."""
+        año, citas = citations_from_analysis(resultado)
+        return self.add(doc_id, año, citas)
+
+    def _merge_chunks(self) -> np.ndarray:
+        if len(self._index_chunks) != 1:
+            self._index_chunks = [np.concatenate(self._index_chunks) if self._index_chunks else np.zeros(0, dtype=np.uint32)]
+        return self._index_chunks[0]
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        """CSR directo y transpuesto, restringidos a las filas vigentes."""
+        if self._cache is not None:
+            return self._cache
+        todas = self._merge_chunks()
+        filas = len(self.doc_ids)
+        spans = np.asarray(self._spans, dtype=np.int64).reshape(-1, 2)
+        longitudes = spans[:, 1] - spans[:, 0]
+        indptr = np.concatenate([[0], np.cumsum(longitudes)])
+        # CSR compacto: las citas de cada fila se copian contiguas (saltando las huérfanas)
+        posiciones = np.arange(indptr[-1]) + np.repeat(spans[:, 0] - indptr[:-1], longitudes)
+        indices = todas[posiciones]
+
+        # Solo la última fila de cada doc_id está vigente
+        ultima = {doc_id: fila for fila, doc_id in enumerate(self.doc_ids[:filas])}
+        vigente = np.zeros(filas, dtype=bool)
+        vigente[list(ultima.values())] = True
+
+        fila_de_arista = np.repeat(np.arange(filas), longitudes)
+        aristas_vigentes = vigente[fila_de_arista]
+        destinos = indices[aristas_vigentes].astype(np.int64)
+        origen = fila_de_arista[aristas_vigentes]
+
+        # Transpuesta: destino -> filas que lo citan (ordenamiento estable por destino)
+        num_destinos = len(self.targets)
+        conteo = np.bincount(destinos, minlength=num_destinos)
+        orden = np.argsort(destinos, kind="stable")
+        self._cache = {
+            "indptr": indptr,
+            "indices": indices,
+            "vigente": vigente,
+            "anios": np.asarray(self.doc_years[:filas], dtype=np.int32),
+            "arista_origen": origen,
+            "arista_destino": destinos,
+            "in_grado": conteo,
+            "t_indptr": np.concatenate([[0], np.cumsum(conteo)]),
+            "t_filas": origen[orden],
+            "es_precedente": np.asarray([tipo == TIPO_PRECEDENTE for tipo, _ in self.targets], dtype=bool),
+        }
+        return self._cache
+
+    def cited_by(self, doc_id: str) -> List[str]:
+        """Citas vigentes de una sentencia."""
+        a = self._arrays()
+        filas = [i for i, d in enumerate(self.doc_ids[:len(a["vigente"])]) if d == doc_id]
+        if not filas:
+            return []
+        fila = filas[-1]
+        return [self.targets[t][1] for t in a["indices"][a["indptr"][fila]:a["indptr"][fila + 1]]]
+
+    def most_cited(self, tipo: Optional[str] = None, año: Optional[int] = None, k: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ranking por grado de entrada (número de sentencias que citan cada destino).
+
+        Args:
+            tipo: 'precedente', 'norma' o None para ambos.
+            año: Contar solo las citas hechas por sentencias de ese año.
+            k: Número de resultados.
+
+        Returns:
+            Lista de {'cita', 'tipo', 'citada_por'} de mayor a menor.
+        """
+        a = self._arrays()
+        if año is None:
+            conteo = a["in_grado"].copy()
+        else:
+            del_año = a["anios"][a["arista_origen"]] == año
+            conteo = np.bincount(a["arista_destino"][del_año], minlength=len(self.targets))
+        if tipo is not None:
+            conteo[a["es_precedente"] != (tipo == TIPO_PRECEDENTE)] = 0
+
+        k = min(k, int(np.count_nonzero(conteo)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-conteo, k - 1)[:k]
+        top = top[np.argsort(-conteo[top], kind="stable")]
+        return [{"cita": self.targets[t][1], "tipo": self.targets[t][0], "citada_por": int(conteo[t])} for t in top]
+
+    def citing_all(self, citas: Iterable[str]) -> List[str]:
+        """Sentencias (vigentes) que citan todos los destinos indicados, p. ej. ['AP5342', 'ley 906 de 2004']."""
+        a = self._arrays()
+        resultado: Optional[np.ndarray] = None
+        for cita in citas:
+            t = self._target_ids.get(_target_key(cita))
+            if t is None or t >= len(a["in_grado"]):
+                return []
+            filas = a["t_filas"][a["t_indptr"][t]:a["t_indptr"][t + 1]]
+            resultado = filas if resultado is None else np.intersect1d(resultado, filas, assume_unique=True)
+            if not len(resultado):
+                return []
+        return [] if resultado is None else [self.doc_ids[f] for f in np.sort(resultado)]
@@ -0,0 +1,141 @@
+import os
+import struct
+import sqlite3
+import contextlib
+from typing import Dict, Any, List, Optional
+
+from utils.minhash import MinHasher, Signature, band_keys, estimate_jaccard, shingles
+from utils.settings import get_section, resolve_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS firmas (
+    doc_id TEXT PRIMARY KEY,
+    firma BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bandas (
+    banda INTEGER NOT NULL,
+    cubeta INTEGER NOT NULL,
+    doc_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bandas ON bandas (banda, cubeta);
+"""
+
+
+class CorpusDuplicateIndex:
+    """
+    Índice LSH persistente (SQLite) para detectar sentencias casi duplicadas al ingresar
+    al corpus, p. ej. la misma providencia recibida con distintos nombres de archivo.
+
+    Cada documento se reduce a una firma MinHash sobre 5-gramas de palabras. Solo se
+    guardan la firma y sus cubetas por banda, de modo que una consulta hace una búsqueda
+    indexada por banda y compara únicamente contra los candidatos: el costo no crece con
+    el número de pares del corpus.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None, threshold: Optional[float] = None):
+        dedup_config = get_section("dedup")
+        self.db_path = db_path or resolve_path(dedup_config.get("db_path", "outputs/corpus_dedup.sqlite3"))
+        self.num_perm = num_perm or int(dedup_config.get("num_perm", 128))
+        self.bands = bands or int(dedup_config.get("bands", 16))
+        self.threshold = threshold or float(dedup_config.get("threshold", 0.85))
+        if self.num_perm % self.bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self._hasher = MinHasher(num_perm=self.num_perm, seed=2027)
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # Transacciones explícitas (BEGIN IMMEDIATE): ver ingest()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def signature(self, text: str) -> Signature:
+        """Firma MinHash de un documento completo."""
+        return self._hasher.signature(shingles(text, k=5, unit="word"))
+
+    def find_duplicates(self, signature: Signature, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Busca documentos ya ingresados cuya similitud estimada supere el umbral.
+
+        Args:
+            signature: Firma del documento consultado.
+            exclude: doc_id a ignorar (el propio documento si se reingresa).
+
+        Returns:
+            Lista de {'doc_id', 'similitud'} ordenada de mayor a menor similitud.
+        """
+        candidatos = set()
+        for banda, cubeta in band_keys(signature, self.bands):
+            filas = self._conn.execute(
+                "SELECT doc_id FROM bandas WHERE banda = ? AND cubeta = ?", (banda, cubeta)
+            ).fetchall()
+            candidatos.update(fila[0] for fila in filas)
+        candidatos.discard(exclude)
+
+        duplicados = []
+        for doc_id in candidatos:
+            fila = self._conn.execute("SELECT firma FROM firmas WHERE doc_id = ?", (doc_id,)).fetchone()
+            if fila is None:
+                continue
+            similitud = estimate_jaccard(signature, _unpack(fila[0]))
+            if similitud >= self.threshold:
+                duplicados.append({"doc_id": doc_id, "similitud": round(similitud, 3)})
+
+        return sorted(duplicados, key=lambda d: d["similitud"], reverse=True)
+
+    def add(self, doc_id: str, signature: Signature):
+        """Registra (o reemplaza) la firma de un documento en el índice."""
+        with self._immediate():
+            self._insert(doc_id, signature)
+
+    def _insert(self, doc_id: str, signature: Signature):
+        self._conn.execute("DELETE FROM bandas WHERE doc_id = ?", (doc_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO firmas (doc_id, firma) VALUES (?, ?)", (doc_id, _pack(signature))
+        )
+        self._conn.executemany(
+            "INSERT INTO bandas (banda, cubeta, doc_id) VALUES (?, ?, ?)",
+            [(banda, cubeta, doc_id) for banda, cubeta in band_keys(signature, self.bands)],
+        )
+
+    @contextlib.contextmanager
+    def _immediate(self):
+        """Transacción 'BEGIN IMMEDIATE': toma el bloqueo de escritura desde el inicio."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def ingest(self, doc_id: str, text: str) -> List[Dict[str, Any]]:
+        """
+        Consulta los casi duplicados de un documento y luego lo agrega al índice, en una
+        sola transacción de escritura: dos workers que ingresan a la vez dos copias del
+        mismo documento no pueden dejar de verse uno al otro.
+
+        Args:
+            doc_id: Identificador del documento (p. ej. el nombre del archivo).
+            text: El texto completo del documento.
+
+        Returns:
+            Los documentos previos casi duplicados (ver find_duplicates).
+        """
+        firma = self.signature(text)
+        with self._immediate():
+            duplicados = self.find_duplicates(firma, exclude=doc_id)
+            self._insert(doc_id, firma)
+        return duplicados
+
+
+def _pack(signature: Signature) -> bytes:
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def _unpack(blob: bytes) -> Signature:
+    return struct.unpack(f"<{len(blob) // 4}I", blob)
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from nlp.entity_resolution import CATEGORIAS, Tokens, blocking_keys, completeness, match_score, name_tokens
+from utils.settings import get_section, resolve_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entidades (
+    id TEXT PRIMARY KEY,
+    categoria TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    tokens TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bloques (
+    clave TEXT NOT NULL,
+    entidad_id TEXT NOT NULL,
+    PRIMARY KEY (clave, entidad_id)
+);
+CREATE TABLE IF NOT EXISTS alias (
+    local_id TEXT PRIMARY KEY,
+    entidad_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS menciones (
+    doc_id TEXT NOT NULL,
+    entidad_id TEXT NOT NULL,
+    PRIMARY KEY (doc_id, entidad_id)
+);
+CREATE INDEX IF NOT EXISTS idx_menciones_entidad ON menciones (entidad_id);
+"""
+
+
+class EntityRegistry:
+    """
+    Registro persistente (SQLite) de las entidades del corpus: une las entidades que
+    resolvió cada documento (nlp.entity_resolution) bajo un id del corpus.
+
+    Cada id de documento se guarda como alias de su id del corpus, de modo que el mismo
+    nombre canónico en otra sentencia se resuelve con una sola búsqueda (salvo los nombres
+    de persona con 'min_tokens' tokens completos o menos, que se comparan cada vez). Un nombre de
+    persona nuevo se compara solo con las entidades de sus bloques (un token o la cadena
+    de iniciales); los bloques con más de 'max_bloque' entidades (nombres de pila
+    frecuentes) se ignoran, así que el costo por documento no crece con el corpus. Entre
+    documentos se exige que coincidan al menos 'min_tokens' tokens completos: un
+    apellido suelto no basta para unir dos sentencias.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bloque: Optional[int] = None,
+                 min_tokens: Optional[int] = None):
+        config = get_section("entity_registry")
+        self.db_path = db_path or resolve_path(config.get("db_path", "outputs/corpus_entidades.sqlite3"))
+        self.max_bloque = max_bloque or int(config.get("max_bloque", 200))
+        self.min_tokens = min_tokens or int(config.get("min_tokens", 2))
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # Transacciones explícitas (BEGIN IMMEDIATE): dos workers no crean la misma entidad
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entidades").fetchone()[0]
+
+    def _candidates(self, categoria: str, tokens: Tokens) -> List[str]:
+        candidatos = set()
+        for clave in blocking_keys(tokens):
+            filas = self._conn.execute(
+                "SELECT entidad_id FROM bloques WHERE clave = ? LIMIT ?", (f"{categoria}:{clave}", self.max_bloque + 1)
+            ).fetchall()
+            if len(filas) <= self.max_bloque:
+                candidatos.update(fila[0] for fila in filas)
+        return sorted(candidatos)
+
+    def _match(self, categoria: str, tokens: Tokens) -> Optional[str]:
+        """Id del corpus de la única entidad compatible con más tokens en común, si la hay."""
+        puntajes = []
+        for entidad_id in self._candidates(categoria, tokens):
+            fila = self._conn.execute("SELECT tokens FROM entidades WHERE id = ?", (entidad_id,)).fetchone()
+            puntaje = match_score(tokens, tuple(fila[0].split()))
+            if puntaje >= self.min_tokens:
+                puntajes.append((puntaje, entidad_id))
+        mejor = max((p for p, _ in puntajes), default=0)
+        ganadoras = [entidad_id for p, entidad_id in puntajes if p == mejor]
+        return ganadoras[0] if len(ganadoras) == 1 else None
+
+    def _insert(self, entidad_id: str, categoria: str, nombre: str, tokens: Tokens):
+        self._conn.execute("INSERT OR REPLACE INTO entidades (id, categoria, nombre, tokens) VALUES (?, ?, ?, ?)",
+                           (entidad_id, categoria, nombre, " ".join(tokens)))
+        self._conn.executemany("INSERT OR IGNORE INTO bloques (clave, entidad_id) VALUES (?, ?)",
+                               [(f"{categoria}:{clave}", entidad_id) for clave in blocking_keys(tokens)])
+
+    def _resolve(self, categoria: str, entidad: Dict[str, Any]) -> str:
+        fila = self._conn.execute("SELECT entidad_id FROM alias WHERE local_id = ?", (entidad["id"],)).fetchone()
+        if fila is not None:
+            return fila[0]
+
+        tokens = name_tokens(entidad["nombre"], categoria)
+        # Organizaciones y lugares solo se unen por nombre igual (ya resuelto por el alias)
+        corpus_id = self._match(categoria, tokens) if categoria == "PERSONAS" else None
+        if corpus_id is None:
+            corpus_id = entidad["id"]
+            self._insert(corpus_id, categoria, entidad["nombre"], tokens)
+        else:
+            actual = self._conn.execute("SELECT tokens FROM entidades WHERE id = ?", (corpus_id,)).fetchone()[0]
+            if completeness(tokens) > completeness(tuple(actual.split())):
+                # El nombre más completo pasa a ser el canónico (y suma sus claves de bloqueo)
+                self._insert(corpus_id, categoria, entidad["nombre"], tokens)
+        # El alias fija la entidad para siempre. Un nombre de persona corto ('Mario Benavides')
+        # se vuelve a comparar en cada documento: otra persona compatible que llegue después
+        # lo vuelve ambiguo
+        if categoria != "PERSONAS" or completeness(tokens)[0] > self.min_tokens:
+            self._conn.execute("INSERT OR IGNORE INTO alias (local_id, entidad_id) VALUES (?, ?)",
+                               (entidad["id"], corpus_id))
+        return corpus_id
+
+    def add_analysis(self, doc_id: str, resultado: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Asigna a cada entidad resuelta de un análisis su id del corpus ('id_corpus',
+        agregado en el mismo resultado) y registra sus menciones en el documento.
+
+        Returns:
+            'entidades_resueltas' del resultado, con 'id_corpus'.
+        """
+        resueltas = resultado.get("entidades_resueltas") or {}
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DELETE FROM menciones WHERE doc_id = ?", (doc_id,))
+            for categoria, entidades in resueltas.items():
+                if categoria not in CATEGORIAS:
+                    continue
+                for entidad in entidades:
+                    entidad["id_corpus"] = self._resolve(categoria, entidad)
+                    self._conn.execute("INSERT OR IGNORE INTO menciones (doc_id, entidad_id) VALUES (?, ?)",
+                                       (doc_id, entidad["id_corpus"]))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return resueltas
+
+    def search(self, nombre: str, categoria: str = "PERSONAS") -> List[Dict[str, Any]]:
+        """Entidades del corpus compatibles con un nombre, con el número de sentencias que las mencionan."""
+        tokens = name_tokens(nombre, categoria)
+        resultados = []
+        for entidad_id in self._candidates(categoria, tokens):
+            nombre_canonico, tokens_canonicos = self._conn.execute(
+                "SELECT nombre, tokens FROM entidades WHERE id = ?", (entidad_id,)
+            ).fetchone()
+            compatible = match_score(tokens, tuple(tokens_canonicos.split())) if categoria == "PERSONAS" \
+                else int(tokens == tuple(tokens_canonicos.split()))
+            if compatible:
+                documentos = self._conn.execute(
+                    "SELECT COUNT(*) FROM menciones WHERE entidad_id = ?", (entidad_id,)
+                ).fetchone()[0]
+                resultados.append({"id": entidad_id, "nombre": nombre_canonico, "sentencias": documentos})
+        return sorted(resultados, key=lambda r: (-r["sentencias"], r["nombre"]))
+
+    def documents(self, entidad_id: str) -> List[str]:
+        """Sentencias que mencionan una entidad del corpus."""
+        filas = self._conn.execute("SELECT doc_id FROM menciones WHERE entidad_id = ? ORDER BY doc_id", (entidad_id,))
+        return [fila[0] for fila in filas]
@@ -0,0 +1,151 @@
+import os
+import mmap
+import fcntl
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+from utils.settings import get_section, resolve_path
+
+# Cada registro del índice: desplazamiento y longitud (en bytes) del texto en 'textos.bin'.
+_INDEX_RECORD = struct.Struct("<QQ")
+
+DATA_FILE = "textos.bin"
+INDEX_FILE = "indice.bin"
+IDS_FILE = "ids.txt"
+LOCK_FILE = ".lock"
+
+
+def default_store_dir() -> str:
+    """Directorio del almacén según 'config.json' (sección 'text_store')."""
+    return resolve_path(get_section("text_store").get("dir", "outputs/corpus_textos"))
+
+
+class TextStoreWriter:
+    """
+    Escritor del almacén de textos del corpus: un archivo de datos de solo-anexado con el
+    texto limpio de cada sentencia, un índice de registros de tamaño fijo y la lista de ids.
+
+    El texto se escribe antes que su registro de índice; si el proceso muere en medio,
+    el texto huérfano simplemente no es visible. Si muere entre el registro de índice y
+    el id, el siguiente append recorta el índice y los ids a la misma cantidad de
+    documentos antes de anexar, para que la posición N del índice y la línea N de los ids
+    sigan siendo el mismo documento. Varios procesos pueden anexar a la vez gracias a un
+    bloqueo flock sobre el directorio.
+    """
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = store_dir or default_store_dir()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def append(self, doc_id: str, text: str) -> int:
+        """
+        Anexa el texto de un documento.
+
+        Args:
+            doc_id: Identificador del documento (p. ej. el nombre del archivo). No debe
+                    contener saltos de línea.
+            text: El texto limpio de la sentencia.
+
+        Returns:
+            La posición del documento en el almacén.
+        """
+        data = text.encode("utf-8")
+        doc_id = doc_id.replace("\n", " ")
+
+        with open(os.path.join(self.store_dir, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                posicion = self._repair()
+                with open(os.path.join(self.store_dir, DATA_FILE), "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(data)
+                with open(os.path.join(self.store_dir, INDEX_FILE), "ab") as f:
+                    f.write(_INDEX_RECORD.pack(offset, len(data)))
+                with open(os.path.join(self.store_dir, IDS_FILE), "ab") as f:
+                    f.write(doc_id.encode("utf-8") + b"\n")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return posicion
+
+    def _repair(self) -> int:
+        """
+        Recorta el índice y los ids (incluidos registros o líneas a medio escribir) a la
+        menor de sus dos cantidades de documentos. Se llama con el bloqueo tomado.
+
+        Returns:
+            El número de documentos del almacén (la posición del próximo).
+        """
+        ruta_indice = os.path.join(self.store_dir, INDEX_FILE)
+        ruta_ids = os.path.join(self.store_dir, IDS_FILE)
+        registros = os.path.getsize(ruta_indice) // _INDEX_RECORD.size if os.path.exists(ruta_indice) else 0
+        ids = b""
+        if os.path.exists(ruta_ids):
+            with open(ruta_ids, "rb") as f:
+                ids = f.read()
+        lineas = ids.count(b"\n")
+        documentos = min(registros, lineas)
+
+        if os.path.exists(ruta_indice) and os.path.getsize(ruta_indice) != documentos * _INDEX_RECORD.size:
+            os.truncate(ruta_indice, documentos * _INDEX_RECORD.size)
+        # Lo que queda después de la línea número 'documentos' sobra
+        fin = len(ids) - len(ids.split(b"\n", documentos)[-1])
+        if len(ids) != fin:
+            os.truncate(ruta_ids, fin)
+        return documentos
+
+
+class TextStore:
+    """
+    Lector del almacén a través de mmap: abrir el almacén no lee los textos y cada
+    documento se decodifica directamente de las páginas mapeadas (compartidas por el
+    sistema operativo entre todos los procesos que leen el mismo corpus).
+    """
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = store_dir or default_store_dir()
+        self._data_file = open(os.path.join(self.store_dir, DATA_FILE), "rb")
+        self._index_file = open(os.path.join(self.store_dir, INDEX_FILE), "rb")
+        self._data = _mmap_or_empty(self._data_file)
+        self._index = _mmap_or_empty(self._index_file)
+
+        # Solo '\n' separa los ids (splitlines también cortaría en '\r', '\x85' o '\u2028')
+        with open(os.path.join(self.store_dir, IDS_FILE), "rb") as f:
+            self._ids: List[str] = f.read().decode("utf-8").split("\n")[:-1]
+
+        # Un registro de índice sin id (escritura interrumpida) no se expone
+        self._count = min(len(self._index) // _INDEX_RECORD.size, len(self._ids))
+
+    def close(self):
+        for recurso in (self._data, self._index, self._data_file, self._index_file):
+            recurso.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def doc_id(self, posicion: int) -> str:
+        return self._ids[posicion]
+
+    def get(self, posicion: int) -> str:
+        """Retorna el texto del documento en la posición indicada."""
+        if not 0 <= posicion < self._count:
+            raise IndexError(f"Posición fuera del almacén: {posicion}")
+        offset, longitud = _INDEX_RECORD.unpack_from(self._index, posicion * _INDEX_RECORD.size)
+        return self._data[offset:offset + longitud].decode("utf-8")
+
+    def iter_range(self, inicio: int = 0, fin: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """Itera (doc_id, texto) para las posiciones [inicio, fin)."""
+        fin = self._count if fin is None else min(fin, self._count)
+        for posicion in range(inicio, fin):
+            yield self._ids[posicion], self.get(posicion)
+
+
+def _mmap_or_empty(f) -> mmap.mmap:
+    """mmap de solo lectura; un archivo vacío no se puede mapear, así que se usa un buffer vacío."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return _EmptyBuffer()
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _EmptyBuffer(bytes):
+    def close(self):
+        pass
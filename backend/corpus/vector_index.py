@@ -0,0 +1,296 @@
+import os
+import json
+import fcntl
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.settings import get_section, resolve_path
+
+# Secciones de cada sentencia que se indexan para la búsqueda de precedentes similares.
+INDEXED_SECTIONS = ("asunto", "consideraciones", "fallo")
+
+VECTORS_FILE = "vectores.f16"   # una fila float16 por sección
+SIGNATURES_FILE = "firmas.u64"  # firma de proyección aleatoria (BITS bits) por fila
+IDS_FILE = "ids.tsv"            # doc_id \t sección por fila
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+# Bits de la firma de cada fila (múltiplo de 64). Con 128 bits, dos secciones con
+# coseno 0.6 difieren en promedio en ~38 bits frente a 64 de dos secciones al azar.
+BITS = 128
+
+
+def default_index_dir() -> str:
+    """Directorio del índice según 'config.json' (sección 'vector_index')."""
+    return resolve_path(get_section("vector_index").get("dir", "outputs/corpus_vectores"))
+
+
+# --- Vectores de sección a partir de los vectores de palabras del modelo ---
+
+_centro: Optional[np.ndarray] = None
+
+
+def embed_text(text: str) -> Optional[np.ndarray]:
+    """
+    Vector de un texto: promedio de los vectores de es_core_news_md de sus palabras
+    (sin stopwords), centrado con el vector medio del vocabulario y normalizado.
+
+    Solo se tokeniza (nlp.make_doc): no se ejecuta el pipeline, así que indexar el
+    corpus no cuesta un análisis completo por sección.
+
+    Returns:
+        Un vector float32 de norma 1, o None si ninguna palabra tiene vector.
+    """
+    global _centro
+    from nlp.nlp_utils import get_nlp_model
+
+    nlp = get_nlp_model()
+    vectores = nlp.vocab.vectors
+    if _centro is None:
+        _centro = np.asarray(vectores.data, dtype=np.float32).mean(axis=0)
+
+    claves = [t.orth for t in nlp.make_doc(text) if t.is_alpha and not t.is_stop]
+    if not claves:
+        return None
+    filas = vectores.find(keys=np.asarray(claves, dtype=np.uint64))
+    filas = filas[filas >= 0]
+    if not len(filas):
+        return None
+
+    vector = np.asarray(vectores.data[filas], dtype=np.float32).mean(axis=0) - _centro
+    norma = np.linalg.norm(vector)
+    return vector / norma if norma else None
+
+
+# --- Índice ---
+
+def _hyperplanes(dim: int, bits: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((dim, bits)).astype(np.float32)
+
+
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(palabras: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(palabras)
+    bytes_ = np.ascontiguousarray(palabras).view(np.uint8)
+    return _POPCOUNT_8[bytes_].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def _hamming(firmas: np.ndarray, firma: np.ndarray) -> np.ndarray:
+    """
+    Distancia de Hamming de cada firma (fila de uint64) a la firma de consulta.
+    Se acumula palabra por palabra: sumar a lo largo del eje 1 es varias veces más lento.
+    """
+    distancias = _popcount(np.bitwise_xor(firmas[:, 0], firma[0]))
+    for i in range(1, firmas.shape[1]):
+        distancias += _popcount(np.bitwise_xor(firmas[:, i], firma[i]))
+    return distancias
+
+
+def _nearest_rows(distancias: np.ndarray, candidatos: int) -> np.ndarray:
+    """
+    Índices de las 'candidatos' filas de menor distancia (en orden de fila). Como las
+    distancias son enteros pequeños, un histograma da el umbral en tiempo lineal sin
+    ordenar (argpartition sobre 500k filas cuesta varias veces más).
+    """
+    acumulado = np.cumsum(np.bincount(distancias))
+    umbral = int(np.searchsorted(acumulado, candidatos))
+    filas = np.flatnonzero(distancias < umbral)
+    empatadas = np.flatnonzero(distancias == umbral)[:candidatos - len(filas)]
+    return np.sort(np.concatenate([filas, empatadas]))
+
+
+def _signatures(vectores: np.ndarray, planos: np.ndarray) -> np.ndarray:
+    """Firma por fila: el bit i indica de qué lado del hiperplano i cae el vector."""
+    bits = (vectores.astype(np.float32) @ planos) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view("<u8")
+
+
+class VectorIndex:
+    """
+    Índice aproximado de vecinos más cercanos sobre los vectores de las secciones.
+
+    Los vectores se guardan como una matriz float16 de solo-anexado y cada fila tiene
+    una firma de BITS bits de proyecciones aleatorias (hiperplanos). Una consulta ordena
+    todas las firmas por distancia de Hamming a la suya (XOR + conteo de bits sobre un
+    arreglo contiguo de uint64), toma los 'candidatos' más cercanos y solo sobre ellos
+    calcula el coseno exacto. Ambos archivos se abren con np.memmap: cargar el índice
+    no lee los vectores, y varios procesos comparten las mismas páginas.
+
+    Agregar secciones solo anexa filas (bajo flock), de modo que el índice crece de
+    forma incremental sin reconstruirse.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, dim: Optional[int] = None, seed: int = 37):
+        self.index_dir = index_dir or default_index_dir()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        meta_path = os.path.join(self.index_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            if dim is None:
+                from nlp.nlp_utils import get_nlp_model
+                dim = get_nlp_model().vocab.vectors.shape[1]
+            meta = {"dim": dim, "bits": BITS, "seed": seed}
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        self.dim: int = meta["dim"]
+        self._palabras = meta["bits"] // 64  # uint64 por firma
+        self._planos = _hyperplanes(self.dim, meta["bits"], meta["seed"])
+        self._vectores: np.ndarray = np.zeros((0, self.dim), dtype=np.float16)
+        self._firmas: np.ndarray = np.zeros((0, self._palabras), dtype="<u8")
+        self._ids: List[Tuple[str, str]] = []
+        self._codigos_seccion: Dict[str, int] = {}
+        self._secciones = np.zeros(0, dtype=np.int16)  # código de la sección de cada fila
+        self._ids_leidos = 0  # bytes de ids.tsv ya leídos
+        self._total = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._total
+
+    def doc_ids(self) -> Set[str]:
+        """Documentos que ya tienen secciones en el índice."""
+        return {doc_id for doc_id, _ in self._ids[:self._total]}
+
+    def _path(self, nombre: str) -> str:
+        return os.path.join(self.index_dir, nombre)
+
+    def _rows(self, nombre: str, bytes_por_fila: int) -> int:
+        ruta = self._path(nombre)
+        return os.path.getsize(ruta) // bytes_por_fila if os.path.exists(ruta) else 0
+
+    def refresh(self):
+        """Vuelve a mapear los archivos si otro proceso agregó filas."""
+        # Solo se leen las líneas completas agregadas desde la última vez
+        with open(self._path(IDS_FILE), "ab+") as f:
+            f.seek(self._ids_leidos)
+            nuevos = f.read()
+        completos = nuevos[:nuevos.rfind(b"\n") + 1]
+        self._ids_leidos += len(completos)
+        agregados = [tuple(linea.split("\t", 1)) for linea in completos.decode("utf-8").split("\n")[:-1]]
+        self._ids.extend(agregados)
+        codigos = [self._codigos_seccion.setdefault(nombre, len(self._codigos_seccion)) for _, nombre in agregados]
+        self._secciones = np.concatenate([self._secciones, np.array(codigos, dtype=np.int16)])
+
+        # Una fila sin id (escritura interrumpida) no se expone
+        total = min(len(self._ids), self._rows(VECTORS_FILE, 2 * self.dim), self._rows(SIGNATURES_FILE, 8 * self._palabras))
+
+        if total:
+            self._vectores = np.memmap(self._path(VECTORS_FILE), dtype=np.float16, mode="r", shape=(total, self.dim))
+            self._firmas = np.memmap(self._path(SIGNATURES_FILE), dtype="<u8", mode="r", shape=(total, self._palabras))
+        self._total = total
+
+    def add_many(self, items: Iterable[Tuple[str, str, np.ndarray]]) -> int:
+        """
+        Anexa vectores al índice.
+
+        Args:
+            items: Tuplas (doc_id, sección, vector de dimensión dim).
+
+        Returns:
+            El número de filas agregadas.
+        """
+        items = [(doc_id, seccion, v) for doc_id, seccion, v in items if v is not None]
+        if not items:
+            return 0
+        matriz = np.vstack([v for _, _, v in items]).astype(np.float32)
+        firmas = _signatures(matriz, self._planos)
+
+        with open(self._path(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._repair()
+                with open(self._path(VECTORS_FILE), "ab") as f:
+                    f.write(matriz.astype(np.float16).tobytes())
+                with open(self._path(SIGNATURES_FILE), "ab") as f:
+                    f.write(firmas.tobytes())
+                with open(self._path(IDS_FILE), "ab") as f:
+                    for doc_id, seccion, _ in items:
+                        doc_id = doc_id.replace("\t", " ").replace("\n", " ")
+                        f.write(f"{doc_id}\t{seccion}\n".encode("utf-8"))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        self.refresh()
+        return len(items)
+
+    def _repair(self):
+        """
+        Recorta vectores, firmas e ids a la cantidad de filas que tienen los tres: una
+        escritura interrumpida (p. ej. vectores escritos sin sus firmas) dejaría la fila i
+        de cada archivo en un documento distinto. Se llama con el bloqueo tomado; como los
+        ids se escriben al final, un lector nunca ha visto las filas que se recortan.
+        """
+        ids = b""
+        if os.path.exists(self._path(IDS_FILE)):
+            with open(self._path(IDS_FILE), "rb") as f:
+                ids = f.read()
+        tamanos = {VECTORS_FILE: 2 * self.dim, SIGNATURES_FILE: 8 * self._palabras}
+        filas = min([ids.count(b"\n")] + [self._rows(nombre, tamano) for nombre, tamano in tamanos.items()])
+
+        for nombre, tamano in tamanos.items():
+            ruta = self._path(nombre)
+            if os.path.exists(ruta) and os.path.getsize(ruta) != filas * tamano:
+                os.truncate(ruta, filas * tamano)
+        fin = len(ids) - len(ids.split(b"\n", filas)[-1])
+        if len(ids) != fin:
+            os.truncate(self._path(IDS_FILE), fin)
+
+    def add_sections(self, doc_id: str, secciones: Dict[str, str]) -> int:
+        """Calcula y anexa los vectores de las secciones indexadas de una sentencia."""
+        return self.add_many(
+            (doc_id, seccion, embed_text(secciones[seccion]))
+            for seccion in INDEXED_SECTIONS if secciones.get(seccion)
+        )
+
+    def query(self, vector: np.ndarray, k: int = 10, candidatos: Optional[int] = None,
+              seccion: Optional[str] = None) -> List[Dict[str, object]]:
+        """
+        Busca las secciones más parecidas a un vector.
+
+        Args:
+            vector: Vector de consulta (p. ej. embed_text de las consideraciones).
+            k: Número de resultados.
+            candidatos: Filas más cercanas por firma sobre las que se calcula el coseno
+                        exacto (sección 'vector_index', por defecto 2000).
+            seccion: Limitar los resultados a una sección ('consideraciones', ...).
+
+        Returns:
+            Lista de {'doc_id', 'seccion', 'similitud'} ordenada de mayor a menor similitud.
+        """
+        total = self._total
+        if not total or vector is None:
+            return []
+        candidatos = candidatos or int(get_section("vector_index").get("candidatos", 2000))
+
+        consulta = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        firma = _signatures(consulta, self._planos)[0]
+        distancias = _hamming(self._firmas, firma)
+
+        # El filtro por sección va antes del corte de candidatos: así los 'candidatos'
+        # más cercanos son todos de la sección pedida
+        validas = np.arange(total)
+        if seccion:
+            if seccion not in self._codigos_seccion:
+                return []
+            validas = np.flatnonzero(self._secciones[:total] == self._codigos_seccion[seccion])
+            distancias = distancias[validas]
+
+        # Filas en orden creciente: lectura secuencial del memmap
+        filas = validas[_nearest_rows(distancias, candidatos)] if candidatos < len(validas) else validas
+
+        similitudes = np.asarray(self._vectores[filas], dtype=np.float32) @ consulta[0]
+        orden = np.argsort(-similitudes)[:k]
+
+        resultados: List[Dict[str, object]] = []
+        for i in orden:
+            doc_id, nombre = self._ids[filas[i]]
+            resultados.append({"doc_id": doc_id, "seccion": nombre, "similitud": round(float(similitudes[i]), 4)})
+        return resultados
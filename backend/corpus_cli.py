@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from typing import List, Optional, Tuple
+
+from corpus.text_store import TextStore, TextStoreWriter, default_store_dir
+
+# Configurar el logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Etapas que solo usan expresiones regulares: se pueden re-ejecutar sobre todo el corpus
+# sin spaCy ni extracción de PDF.
+REGEX_FIELDS = ("metadata", "normas", "fallo", "classification")
+
+
+# --- ingest: extraer una vez y guardar el texto limpio en el almacén ---
+
+def cmd_ingest(args: argparse.Namespace):
+    """Extrae el texto de cada archivo, lo limpia y lo anexa al almacén del corpus."""
+    from analyzer.extractor import extract_text_from_document
+    from utils.text_cleaning import clean_text
+
+    writer = TextStoreWriter(args.store)
+    for archivo in args.archivos:
+        texto = extract_text_from_document(archivo)
+        if not texto.strip():
+            logger.warning(f"Sin texto extraíble, se omite: {archivo}")
+            continue
+        posicion = writer.append(os.path.basename(archivo), clean_text(texto))
+        logger.info(f"📥 {archivo} → posición {posicion}")
+
+
+# --- rerun: re-ejecutar las reglas sobre el almacén ---
+
+_store: Optional[TextStore] = None
+_fields: Tuple[str, ...] = REGEX_FIELDS
+
+
+def _init_rerun_worker(store_dir: str, fields: Tuple[str, ...]):
+    """Cada proceso abre (mapea) el almacén una sola vez."""
+    global _store, _fields
+    _store = TextStore(store_dir)
+    _fields = fields
+
+
+def _rerun_range(rango: Tuple[int, int]) -> List[str]:
+    """Aplica las etapas pedidas a los documentos de un rango y retorna líneas JSON."""
+    from analyzer.executor import AnalysisRun
+
+    lineas = []
+    for doc_id, texto in _store.iter_range(*rango):
+        run = AnalysisRun.from_clean_text(texto).compute(_fields)
+        resultado = run.to_result()
+        resultado.pop("secciones", None)
+        # La versión de las reglas permite saber qué resultados quedaron desactualizados
+        lineas.append(json.dumps({"doc_id": doc_id, "version_reglas": run.rules_version, **resultado}, ensure_ascii=False))
+    return lineas
+
+
+def cmd_rerun(args: argparse.Namespace):
+    """Re-ejecuta las etapas de reglas sobre todo el almacén, en paralelo, y escribe JSONL."""
+    fields = tuple(f.strip() for f in args.fields.split(",") if f.strip())
+    store = TextStore(args.store)
+    total = len(store)
+    store.close()
+
+    rangos = [(inicio, min(inicio + args.chunk, total)) for inicio in range(0, total, args.chunk)]
+    inicio = time.time()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as salida, multiprocessing.Pool(
+        args.workers, initializer=_init_rerun_worker, initargs=(args.store, fields)
+    ) as pool:
+        # imap conserva el orden del almacén en la salida
+        for lineas in pool.imap(_rerun_range, rangos):
+            for linea in lineas:
+                salida.write(linea + "\n")
+
+    duracion = time.time() - inicio
+    logger.info(f"✅ {total} documentos en {duracion:.1f}s ({total / max(duracion, 1e-9):.0f} docs/s) → {args.out}")
+
+
+# --- index / similar: búsqueda de precedentes por similitud semántica ---
+
+def cmd_index(args: argparse.Namespace):
+    """Agrega al índice vectorial las secciones de los documentos del almacén aún no indexados."""
+    from analyzer.executor import AnalysisRun
+    from corpus.vector_index import VectorIndex
+
+    indice = VectorIndex(args.index)
+    indexados = indice.doc_ids()
+    store = TextStore(args.store)
+    inicio, agregadas = time.time(), 0
+    for doc_id, texto in store.iter_range():
+        if doc_id in indexados:
+            continue
+        secciones = AnalysisRun.from_clean_text(texto).get("segment")
+        agregadas += indice.add_sections(doc_id, secciones)
+    store.close()
+    logger.info(f"✅ {agregadas} secciones agregadas en {time.time() - inicio:.1f}s; índice con {len(indice)} secciones")
+
+
+def cmd_similar(args: argparse.Namespace):
+    """Busca las sentencias cuyas secciones se parecen a las de un documento."""
+    from analyzer.executor import run_analysis
+    from analyzer.extractor import extract_text_from_document
+    from corpus.vector_index import VectorIndex, embed_text
+
+    secciones = run_analysis(extract_text_from_document(args.archivo), ["segment"])["secciones"]
+    texto = secciones.get(args.seccion) or "\n".join(secciones.values())
+
+    indice = VectorIndex(args.index)
+    inicio = time.time()
+    resultados = indice.query(embed_text(texto), k=args.k, seccion=args.seccion)
+    logger.info(f"🔎 Consulta sobre {len(indice)} secciones en {(time.time() - inicio) * 1000:.1f} ms")
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
+
+
+# --- citas: grafo de precedentes y normas citadas ---
+
+def cmd_citas_add(args: argparse.Namespace):
+    """Agrega al grafo de citas los resultados de un JSONL de 'rerun' (con metadata y normas)."""
+    from corpus.citation_graph import CitationGraph, citations_from_analysis
+
+    grafo = CitationGraph(args.graph)
+    inicio, lote, citas = time.time(), [], 0
+    with open(args.jsonl, "r", encoding="utf-8") as f:
+        for linea in f:
+            resultado = json.loads(linea)
+            lote.append((resultado["doc_id"], *citations_from_analysis(resultado)))
+            if len(lote) >= args.chunk:
+                citas += grafo.add_many(lote)
+                lote = []
+    citas += grafo.add_many(lote)
+    logger.info(f"✅ {citas} citas agregadas en {time.time() - inicio:.1f}s; grafo con {len(grafo)} sentencias")
+
+
+def cmd_citas_top(args: argparse.Namespace):
+    """Precedentes o normas más citados, opcionalmente en un año."""
+    from corpus.citation_graph import CitationGraph
+
+    grafo = CitationGraph(args.graph)
+    inicio = time.time()
+    resultados = grafo.most_cited(args.tipo, args.anio, args.k)
+    logger.info(f"🔎 Consulta sobre {len(grafo)} sentencias en {(time.time() - inicio) * 1000:.1f} ms")
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
+
+
+def cmd_citas_comunes(args: argparse.Namespace):
+    """Sentencias que citan todas las referencias dadas."""
+    from corpus.citation_graph import CitationGraph
+
+    grafo = CitationGraph(args.graph)
+    print(json.dumps(grafo.citing_all(args.citas), ensure_ascii=False, indent=2))
+
+
+# --- entidades: resolución de entidades entre sentencias ---
+
+def cmd_entidades_add(args: argparse.Namespace):
+    """Registra las entidades resueltas de análisis ya guardados y les asigna su id del corpus."""
+    from corpus.analytics import expand_paths
+    from corpus.entity_registry import EntityRegistry
+
+    registro = EntityRegistry(args.db)
+    inicio, documentos = time.time(), 0
+    for archivo in expand_paths(args.rutas):
+        if archivo.endswith(".jsonl"):
+            with open(archivo, "r", encoding="utf-8") as f:
+                for linea in f:
+                    resultado = json.loads(linea)
+                    registro.add_analysis(resultado["doc_id"], resultado)
+                    documentos += 1
+            continue
+        with open(archivo, "r", encoding="utf-8") as f:
+            resultado = json.load(f)
+        registro.add_analysis(os.path.basename(archivo).replace("_analisis.json", ""), resultado)
+        documentos += 1
+        if args.actualizar:
+            with open(archivo, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+    logger.info(f"✅ {documentos} análisis en {time.time() - inicio:.1f}s; registro con {len(registro)} entidades")
+
+
+def cmd_entidades_buscar(args: argparse.Namespace):
+    """Entidades del corpus compatibles con un nombre y las sentencias que las mencionan."""
+    from corpus.entity_registry import EntityRegistry
+
+    registro = EntityRegistry(args.db)
+    resultados = registro.search(args.nombre, args.categoria)
+    for resultado in resultados[:args.k]:
+        resultado["documentos"] = registro.documents(resultado["id"])
+    print(json.dumps(resultados[:args.k], ensure_ascii=False, indent=2))
+
+
+# --- stats: estadísticas del corpus en memoria constante ---
+
+def _fold_files(archivos: List[str]) -> dict:
+    """Pliega los análisis de unos archivos en un agregado parcial (serializado para volver al padre)."""
+    from corpus.analytics import CorpusStats, iter_analyses
+
+    stats = CorpusStats()
+    for resultado in iter_analyses(archivos):
+        stats.add(resultado)
+    return stats.to_dict()
+
+
+def _print_stats(stats, args: argparse.Namespace):
+    if args.out:
+        stats.save(args.out)
+        logger.info(f"💾 Agregado guardado en {args.out} (se puede combinar con 'stats-merge')")
+    print(json.dumps(stats.report(args.k), ensure_ascii=False, indent=2))
+
+
+def cmd_stats(args: argparse.Namespace):
+    """Pliega los análisis en un agregado (en paralelo por archivos) e imprime el informe."""
+    from corpus.analytics import CorpusStats, expand_paths
+
+    archivos = expand_paths(args.rutas)
+    partes = [archivos[i:i + args.chunk] for i in range(0, len(archivos), args.chunk)]
+    inicio = time.time()
+    stats = CorpusStats()
+    with multiprocessing.Pool(args.workers) as pool:
+        for parcial in pool.imap_unordered(_fold_files, partes):
+            stats.merge(CorpusStats.from_dict(parcial))
+    logger.info(f"📊 {stats.documentos} análisis de {len(archivos)} archivos en {time.time() - inicio:.1f}s")
+    _print_stats(stats, args)
+
+
+def cmd_stats_merge(args: argparse.Namespace):
+    """Combina agregados guardados con 'stats --out' (p. ej. uno por nodo o por mes)."""
+    from corpus.analytics import CorpusStats
+
+    stats = CorpusStats.load(args.agregados[0])
+    for ruta in args.agregados[1:]:
+        stats.merge(CorpusStats.load(ruta))
+    _print_stats(stats, args)
+
+
+# --- tipos: clasificador del tipo de providencia sobre n-gramas con hashing ---
+
+def _labeled_texts(args: argparse.Namespace) -> Tuple[List[str], List[str]]:
+    """
+    Textos y etiquetas de entrenamiento: la etiqueta es el campo 'args.campo' de cada
+    análisis; el texto, sus 'secciones' o, si no las trae (JSONL de 'rerun'), el del
+    almacén con el mismo doc_id.
+    """
+    from corpus.analytics import expand_paths, iter_analyses
+
+    textos, etiquetas, pendientes = [], [], {}
+    for resultado in iter_analyses(expand_paths(args.rutas)):
+        etiqueta = resultado.get(args.campo)
+        if not etiqueta:
+            continue
+        if resultado.get("secciones"):
+            textos.append("\n".join(resultado["secciones"].values()))
+            etiquetas.append(str(etiqueta))
+        elif resultado.get("doc_id"):
+            pendientes[resultado["doc_id"]] = str(etiqueta)
+    if pendientes:
+        store = TextStore(args.store)
+        for doc_id, texto in store.iter_range():
+            if doc_id in pendientes:
+                textos.append(texto)
+                etiquetas.append(pendientes.pop(doc_id))
+        store.close()
+        if pendientes:
+            logger.warning(f"{len(pendientes)} documentos etiquetados no están en el almacén")
+    return textos, etiquetas
+
+
+def cmd_tipos_entrenar(args: argparse.Namespace):
+    """Entrena y calibra el clasificador con análisis etiquetados y lo guarda."""
+    from models.sentence_classifier import default_model_path, train
+
+    textos, etiquetas = _labeled_texts(args)
+    inicio = time.time()
+    modelo, informe = train(textos, etiquetas, validacion=args.validacion)
+    ruta = args.out or default_model_path()
+    modelo.save(ruta)
+    logger.info(f"✅ {len(textos)} documentos en {time.time() - inicio:.1f}s → {ruta}")
+    print(json.dumps(informe, ensure_ascii=False, indent=2))
+
+
+_secciones_tipos = False
+
+
+def _init_tipos_worker(store_dir: str, secciones: bool):
+    global _store, _secciones_tipos
+    _store = TextStore(store_dir)
+    _secciones_tipos = secciones
+
+
+def _tipos_range(rango: Tuple[int, int]) -> List[str]:
+    """Clasifica los documentos de un rango (y sus secciones) con un solo producto por lote."""
+    from analyzer.executor import AnalysisRun
+    from models.sentence_classifier import get_classifier
+
+    modelo = get_classifier()
+    ids, textos = zip(*_store.iter_range(*rango))
+    resultados = [{"doc_id": doc_id, **clase} for doc_id, clase in zip(ids, modelo.classify(textos))]
+    if _secciones_tipos:
+        por_documento = [AnalysisRun.from_clean_text(texto).get("segment") for texto in textos]
+        nombres = [(i, nombre) for i, secciones in enumerate(por_documento) for nombre in secciones]
+        clases = modelo.classify([por_documento[i][nombre] for i, nombre in nombres])
+        for (i, nombre), clase in zip(nombres, clases):
+            resultados[i].setdefault("secciones", {})[nombre] = clase
+    return [json.dumps(resultado, ensure_ascii=False) for resultado in resultados]
+
+
+def cmd_tipos(args: argparse.Namespace):
+    """Reclasifica todo el almacén con el modelo entrenado, en paralelo, y escribe JSONL."""
+    from models.sentence_classifier import default_model_path, get_classifier
+
+    if get_classifier() is None:
+        raise SystemExit(f"No hay un clasificador entrenado en {default_model_path()} (ver 'tipos-entrenar').")
+    store = TextStore(args.store)
+    total = len(store)
+    store.close()
+
+    rangos = [(inicio, min(inicio + args.chunk, total)) for inicio in range(0, total, args.chunk)]
+    inicio = time.time()
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as salida, multiprocessing.Pool(
+        args.workers, initializer=_init_tipos_worker, initargs=(args.store, args.secciones)
+    ) as pool:
+        for lineas in pool.imap(_tipos_range, rangos):
+            for linea in lineas:
+                salida.write(linea + "\n")
+
+    duracion = time.time() - inicio
+    logger.info(f"✅ {total} documentos en {duracion:.1f}s ({total / max(duracion, 1e-9):.0f} docs/s) → {args.out}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Herramientas sobre el corpus de sentencias analizadas.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Extrae y guarda el texto limpio de los archivos.")
+    ingest.add_argument("archivos", nargs="+")
+    ingest.add_argument("--store", default=default_store_dir(), help="Directorio del almacén de textos.")
+    ingest.set_defaults(func=cmd_ingest)
+
+    rerun = subparsers.add_parser("rerun", help="Re-ejecuta las etapas de reglas sobre el almacén.")
+    rerun.add_argument("--store", default=default_store_dir(), help="Directorio del almacén de textos.")
+    rerun.add_argument("--out", default=os.path.join("outputs", "rerun.jsonl"), help="Archivo JSONL de salida.")
+    rerun.add_argument("--fields", default=",".join(REGEX_FIELDS), help="Etapas a ejecutar, separadas por comas.")
+    rerun.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    rerun.add_argument("--chunk", type=int, default=200, help="Documentos por tarea.")
+    rerun.set_defaults(func=cmd_rerun)
+
+    index = subparsers.add_parser("index", help="Indexa los vectores de las secciones del almacén.")
+    index.add_argument("--store", default=default_store_dir(), help="Directorio del almacén de textos.")
+    index.add_argument("--index", default=None, help="Directorio del índice vectorial (sección 'vector_index').")
+    index.set_defaults(func=cmd_index)
+
+    similar = subparsers.add_parser("similar", help="Busca sentencias parecidas a un documento.")
+    similar.add_argument("archivo")
+    similar.add_argument("--seccion", default="consideraciones", help="Sección a comparar.")
+    similar.add_argument("--index", default=None, help="Directorio del índice vectorial (sección 'vector_index').")
+    similar.add_argument("-k", type=int, default=10)
+    similar.set_defaults(func=cmd_similar)
+
+    citas_add = subparsers.add_parser("citas-add", help="Agrega al grafo de citas los resultados de 'rerun'.")
+    citas_add.add_argument("jsonl", nargs="?", default=os.path.join("outputs", "rerun.jsonl"))
+    citas_add.add_argument("--graph", default=None, help="Directorio del grafo (sección 'citation_graph').")
+    citas_add.add_argument("--chunk", type=int, default=10_000, help="Sentencias por escritura.")
+    citas_add.set_defaults(func=cmd_citas_add)
+
+    citas_top = subparsers.add_parser("citas-top", help="Precedentes o normas más citados.")
+    citas_top.add_argument("--tipo", choices=("precedente", "norma"), default=None)
+    citas_top.add_argument("--anio", type=int, default=None, help="Solo sentencias de este año.")
+    citas_top.add_argument("--graph", default=None, help="Directorio del grafo (sección 'citation_graph').")
+    citas_top.add_argument("-k", type=int, default=20)
+    citas_top.set_defaults(func=cmd_citas_top)
+
+    citas_comunes = subparsers.add_parser("citas-comunes", help="Sentencias que citan todas las referencias dadas.")
+    citas_comunes.add_argument("citas", nargs="+", help="Textos de las citas, p. ej. 'SL1234-2019' 'Ley 100 de 1993'.")
+    citas_comunes.add_argument("--graph", default=None, help="Directorio del grafo (sección 'citation_graph').")
+    citas_comunes.set_defaults(func=cmd_citas_comunes)
+
+    entidades_add = subparsers.add_parser("entidades-add", help="Registra las entidades resueltas de análisis guardados.")
+    entidades_add.add_argument("rutas", nargs="*", default=["outputs"],
+                               help="Archivos *_analisis.json, JSONL o directorios.")
+    entidades_add.add_argument("--actualizar", action="store_true",
+                               help="Reescribe cada *_analisis.json con el 'id_corpus' de sus entidades.")
+    entidades_add.add_argument("--db", default=None, help="Base del registro (sección 'entity_registry').")
+    entidades_add.set_defaults(func=cmd_entidades_add)
+
+    entidades_buscar = subparsers.add_parser("entidades-buscar", help="Busca una entidad en el corpus.")
+    entidades_buscar.add_argument("nombre")
+    entidades_buscar.add_argument("--categoria", choices=("PERSONAS", "ORGANIZACIONES", "LUGARES"), default="PERSONAS")
+    entidades_buscar.add_argument("--db", default=None, help="Base del registro (sección 'entity_registry').")
+    entidades_buscar.add_argument("-k", type=int, default=10)
+    entidades_buscar.set_defaults(func=cmd_entidades_buscar)
+
+    stats = subparsers.add_parser("stats", help="Estadísticas del corpus en memoria constante.")
+    stats.add_argument("rutas", nargs="*", default=["outputs"],
+                       help="Archivos *_analisis.json, JSONL de 'rerun' o directorios.")
+    stats.add_argument("--out", default=None, help="Guarda el agregado para combinarlo después.")
+    stats.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    stats.add_argument("--chunk", type=int, default=500, help="Archivos por tarea.")
+    stats.add_argument("-k", type=int, default=20, help="Primeros puestos de cada ranking.")
+    stats.set_defaults(func=cmd_stats)
+
+    stats_merge = subparsers.add_parser("stats-merge", help="Combina agregados de 'stats --out'.")
+    stats_merge.add_argument("agregados", nargs="+")
+    stats_merge.add_argument("--out", default=None, help="Guarda el agregado combinado.")
+    stats_merge.add_argument("-k", type=int, default=20, help="Primeros puestos de cada ranking.")
+    stats_merge.set_defaults(func=cmd_stats_merge)
+
+    tipos_entrenar = subparsers.add_parser("tipos-entrenar", help="Entrena el clasificador del tipo de providencia.")
+    tipos_entrenar.add_argument("rutas", nargs="+", help="Análisis etiquetados: *_analisis.json, JSONL o directorios.")
+    tipos_entrenar.add_argument("--campo", default="etiqueta", help="Campo de cada análisis con la clase.")
+    tipos_entrenar.add_argument("--store", default=default_store_dir(),
+                                help="Almacén con el texto de los análisis sin 'secciones'.")
+    tipos_entrenar.add_argument("--validacion", type=float, default=0.2, help="Fracción para calibrar y medir.")
+    tipos_entrenar.add_argument("--out", default=None, help="Archivo del modelo (sección 'classifier').")
+    tipos_entrenar.set_defaults(func=cmd_tipos_entrenar)
+
+    tipos = subparsers.add_parser("tipos", help="Reclasifica el almacén con el clasificador entrenado.")
+    tipos.add_argument("--store", default=default_store_dir(), help="Directorio del almacén de textos.")
+    tipos.add_argument("--out", default=os.path.join("outputs", "tipos.jsonl"), help="Archivo JSONL de salida.")
+    tipos.add_argument("--secciones", action="store_true", help="Clasifica también cada sección.")
+    tipos.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    tipos.add_argument("--chunk", type=int, default=2000, help="Documentos por tarea (un lote por tarea).")
+    tipos.set_defaults(func=cmd_tipos)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import sys
 import os
 import json
+import time
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 # Configurar el logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -42,13 +43,14 @@ CONFIG = load_config()
 OUTPUT_DIR = CONFIG.get("output_dir", "outputs") # Usar un valor predeterminado si no se encuentra
 
 
-# NOTA: Se asume que analyzer.extractor existe y contiene las funciones extract_text_from_pdf
+# NOTA: Se asume que analyzer.extractor existe y contiene las funciones extract_text_from_document
 # y build_analysis. 
 try:
-    from analyzer.extractor import extract_text_from_pdf
-    from analyzer.extractor import build_analysis
+    from analyzer.extractor import extract_text_for_fields, SUPPORTED_EXTENSIONS
+    from analyzer.extractor import build_analysis, mark_partial_result
+    from analyzer.budget import AnalysisBudget
 except ImportError as e:
-    logger.error(f"Error al importar módulos de análisis. Asegúrate de que 'analyzer/extractor.py' existe y contiene las funciones 'extract_text_from_pdf' y 'build_analysis'. Error: {e}")
+    logger.error(f"Error al importar módulos de análisis. Asegúrate de que 'analyzer/extractor.py' existe y contiene las funciones 'extract_text_from_document' y 'build_analysis'. Error: {e}")
     sys.exit(1)
 
 
@@ -72,43 +74,88 @@ def save_result(result: Dict[str, Any], filename: str):
         logger.error(f"❌ Ocurrió un error inesperado al guardar el resultado: {e}")
 
 
+def analyze_document(filepath: str, tier: Optional[str] = None,
+                     fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Extrae el texto de un documento y lo analiza dentro de su presupuesto.
+
+    Args:
+        filepath: Ruta del PDF o DOCX.
+        tier: Nivel de análisis (sección 'tiers' de config.json); por defecto, 'tiers.default'.
+        fields: Etapas pedidas (p. ej. ["metadata"]); por defecto, el análisis completo.
+                Si solo se piden metadatos y/o fallo, se extraen solo las páginas que
+                los contienen (ver analyzer.extractor.extract_text_for_fields).
+
+    Returns:
+        El resultado del análisis (vacío si no se pudo extraer texto significativo).
+    """
+    # Presupuesto de tiempo, páginas y caracteres del documento (sección 'budgets' de config.json)
+    budget = AnalysisBudget.from_config()
+    texto_documento, paginas = extract_text_for_fields(filepath, fields, budget)
+    if not texto_documento.strip():
+        logger.warning("El archivo parece estar vacío o no se pudo extraer texto significativo.")
+        # Puedes optar por sys.exit(1) aquí si un PDF vacío es un error crítico
+        # O continuar con un resultado de análisis vacío
+        return {} # Resultado vacío si no hay texto
+    resultado = build_analysis(texto_documento, fields, budget=budget, tier=tier)
+    if paginas is not None:
+        mark_partial_result(resultado, paginas)
+    return resultado
+
+
 def main():
     """
-    Función principal para analizar un archivo PDF desde la línea de comandos.
+    Función principal para analizar un archivo PDF o DOCX desde la línea de comandos.
     Extrae texto, realiza un análisis y guarda el resultado en un archivo JSON.
+
+    Con --profile, el análisis se perfila (ver utils.profiling) y se escriben las pilas
+    colapsadas y un resumen de las funciones más costosas junto a los demás perfiles.
+    Con --tier <nivel> se elige el nivel de análisis (modelo de spaCy y componentes).
+    Con --fields <etapas> (separadas por comas, p. ej. 'metadata' o 'metadata,fallo')
+    solo se calculan esas etapas y solo se extraen las páginas que necesitan.
     """
-    if len(sys.argv) < 2:
-        logger.info("Uso: python main.py <archivo.pdf>")
+    argumentos = [a for a in sys.argv[1:] if a != "--profile"]
+    perfilar = len(argumentos) != len(sys.argv) - 1
+    opciones: Dict[str, Optional[str]] = {"--tier": None, "--fields": None}
+    for opcion in opciones:
+        if opcion in argumentos:
+            posicion = argumentos.index(opcion)
+            opciones[opcion] = argumentos[posicion + 1] if posicion + 1 < len(argumentos) else ""
+            del argumentos[posicion:posicion + 2]
+    tier = opciones["--tier"]
+    fields = [f.strip() for f in opciones["--fields"].split(",") if f.strip()] if opciones["--fields"] else None
+    if not argumentos or "" in opciones.values():
+        logger.info("Uso: python main.py <archivo.pdf|archivo.docx> [--profile] [--tier <nivel>] [--fields <etapas>]")
         sys.exit(1)
 
-    filepath = sys.argv[1]
+    filepath = argumentos[0]
 
     if not os.path.exists(filepath):
         logger.error(f"❌ Archivo no encontrado: {filepath}")
         sys.exit(1)
 
-    if not filepath.lower().endswith(".pdf"):
-        logger.error(f"❌ El archivo debe ser un PDF. Extensión proporcionada: {os.path.splitext(filepath)[1]}")
+    if not filepath.lower().endswith(SUPPORTED_EXTENSIONS):
+        logger.error(f"❌ El archivo debe ser un PDF o un DOCX. Extensión proporcionada: {os.path.splitext(filepath)[1]}")
         sys.exit(1)
 
     logger.info(f"📄 Analizando: {filepath}")
 
-    texto_documento = ""
+    # Generar nombre de archivo de salida
+    base_filename = os.path.basename(filepath).split(".")[0]
+
     try:
-        texto_documento = extract_text_from_pdf(filepath)
-        if not texto_documento.strip():
-            logger.warning("El archivo PDF parece estar vacío o no se pudo extraer texto significativo.")
-            # Puedes optar por sys.exit(1) aquí si un PDF vacío es un error crítico
-            # O continuar con un resultado de análisis vacío
-            resultado_analisis = {} # Resultado vacío si no hay texto
+        if perfilar:
+            from utils.profiling import profile_call
+            resultado_analisis, perfil = profile_call(analyze_document, filepath, tier, fields)
+            rutas = perfil.write(f"{base_filename}_{time.strftime('%Y%m%d-%H%M%S')}")
+            logger.info(f"🔬 Perfil: {rutas['folded']} (pilas colapsadas), {rutas['resumen']} (resumen)\n"
+                        f"{perfil.summary(10)}")
         else:
-            resultado_analisis = build_analysis(texto_documento)
+            resultado_analisis = analyze_document(filepath, tier, fields)
     except Exception as e:
-        logger.error(f"❌ Error durante la extracción o el análisis del PDF: {e}")
+        logger.error(f"❌ Error durante la extracción o el análisis del documento: {e}")
         sys.exit(1)
 
-    # Generar nombre de archivo de salida
-    base_filename = os.path.basename(filepath).split(".")[0]
     output_filename = f"{base_filename}_analisis.json"
 
     # Guardar el resultado del análisis
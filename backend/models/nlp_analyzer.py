@@ -1,73 +1,68 @@
-import spacy
-import re
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 
-# --- Cargar el modelo de SpaCy una sola vez y de forma robusta ---
-# Este bloque asegura que el modelo se cargue o se descargue si no está presente.
-try:
-    nlp = spacy.load("es_core_news_md")
-except OSError:
-    print("Descargando el modelo 'es_core_news_md' de SpaCy. Esto solo sucederá una vez.")
-    spacy.cli.download("es_core_news_md")
-    nlp = spacy.load("es_core_news_md")
+from nlp.tiers import AnalysisTier, get_tier
+from utils.document import SentenciaDocument, as_document, collapse_whitespace
+from utils.rules import CompiledRules, get_rules
+
+# --- Modelo de SpaCy ---
+# El modelo lo elige el nivel de análisis (nlp.tiers, sección 'tiers' de config.json) y
+# nlp_utils.get_nlp_model() lo carga una sola vez por proceso (compartido con nlp.entities
+# y nlp.hechos) y lo descarga si no está presente. Las secciones ya procesadas se
+# reconstruyen desde la caché de nlp.doc_cache sin volver a ejecutarlo.
 
 # --- Funciones de Utilidad para normalización y validación (ideales para un módulo 'utils') ---
 # Estas funciones son fundamentales para la limpieza de entidades.
 def normalize_text(text: str) -> str:
     """Normaliza el texto: elimina espacios extra, puntuación no esencial y convierte a minúsculas para comparación."""
-    text = re.sub(r"\s+", " ", text).strip() # Elimina múltiples espacios y espacios al inicio/final
+    text = collapse_whitespace(text) # Elimina múltiples espacios y espacios al inicio/final
     # Opcional: Podrías querer eliminar más puntuación o caracteres especiales
     # text = re.sub(r"[^\w\sÁÉÍÓÚáéíóúñÑ]", "", text) # Elimina todo lo que no sea alfanumérico o espacio
     return text
 
-# Términos comunes que suelen ser entidades genéricas o ruido y que queremos ignorar.
-# Se pueden ampliar según se identifiquen más términos no deseados.
-IGNORED_ENTITY_TERMS = {
-    "cui", "ley", "sentencia", "norma", "artículo", "folio", "número interno",
-    "segunda instancia", "registro", "sala", "instancia", "providencia",
-    "documento", "magistrado", "magistrada", "corte", "tribunal", "fiscalía",
-    "departamento", "gobernación", "ministro", "ministerio", "proceso",
-    "código", "general", "penal", "justicia", "administración", "república",
-    "colombia", "judicial", "actuación", "derecho", "principios", "artículos",
-    "incisos", "parágrafo", "ley estatutaria", "parte", "sentencias", "casación",
-    "penal", "jurisdiccional", "sentencia", "judicial", "recurso", "apelación",
-    "expediente", "radicación", "número"
-}
+# Los términos genéricos o de ruido a ignorar, la longitud mínima y el patrón de códigos
+# (AP4465, CUI: 11001...) están en 'rules.json', sección 'entidades'.
 
-def is_valid_entity(ent_text: str) -> bool:
+def is_valid_entity(ent_text: str, rules: Optional[CompiledRules] = None) -> bool:
     """
     Valida si una entidad extraída es relevante y no debe ser ignorada.
     Se basa en longitud mínima, si es solo dígitos y una lista de términos a ignorar.
     """
-    norm = normalize_text(ent_text).lower()
-    
+    return _is_valid_normalized(normalize_text(ent_text).lower(), rules or get_rules())
+
+def _is_valid_normalized(norm: str, rules: CompiledRules) -> bool:
+    """is_valid_entity sobre el texto ya normalizado y en minúsculas."""
     # Ignorar entidades muy cortas o que son solo números
-    if len(norm) < 3 or norm.isdigit(): # Reducido a 3 para capturar nombres cortos si son relevantes
+    if len(norm) < rules.entidades_longitud_minima or norm.isdigit():
         return False
     
     # Ignorar términos genéricos o de ruido
-    if norm in IGNORED_ENTITY_TERMS:
+    if norm in rules.entidades_ignorar:
         return False
     
     # Ignorar patrones específicos como códigos o números de radicación (ej. AP4465, CUI: 11001)
-    if re.match(r"^(ap\d{4,6}|[a-z]{2,4}\d{5,}|[a-z]{2,4}\-\d{4})$", norm):
+    if rules.entidades_codigos.match(norm):
         return False
         
     return True
 
-def extract_entities(text: str) -> Dict[str, List[str]]:
+def extract_entities(text: Union[str, SentenciaDocument], rules: Optional[CompiledRules] = None,
+                     tier: Optional[AnalysisTier] = None) -> Dict[str, List[str]]:
     """
     Extrae entidades nombradas (personas, organizaciones, fechas, lugares) de un texto
     utilizando SpaCy, normaliza y filtra las entidades irrelevantes.
 
     Args:
-        text: El texto de donde se extraerán las entidades.
+        text: El texto de donde se extraerán las entidades (o su SentenciaDocument).
+        rules: Reglas compiladas a usar (por defecto, las vigentes).
+        tier: Nivel de análisis que produce el Doc (por defecto, 'tiers.default').
 
     Returns:
         Un diccionario donde las claves son las categorías de entidades y los valores
         son listas de strings de entidades únicas y válidas.
     """
-    doc = nlp(text)
+    rules = rules or get_rules()
+    documento = as_document(text)
+    doc = (tier or get_tier()).parse(documento.raw, rules)
 
     entidades = {
         "PERSONAS": [],
@@ -83,9 +78,10 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
     }
 
     for ent in doc.ents:
-        # Aplicar la validación y normalización antes de añadir la entidad
-        if is_valid_entity(ent.text):
-            normalized_ent_text = normalize_text(ent.text) # Normalizar para consistencia y eliminación de duplicados
+        # Aplicar la validación y normalización antes de añadir la entidad; el texto
+        # normalizado se lee de la vista colapsada del documento, una vez por entidad
+        normalized_ent_text = documento.collapsed_span(ent.start_char, ent.end_char)
+        if _is_valid_normalized(normalized_ent_text.lower(), rules):
 
             if ent.label_ == "PER":
                 entidades["PERSONAS"].append(normalized_ent_text)
@@ -0,0 +1,311 @@
+import os
+import re
+import zlib
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.document import fold_accents
+from utils.settings import get_section, resolve_path
+
+# Clasificador lineal del tipo de providencia (tutela, casación, auto interlocutorio…)
+# sobre n-gramas de palabras hasheados:
+#
+#   - Cada texto se reduce a unigramas y bigramas de palabras sin tildes; cada n-grama se
+#     hashea (crc32, estable entre procesos) a una de 'n_features' columnas con un signo,
+#     y la fila se pondera con log(1 + tf) y se normaliza (L2).
+#   - Un lote de textos es una matriz dispersa CSR (indptr, indices, data) y se puntúa con
+#     un solo producto matriz dispersa × matriz de pesos en NumPy.
+#   - Los pesos se entrenan con regresión logística multinomial (descenso por mini-lotes
+#     con AdaGrad y regularización L2); la temperatura de la softmax se ajusta sobre una
+#     partición de validación para que las probabilidades queden calibradas.
+#
+# El modelo se guarda en un .npz (sección 'classifier' de config.json) y lo usa la etapa
+# 'sentence_class' del análisis. Sin modelo entrenado, la etapa no produce nada y el
+# análisis conserva la clasificación por palabras clave (dispatcher.detect_sentence_type).
+
+# Palabras en minúsculas; las tildes se quitan después, una vez por palabra distinta
+_TOKEN_RE = re.compile(r"[a-zñáéíóúüàèìòù0-9]+")
+_BIGRAM_MULT = np.uint64(0x9E3779B1)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+class SparseRows(NamedTuple):
+    """Filas dispersas en formato CSR: la fila i ocupa indices/data[indptr[i]:indptr[i+1]]."""
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def rows(self, inicio: int, fin: int) -> "SparseRows":
+        a, b = self.indptr[inicio], self.indptr[fin]
+        return SparseRows(self.indptr[inicio:fin + 1] - a, self.indices[a:b], self.data[a:b])
+
+    def take(self, filas: np.ndarray) -> "SparseRows":
+        partes = [(self.indices[self.indptr[i]:self.indptr[i + 1]], self.data[self.indptr[i]:self.indptr[i + 1]])
+                  for i in filas]
+        return stack_rows(partes)
+
+    def row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self)), np.diff(self.indptr))
+
+    def dot(self, pesos: np.ndarray) -> np.ndarray:
+        """Producto (filas × n_features) · (n_features × k) -> (filas × k)."""
+        resultado = np.zeros((len(self), pesos.shape[1]))
+        # reduceat suma cada tramo hasta el inicio del siguiente: solo se le pasan las filas
+        # con datos (el tramo de una fila vacía sería el valor del inicio, no cero)
+        llenas = np.flatnonzero(np.diff(self.indptr))
+        if len(llenas):
+            contribuciones = self.data[:, None] * pesos[self.indices]
+            resultado[llenas] = np.add.reduceat(contribuciones, self.indptr[llenas], axis=0)
+        return resultado
+
+    def tdot(self, d: np.ndarray, n_features: int) -> np.ndarray:
+        """Producto transpuesto (n_features × filas) · (filas × k), p. ej. el gradiente X^T (P - Y)."""
+        filas = self.row_ids()
+        return np.stack([np.bincount(self.indices, weights=self.data * d[filas, c], minlength=n_features)
+                         for c in range(d.shape[1])], axis=1)
+
+
+def stack_rows(filas: Sequence[Tuple[np.ndarray, np.ndarray]]) -> SparseRows:
+    """Une filas (indices, valores) en una matriz CSR."""
+    indptr = np.zeros(len(filas) + 1, dtype=np.int64)
+    np.cumsum([len(indices) for indices, _ in filas], out=indptr[1:])
+    if not filas:
+        return SparseRows(indptr, np.zeros(0, dtype=np.int64), np.zeros(0))
+    return SparseRows(indptr, np.concatenate([i for i, _ in filas]).astype(np.int64),
+                      np.concatenate([v for _, v in filas]).astype(np.float64))
+
+
+class HashingFeaturizer:
+    """Texto -> fila dispersa de n-gramas hasheados (ver el comentario del módulo)."""
+
+    def __init__(self, n_features: int = 1 << 18, bigramas: bool = True, max_caracteres: Optional[int] = 30000):
+        self.n_features = int(n_features)
+        self.bigramas = bool(bigramas)
+        self.max_caracteres = max_caracteres
+
+    def row(self, texto: str) -> Tuple[np.ndarray, np.ndarray]:
+        if self.max_caracteres:
+            texto = texto[:self.max_caracteres]
+        tokens = _TOKEN_RE.findall(texto.lower())
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        # crc32 una vez por palabra distinta; los bigramas combinan los hashes en NumPy
+        vocabulario = {token: zlib.crc32(fold_accents(token).encode("utf-8")) for token in set(tokens)}
+        hashes = np.fromiter((vocabulario[token] for token in tokens), dtype=np.uint64, count=len(tokens))
+        if self.bigramas and len(hashes) > 1:
+            bigramas = (hashes[:-1] * _BIGRAM_MULT + hashes[1:] + np.uint64(1)) & _MASK32
+            hashes = np.concatenate([hashes, bigramas])
+        n = np.uint64(self.n_features)
+        columnas, inversa = np.unique((hashes % n).astype(np.int64), return_inverse=True)
+        signos = (((hashes // n) & np.uint64(1)).astype(np.float64) * 2) - 1
+        valores = np.bincount(inversa, weights=signos)
+        valores = np.sign(valores) * np.log1p(np.abs(valores))
+        norma = np.linalg.norm(valores)
+        return columnas, valores / norma if norma else valores
+
+    def transform(self, textos: Iterable[str]) -> SparseRows:
+        return stack_rows([self.row(texto) for texto in textos])
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _nll(z: np.ndarray, y: np.ndarray, temperatura: float) -> float:
+    p = _softmax(z / temperatura)
+    return float(-np.mean(np.log(p[np.arange(len(y)), y] + 1e-12)))
+
+
+def _calibration_error(p: np.ndarray, y: np.ndarray, cubetas: int = 10) -> float:
+    """Error de calibración esperado (ECE) de la clase más probable."""
+    confianza, prediccion = p.max(axis=1), p.argmax(axis=1)
+    cubeta = np.minimum((confianza * cubetas).astype(int), cubetas - 1)
+    error = 0.0
+    for b in range(cubetas):
+        en_cubeta = cubeta == b
+        if en_cubeta.any():
+            error += en_cubeta.mean() * abs(confianza[en_cubeta].mean() - (prediccion[en_cubeta] == y[en_cubeta]).mean())
+    return float(error)
+
+
+class SentenceClassifier:
+    """
+    Regresión logística multinomial sobre n-gramas hasheados, con temperatura calibrada.
+
+    predict_proba() puntúa un lote de textos (documentos completos o secciones) con un
+    solo producto disperso; classify() retorna la clase y las probabilidades de cada uno.
+    """
+
+    def __init__(self, clases: Sequence[str], featurizer: Optional[HashingFeaturizer] = None):
+        self.clases = list(clases)
+        self.featurizer = featurizer or HashingFeaturizer()
+        self.pesos = np.zeros((self.featurizer.n_features, len(self.clases)))
+        self.sesgo = np.zeros(len(self.clases))
+        self.temperatura = 1.0
+
+    def scores(self, filas: SparseRows, lote: int = 2048) -> np.ndarray:
+        """Puntajes lineales (antes de la softmax); por lotes para acotar la memoria del producto."""
+        partes = [filas.rows(i, min(i + lote, len(filas))).dot(self.pesos) for i in range(0, len(filas), lote)]
+        return (np.concatenate(partes) if partes else np.zeros((0, len(self.clases)))) + self.sesgo
+
+    def predict_proba(self, textos: Sequence[str]) -> np.ndarray:
+        return _softmax(self.scores(self.featurizer.transform(textos)) / self.temperatura)
+
+    def classify(self, textos: Sequence[str]) -> List[Dict[str, Any]]:
+        """Por texto: {'clase', 'probabilidades': {clase: p}} con las probabilidades calibradas."""
+        resultados = []
+        for fila in self.predict_proba(textos):
+            resultados.append({
+                "clase": self.clases[int(fila.argmax())],
+                "probabilidades": {clase: round(float(p), 4) for clase, p in zip(self.clases, fila)},
+            })
+        return resultados
+
+    def fit(self, filas: SparseRows, y: np.ndarray, epocas: int = 10, lote: int = 256, tasa: float = 0.5,
+            l2: float = 1e-5, semilla: int = 0) -> "SentenceClassifier":
+        """Entrena los pesos (AdaGrad por mini-lotes, L2) sobre filas ya transformadas."""
+        rng = np.random.default_rng(semilla)
+        acumulado_w = np.full_like(self.pesos, 1e-8)
+        acumulado_b = np.full_like(self.sesgo, 1e-8)
+        objetivo = np.eye(len(self.clases))[y]
+        for _ in range(epocas):
+            orden = rng.permutation(len(filas))
+            for inicio in range(0, len(orden), lote):
+                indices = orden[inicio:inicio + lote]
+                x = filas.take(indices)
+                d = (_softmax(x.dot(self.pesos) + self.sesgo) - objetivo[indices]) / len(indices)
+                grad_w = x.tdot(d, self.featurizer.n_features)
+                tocadas = np.unique(x.indices)  # L2 perezosa: solo en las columnas del lote
+                grad_w[tocadas] += l2 * self.pesos[tocadas]
+                grad_b = d.sum(axis=0)
+                acumulado_w[tocadas] += grad_w[tocadas] ** 2
+                acumulado_b += grad_b ** 2
+                self.pesos[tocadas] -= tasa * grad_w[tocadas] / np.sqrt(acumulado_w[tocadas])
+                self.sesgo -= tasa * grad_b / np.sqrt(acumulado_b)
+        return self
+
+    def calibrate(self, filas: SparseRows, y: np.ndarray) -> float:
+        """Ajusta la temperatura que minimiza la log-verosimilitud negativa en (filas, y)."""
+        z = self.scores(filas)
+        # Búsqueda de sección dorada sobre log(T) en [1/20, 20]
+        a, b = np.log(0.05), np.log(20.0)
+        razon = (np.sqrt(5) - 1) / 2
+        for _ in range(40):
+            c, d = b - razon * (b - a), a + razon * (b - a)
+            if _nll(z, y, np.exp(c)) < _nll(z, y, np.exp(d)):
+                b = d
+            else:
+                a = c
+        self.temperatura = float(np.exp((a + b) / 2))
+        return self.temperatura
+
+    def evaluate(self, filas: SparseRows, y: np.ndarray) -> Dict[str, float]:
+        z = self.scores(filas)
+        p = _softmax(z / self.temperatura)
+        return {
+            "exactitud": round(float((p.argmax(axis=1) == y).mean()), 4),
+            "nll": round(_nll(z, y, self.temperatura), 4),
+            "nll_sin_calibrar": round(_nll(z, y, 1.0), 4),
+            "ece": round(_calibration_error(p, y), 4),
+            "ece_sin_calibrar": round(_calibration_error(_softmax(z), y), 4),
+        }
+
+    def save(self, ruta: str):
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        # Solo las filas con algún peso: la matriz completa es casi toda ceros
+        usadas = np.flatnonzero(np.any(self.pesos != 0, axis=1))
+        temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            temporal, clases=np.array(self.clases), filas=usadas, pesos=self.pesos[usadas].astype(np.float32),
+            sesgo=self.sesgo, temperatura=self.temperatura, n_features=self.featurizer.n_features,
+            bigramas=self.featurizer.bigramas, max_caracteres=self.featurizer.max_caracteres or 0,
+        )
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def load(cls, ruta: str) -> "SentenceClassifier":
+        with np.load(ruta) as datos:
+            featurizer = HashingFeaturizer(int(datos["n_features"]), bool(datos["bigramas"]),
+                                           int(datos["max_caracteres"]) or None)
+            modelo = cls([str(c) for c in datos["clases"]], featurizer)
+            modelo.pesos[datos["filas"]] = datos["pesos"]
+            modelo.sesgo = datos["sesgo"].astype(np.float64)
+            modelo.temperatura = float(datos["temperatura"])
+        return modelo
+
+
+def train(textos: Sequence[str], etiquetas: Sequence[str], validacion: float = 0.2,
+          config: Optional[Dict[str, Any]] = None, semilla: int = 0) -> Tuple[SentenceClassifier, Dict[str, Any]]:
+    """
+    Entrena un clasificador con textos etiquetados: pesos sobre la partición de
+    entrenamiento y temperatura sobre la de validación.
+
+    Args:
+        textos: Textos de los documentos (o secciones).
+        etiquetas: Clase de cada texto.
+        validacion: Fracción reservada para calibrar y medir.
+        config: Parámetros (por defecto, la sección 'classifier' de config.json).
+
+    Returns:
+        (modelo, informe con las clases, tamaños y métricas de validación).
+    """
+    config = config if config is not None else get_section("classifier")
+    clases = sorted(set(etiquetas))
+    if len(clases) < 2:
+        raise ValueError("Se necesitan al menos dos clases para entrenar el clasificador.")
+    featurizer = HashingFeaturizer(int(config.get("n_features", 1 << 18)), bool(config.get("bigramas", True)),
+                                   config.get("max_caracteres", 30000))
+    modelo = SentenceClassifier(clases, featurizer)
+    filas = featurizer.transform(textos)
+    y = np.array([clases.index(etiqueta) for etiqueta in etiquetas])
+
+    orden = np.random.default_rng(semilla).permutation(len(y))
+    corte = int(len(y) * (1 - validacion)) if len(y) >= 10 else len(y)
+    entrenamiento, prueba = orden[:corte], orden[corte:]
+    modelo.fit(filas.take(entrenamiento), y[entrenamiento], epocas=int(config.get("epocas", 10)),
+               tasa=float(config.get("tasa", 0.5)), l2=float(config.get("l2", 1e-5)), semilla=semilla)
+    informe: Dict[str, Any] = {
+        "clases": {clase: int((y == i).sum()) for i, clase in enumerate(clases)},
+        "entrenamiento": len(entrenamiento), "validacion": len(prueba),
+    }
+    if len(prueba):
+        filas_prueba = filas.take(prueba)
+        modelo.calibrate(filas_prueba, y[prueba])
+        informe["temperatura"] = round(modelo.temperatura, 3)
+        informe["metricas_validacion"] = modelo.evaluate(filas_prueba, y[prueba])
+    return modelo, informe
+
+
+def default_model_path() -> str:
+    """Ruta del modelo según 'config.json' (sección 'classifier')."""
+    return resolve_path(get_section("classifier").get("model_path", "outputs/clasificador_tipo.npz"))
+
+
+_lock = threading.Lock()
+_modelo: Optional[SentenceClassifier] = None
+_estado_modelo: Optional[Tuple[int, int]] = None  # (mtime_ns, tamaño) del archivo cargado
+
+
+def get_classifier() -> Optional[SentenceClassifier]:
+    """
+    Modelo entrenado del proceso (None si no hay ninguno). Se vuelve a leer si el
+    archivo cambió, p. ej. tras 'corpus_cli.py tipos-entrenar'.
+    """
+    global _modelo, _estado_modelo
+    ruta = default_model_path()
+    try:
+        stat = os.stat(ruta)
+    except OSError:
+        return None
+    estado = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if estado != _estado_modelo:
+            _modelo, _estado_modelo = SentenceClassifier.load(ruta), estado
+        return _modelo
@@ -0,0 +1,80 @@
+import os
+import logging
+import hashlib
+from typing import Dict, Optional
+
+import spacy
+from spacy.tokens import Doc, DocBin
+
+from nlp.nlp_utils import get_nlp_model
+from utils.settings import get_section, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# Caché en disco de secciones ya procesadas por spaCy. Cambiar las reglas posteriores
+# ('rules.json': entidades a ignorar, puntuación de hechos...) no cambia el análisis del modelo, así
+# que cada Doc se reconstruye desde su DocBin en lugar de volver a ejecutar nlp().
+#
+# La clave es el hash del texto de la sección; el directorio incluye el nombre y la
+# versión del modelo y sus componentes, de modo que actualizar es_core_news_md (o pasar
+# a otro nivel de análisis, ver nlp.tiers) no reutiliza Doc de otro pipeline.
+
+_cache_dirs: Dict[int, str] = {}  # id del pipeline -> directorio
+
+
+def _model_cache_dir(nlp: spacy.Language) -> str:
+    directorio = _cache_dirs.get(id(nlp))
+    if directorio is None:
+        base = resolve_path(get_section("doc_cache").get("dir", "outputs/doc_cache"))
+        componentes = hashlib.sha1(",".join(nlp.pipe_names).encode("utf-8")).hexdigest()[:8]
+        modelo = f"{nlp.meta.get('lang', 'xx')}_{nlp.meta.get('name', 'model')}-{nlp.meta.get('version', '0')}-{componentes}"
+        directorio = _cache_dirs[id(nlp)] = os.path.join(base, modelo)
+    return directorio
+
+
+def cache_path(nlp: spacy.Language, text: str) -> str:
+    """Ruta del DocBin de un texto: <dir>/<modelo>-<versión>-<componentes>/<aa>/<sha256>.spacy"""
+    clave = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return os.path.join(_model_cache_dir(nlp), clave[:2], clave + ".spacy")
+
+
+def parse_cached(text: str, nlp: Optional[spacy.Language] = None) -> Doc:
+    """
+    Retorna el Doc de spaCy de un texto, desde la caché en disco si ya fue procesado.
+
+    Args:
+        text: El texto a procesar (normalmente una sección de la sentencia).
+        nlp: El pipeline a usar (por defecto, nlp_utils.get_nlp_model()).
+
+    Returns:
+        El Doc con tokens, etiquetas, dependencias, oraciones y entidades.
+    """
+    nlp = nlp or get_nlp_model()
+    if not get_section("doc_cache").get("enabled", True):
+        return nlp(text)
+
+    ruta = cache_path(nlp, text)
+    try:
+        with open(ruta, "rb") as f:
+            return next(DocBin().from_bytes(f.read()).get_docs(nlp.vocab))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # Un archivo truncado o de otra versión de spaCy se descarta y se regenera
+        logger.warning(f"⚠️ Entrada de caché inválida ({ruta}): {e}")
+
+    doc = nlp(text)
+    _store(ruta, doc)
+    return doc
+
+
+def _store(ruta: str, doc: Doc):
+    """Escribe el DocBin en un archivo temporal y lo renombra (atómico entre procesos)."""
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(DocBin(docs=[doc], store_user_data=False).to_bytes())
+        os.replace(temporal, ruta)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudo guardar en la caché de spaCy ({ruta}): {e}")
@@ -1,27 +1,17 @@
-import spacy
 import re
-from typing import Dict, List, Union
-
-# --- Cargar el modelo de SpaCy una sola vez y de forma robusta ---
-try:
-    nlp = spacy.load("es_core_news_md")
-except OSError:
-    print("Descargando el modelo 'es_core_news_md' de SpaCy. Esto solo sucederá una vez.")
-    spacy.cli.download("es_core_news_md")
-    nlp = spacy.load("es_core_news_md")
-
-# --- Términos a Ignorar (Lista Consolidada y Ampliada) ---
-IGNORED_ENTITY_TERMS = {
-    "cui", "ley", "sentencia", "norma", "artículo", "folio", "número interno",
-    "segunda instancia", "registro", "sala", "instancia", "providencia",
-    "documento", "magistrado", "magistrada", "corte", "tribunal", "fiscalía",
-    "departamento", "gobernación", "ministro", "ministerio", "proceso",
-    "código", "general", "penal", "justicia", "administración", "república",
-    "colombia", "judicial", "actuación", "derecho", "principios", "artículos",
-    "incisos", "parágrafo", "ley estatutaria", "parte", "sentencias", "casación",
-    "jurisdiccional", "recurso", "apelación", "expediente", "radicación", "número",
-    "presidente", "doctor", "doctora", "señor", "señora", "hijo", "hija", "parte procesal"
-}
+from typing import Dict, List, Optional, Union
+
+from nlp.tiers import AnalysisTier, get_tier
+from utils.document import SentenciaDocument, as_document, collapse_whitespace
+from utils.rules import CompiledRules, get_rules
+
+# --- Modelo de SpaCy: el del nivel de análisis (nlp.tiers), compartido por proceso ---
+# (con modelo, los Doc salen de nlp.doc_cache.parse_cached, que evita re-procesar secciones ya vistas)
+
+# --- Términos a ignorar, longitud mínima y patrón de códigos: 'rules.json', sección 'entidades' ---
+
+# Caracteres que se eliminan del texto de una entidad
+_ENTITY_NOISE_RE = re.compile(r"[^\w\sÁÉÍÓÚáéíóúñÑ.,-]")
 
 # --- Funciones de Utilidad ---
 def normalize_entity_text(text: str) -> str:
@@ -31,48 +21,53 @@ def normalize_entity_text(text: str) -> str:
     2. Convierte a minúsculas para comparaciones consistentes.
     3. Elimina caracteres especiales que no sean alfanuméricos, espacios, o signos de puntuación clave.
     """
-    text = re.sub(r"\s+", " ", text).strip()
-    text = re.sub(r"[^\w\sÁÉÍÓÚáéíóúñÑ.,-]", "", text)
-    return text
+    return _ENTITY_NOISE_RE.sub("", collapse_whitespace(text))
 
-def is_valid_entity(ent_text: str) -> bool:
+def is_valid_entity(ent_text: str, rules: Optional[CompiledRules] = None) -> bool:
     """
     Valida si una entidad extraída es relevante y no debe ser ignorada.
     Se basa en longitud mínima, si es solo dígitos, una lista de términos a ignorar
     y patrones de códigos/IDs.
     """
-    norm = normalize_entity_text(ent_text).lower()
+    return _is_valid_normalized(normalize_entity_text(ent_text).lower(), rules or get_rules())
 
-    if len(norm) < 3 or norm.isdigit():
+def _is_valid_normalized(norm: str, rules: CompiledRules) -> bool:
+    """is_valid_entity sobre el texto ya normalizado y en minúsculas."""
+    if len(norm) < rules.entidades_longitud_minima or norm.isdigit():
         return False
 
-    if norm in IGNORED_ENTITY_TERMS:
+    if norm in rules.entidades_ignorar:
         return False
 
-    if any(norm.startswith(term) for term in IGNORED_ENTITY_TERMS):
+    if norm.startswith(rules.entidades_ignorar_prefijos):
         return False
 
-    if re.match(r"^(ap\d{4,6}|[a-z]{2,4}\d{5,}|[a-z]{2,4}\-\d{4,8}|cui:\s*\d+)$", norm):
+    if rules.entidades_codigos.match(norm):
         return False
 
     return True
 
 # --- Función Principal de Extracción de Entidades ---
 
-def extract_entities(text: str) -> Dict[str, List[str]]:
+def extract_entities(text: Union[str, SentenciaDocument], rules: Optional[CompiledRules] = None,
+                     tier: Optional[AnalysisTier] = None) -> Dict[str, List[str]]:
     """
     Extrae entidades nombradas de un texto utilizando SpaCy,
     aplicando normalización y filtrado para mejorar la calidad.
 
     Args:
-        text: El texto de donde se extraerán las entidades.
+        text: El texto de donde se extraerán las entidades (o su SentenciaDocument).
+        rules: Reglas compiladas a usar (por defecto, las vigentes).
+        tier: Nivel de análisis que produce el Doc (por defecto, 'tiers.default').
 
     Returns:
         Un diccionario donde las claves son las categorías de entidades
         (PERSONAS, ORGANIZACIONES, LUGARES, FECHAS) y los valores son
         listas de strings de entidades únicas, válidas y ordenadas alfabéticamente.
     """
-    doc = nlp(text)
+    rules = rules or get_rules()
+    documento = as_document(text)
+    doc = (tier or get_tier()).parse(documento.raw, rules)
 
     entidades = {
         "PERSONAS": [],
@@ -82,9 +77,10 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
     }
 
     for ent in doc.ents:
-        normalized_text = normalize_entity_text(ent.text)
+        # El texto de la entidad se lee ya colapsado de la vista del documento
+        normalized_text = _ENTITY_NOISE_RE.sub("", documento.collapsed_span(ent.start_char, ent.end_char))
 
-        if not is_valid_entity(normalized_text):
+        if not _is_valid_normalized(normalized_text.lower(), rules):
             continue
 
         if ent.label_ == "PER":
@@ -0,0 +1,186 @@
+import re
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.document import collapse_whitespace, fold_accents
+from utils.rules import CompiledRules, get_rules
+
+# Resolución de entidades: agrupa las menciones de una misma entidad
+# ("MARIO FERNANDO BENAVIDES JIMÉNEZ", "Benavides Jiménez", "el procesado Benavides")
+# bajo un id canónico.
+#
+# Cada mención se reduce a tokens sin tildes ni tratamientos ni partículas
+# ('rules.json', sección 'entidades.resolucion'). Para no comparar todos los pares, una
+# mención solo se compara con las entidades que comparten alguna clave de bloqueo: cada
+# token completo (apellidos y nombres) y la cadena de iniciales de los nombres de tres o
+# más tokens y de las menciones de solo iniciales ('M.F.B.J.'). Las personas se comparan
+# token a token (una inicial coincide con cualquier token que empiece por ella);
+# organizaciones y lugares, por igualdad de tokens.
+
+Tokens = Tuple[str, ...]
+
+# Categorías resueltas y prefijo de sus ids
+CATEGORIAS: Dict[str, str] = {"PERSONAS": "per", "ORGANIZACIONES": "org", "LUGARES": "loc"}
+_ARTICULOS = frozenset({"el", "la", "los", "las"})
+_TOKEN_RE = re.compile(r"[a-zñ]+")
+
+
+def _strip_leading(mencion: str, categoria: str, rules: CompiledRules) -> Tuple[str, List[str]]:
+    """
+    (mención desde el primer token que no es tratamiento/artículo, sus tokens plegados).
+    El recorte se hace sobre el texto original, que conserva mayúsculas y tildes.
+    """
+    plegada = fold_accents(mencion)
+    coincidencias = list(_TOKEN_RE.finditer(plegada))
+    iniciales = _ARTICULOS if categoria != "PERSONAS" else rules.entidades_tratamientos
+    primero = 0
+    while primero < len(coincidencias) and coincidencias[primero].group() in iniciales:
+        primero += 1
+    tokens = [m.group() for m in coincidencias[primero:]]
+    if primero == 0 or not tokens or len(plegada) != len(mencion):
+        # Sin tratamientos, o un carácter cambió de longitud al plegar: no hay posición segura
+        return mencion, tokens
+    return mencion[coincidencias[primero].start():], tokens
+
+
+def name_tokens(mencion: str, categoria: str = "PERSONAS", rules: Optional[CompiledRules] = None) -> Tokens:
+    """
+    Tokens comparables de una mención: sin tildes, en minúsculas y sin partículas.
+    A las personas se les quitan además los tratamientos del inicio ('el procesado',
+    'doctora'); a organizaciones y lugares, solo los artículos.
+    """
+    rules = rules or get_rules()
+    _, tokens = _strip_leading(mencion, categoria, rules)
+    return tuple(token for token in tokens if token not in rules.entidades_particulas)
+
+
+def blocking_keys(tokens: Tokens) -> Set[str]:
+    """Claves de bloqueo: 't:<token>' por cada token completo e 'i:<iniciales>' (ver arriba)."""
+    claves = {f"t:{token}" for token in tokens if len(token) > 1}
+    if tokens and (len(tokens) >= 3 or not claves):
+        claves.add("i:" + "".join(token[0] for token in tokens))
+    return claves
+
+
+def match_score(a: Tokens, b: Tokens) -> int:
+    """
+    Compatibilidad de dos nombres de persona: cada token del más corto debe emparejarse
+    con un token distinto del más largo (igualdad, o inicial con la misma primera letra).
+
+    Returns:
+        El número de tokens completos iguales (al menos 1); 0 si los nombres no son
+        compatibles o no comparten ningún token completo, salvo que el más corto sea
+        solo iniciales de tres o más tokens ('M.F.B.J.').
+    """
+    corto, largo = sorted((a, b), key=len)
+    disponibles = list(largo)
+    completos = 0
+    # Primero los tokens completos, que solo se emparejan por igualdad o con una inicial
+    for token in sorted(corto, key=len, reverse=True):
+        if token in disponibles:
+            disponibles.remove(token)
+            completos += len(token) > 1
+            continue
+        pareja = next((t for t in disponibles if t[0] == token[0] and (len(t) == 1 or len(token) == 1)), None)
+        if pareja is None:
+            return 0
+        disponibles.remove(pareja)
+    if completos == 0 and (len(corto) < 3 or any(len(token) > 1 for token in corto)):
+        return 0
+    return max(completos, 1)
+
+
+def completeness(tokens: Tokens) -> Tuple[int, int, int]:
+    """Qué tan completo es un nombre: tokens completos, tokens y letras (mayor es más completo)."""
+    return sum(len(token) > 1 for token in tokens), len(tokens), sum(map(len, tokens))
+
+
+def entity_id(categoria: str, tokens: Tokens) -> str:
+    """Id estable de una entidad a partir de sus tokens canónicos (el mismo en todos los documentos)."""
+    return f"{CATEGORIAS[categoria]}-{hashlib.sha1(' '.join(tokens).encode('utf-8')).hexdigest()[:12]}"
+
+
+class _Entidad:
+    __slots__ = ("tokens", "nombre", "menciones", "secciones")
+
+    def __init__(self, tokens: Tokens, nombre: str):
+        self.tokens = tokens
+        self.nombre = nombre
+        self.menciones: Set[str] = set()
+        self.secciones: Set[str] = set()
+
+
+def _resolve_category(categoria: str, menciones: Iterable[Tuple[str, str]],
+                      rules: CompiledRules) -> List[Dict[str, Any]]:
+    entidades: List[_Entidad] = []
+    bloques: Dict[str, List[int]] = {}
+
+    tokenizadas = []
+    for seccion, mencion in menciones:
+        mencion = collapse_whitespace(mencion)
+        nombre, tokens = _strip_leading(mencion, categoria, rules)
+        tokens = tuple(token for token in tokens if token not in rules.entidades_particulas)
+        if tokens:
+            tokenizadas.append((tokens, seccion, mencion, nombre))
+    # Las menciones más completas primero: fijan el nombre canónico de cada entidad, que
+    # es la mención sin sus tratamientos ('el procesado Mario Benavides' -> 'Mario Benavides')
+    tokenizadas.sort(key=lambda t: (tuple(-x for x in completeness(t[0])), t[3], t[2]))
+
+    for tokens, seccion, mencion, nombre in tokenizadas:
+        claves = blocking_keys(tokens)
+        candidatas = {i for clave in claves for i in bloques.get(clave, ())}
+        if categoria == "PERSONAS":
+            puntajes = [(match_score(tokens, entidades[i].tokens), i) for i in candidatas]
+        else:
+            puntajes = [(1, i) for i in candidatas if entidades[i].tokens == tokens]
+        mejor = max((p for p, _ in puntajes), default=0)
+        ganadoras = [i for p, i in puntajes if p == mejor and p > 0]
+        if len(ganadoras) > 1:
+            # Ambigua ('Benavides' con dos personas de ese apellido): solo se une a una
+            # entidad con exactamente los mismos tokens (otra mención igual de ambigua)
+            ganadoras = [i for i in ganadoras if entidades[i].tokens == tokens]
+        if len(ganadoras) == 1:
+            entidad = entidades[ganadoras[0]]
+        else:
+            entidad = _Entidad(tokens, nombre)
+            entidades.append(entidad)
+            for clave in claves:
+                bloques.setdefault(clave, []).append(len(entidades) - 1)
+        entidad.menciones.add(mencion)
+        entidad.secciones.add(seccion)
+
+    return [
+        {"id": entity_id(categoria, e.tokens), "nombre": e.nombre,
+         "menciones": sorted(e.menciones), "secciones": sorted(e.secciones)}
+        for e in sorted(entidades, key=lambda e: e.nombre)
+    ]
+
+
+def resolve_entities(entidades: Dict[str, Dict[str, List[str]]], metadatos: Optional[Dict[str, Any]] = None,
+                     rules: Optional[CompiledRules] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Agrupa las menciones de un documento por entidad.
+
+    Args:
+        entidades: Entidades por sección (la salida de la etapa 'entities').
+        metadatos: Metadatos del documento; el magistrado ponente se agrega como mención
+                   de persona de la 'sección' metadatos.
+        rules: Reglas compiladas a usar (por defecto, las vigentes).
+
+    Returns:
+        Por categoría, una lista de {"id", "nombre", "menciones", "secciones"}. El id
+        depende solo del nombre canónico: la misma persona nombrada completa en dos
+        sentencias tiene el mismo id (corpus.entity_registry une además las variantes
+        entre documentos).
+    """
+    rules = rules or get_rules()
+    menciones: Dict[str, List[Tuple[str, str]]] = {categoria: [] for categoria in CATEGORIAS}
+    for seccion, por_categoria in entidades.items():
+        for categoria, textos in por_categoria.items():
+            if categoria in menciones:
+                menciones[categoria].extend((seccion, texto) for texto in textos)
+    ponente = (metadatos or {}).get("magistrado_ponente")
+    if ponente:
+        menciones["PERSONAS"].append(("metadatos", ponente))
+
+    return {categoria: _resolve_category(categoria, lista, rules) for categoria, lista in menciones.items()}
@@ -1,93 +1,76 @@
-import spacy
-import re
-from typing import List, Dict, Set
-
-# Cargar el modelo en español una sola vez
-try:
-    nlp = spacy.load("es_core_news_md")
-except OSError:
-    print("Descargando el modelo 'es_core_news_md' de SpaCy. Esto solo sucederá una vez.")
-    spacy.cli.download("es_core_news_md")
-    nlp = spacy.load("es_core_news_md")
-
-def extract_hechos(text: str) -> List[str]:
+from typing import List, Dict, Optional, Set, Tuple, Union
+
+from nlp.tiers import AnalysisTier, get_tier
+from utils.document import SentenciaDocument, as_document
+from utils.minhash import MinHasher, LSHIndex, shingles
+from utils.rules import CompiledRules, get_rules
+
+# Umbral de similitud (Jaccard estimado sobre 5-gramas de caracteres) a partir del cual
+# dos oraciones se consideran el mismo hecho, p. ej. cuando el encabezado de página
+# repetido por pdfplumber aparece en medio de oraciones casi idénticas.
+HECHOS_SIMILARITY_THRESHOLD = 0.8
+_hechos_hasher = MinHasher(num_perm=64, seed=27)
+
+# El pipeline de spaCy lo elige el nivel de análisis (nlp.tiers) y se carga una sola vez
+# por proceso; con modelo, parse_cached reutiliza el Doc guardado en disco si la sección
+# ya fue procesada.
+
+def extract_hechos(text: Union[str, SentenciaDocument], rules: Optional[CompiledRules] = None,
+                   tier: Optional[AnalysisTier] = None) -> List[str]:
     """
     Extrae los hechos relevantes de un texto, priorizando oraciones que describen
     acciones, eventos, imputaciones o situaciones fácticas clave.
 
     Args:
-        text: El texto de la sección de hechos o de la sentencia completa.
+        text: El texto de la sección de hechos o de la sentencia completa (o su
+              SentenciaDocument).
+        rules: Reglas compiladas a usar (por defecto, las vigentes).
+        tier: Nivel de análisis que produce el Doc (por defecto, 'tiers.default').
 
     Returns:
         Una lista de strings, cada uno representando un hecho relevante,
         ordenados por relevancia (hasta un máximo de 10).
     """
-    doc = nlp(text)
+    rules = rules or get_rules()
+    documento = as_document(text)
+    doc = (tier or get_tier()).parse(documento.raw, rules)
+    # Las oraciones se puntúan sobre la vista en minúsculas del texto, calculada una sola vez
+    texto_lower = documento.lower
     candidatos_hechos: Dict[str, int] = {} # Usaremos un diccionario para almacenar la oración y su puntaje
+    posiciones: Dict[str, Tuple[int, int]] = {} # inicio y fin de cada oración candidata en el texto
 
-    # Palabras clave mejoradas y más específicas para identificar hechos.
-    # Incluyen verbos de acción y términos relacionados con eventos o situaciones.
-    palabras_clave_fuertes = {
-        "imputación", "acusación", "procesado", "formuló", "sucedió", "ocurrió",
-        "delito", "falsedad", "hurto", "homicidio", "captura", "investigación",
-        "interpuso", "presentó", "declaró", "testificó", "evidenció", "demostró",
-        "condenó", "absolvió", "hallazgo", "se constató", "se comprobó", "se determinó"
-    }
-
-    palabras_clave_medias = {
-        "hecho", "evento", "incidente", "actuación", "trámite", "judicial",
-        "denuncia", "victima", "agresor", "sentencia", "decisión", "providencia"
-    }
-
-    # Términos que, si están presentes, reducen la relevancia factual (suelen ser procesales o genéricos)
-    palabras_clave_ruido = {
-        "resolución", "consideración", "jurisdiccional", "recurso", "apelación",
-        "criterio", "fundamento", "conclusiones", "resuelve", "declara", "firma"
-    }
+    # Las palabras clave y sus pesos están en 'rules.json', sección 'hechos': fuertes
+    # (verbos de acción, imputaciones), medias y de ruido (términos procesales o
+    # genéricos, con peso negativo).
 
     for sent in doc.sents:
         sent_text_original = sent.text.strip()
-        sent_text_lower = sent_text_original.lower()
+        sent_text_lower = texto_lower[sent.start_char:sent.end_char].strip()
         score = 0
 
         # Reglas de puntuación para identificar la relevancia de un hecho:
-        # 1. Puntuar por palabras clave fuertes
-        for palabra in palabras_clave_fuertes:
-            if palabra in sent_text_lower:
-                score += 3 # Mayor peso para palabras clave muy indicativas
-
-        # 2. Puntuar por palabras clave medias
-        for palabra in palabras_clave_medias:
-            if palabra in sent_text_lower:
-                score += 1
-
-        # 3. Restar puntos por palabras clave de ruido
-        for palabra in palabras_clave_ruido:
-            if palabra in sent_text_lower:
-                score -= 2 # Reducir peso si aparecen términos no factuales
-
-        # 4. Puntuar por presencia de entidades nombradas (personas, organizaciones, lugares, fechas)
+        # 1. Sumar (o restar) el peso de cada grupo de palabras clave presentes
+        for palabras, peso in rules.hechos_terminos:
+            for palabra in palabras:
+                if palabra in sent_text_lower:
+                    score += peso
+
+        # 2. Puntuar por presencia de entidades nombradas (personas, organizaciones, lugares, fechas)
         # Los hechos suelen involucrar actores, lugares y tiempos.
-        entidades_en_sent = [ent.label_ for ent in sent.ents]
-        if "PER" in entidades_en_sent:
-            score += 2
-        if "ORG" in entidades_en_sent:
-            score += 1
-        if "LOC" in entidades_en_sent:
-            score += 1
-        if "DATE" in entidades_en_sent: # Fechas son muy importantes para hechos
-            score += 3
-
-        # 5. Filtrar oraciones que son puramente procesales o introductorias/conclusivas
-        if "se pronuncia la sala respecto" in sent_text_lower:
-            score = 0 # Ignorar completamente estas oraciones introductorias
-        if sent_text_lower.startswith(("en mérito de lo expuesto", "comuníquese y cúmplase")):
+        for etiqueta in {ent.label_ for ent in sent.ents}:
+            score += rules.hechos_peso_entidades.get(etiqueta, 0)
+
+        # 3. Filtrar oraciones que son puramente procesales o introductorias/conclusivas
+        if any(frase in sent_text_lower for frase in rules.hechos_descartar_si_contiene):
+            score = 0
+        if sent_text_lower.startswith(rules.hechos_descartar_si_empieza):
             score = 0
 
         # Solo añadir oraciones con un puntaje positivo y que no sean demasiado cortas
-        if score > 0 and len(sent_text_original) > 20: # Un umbral mínimo para evitar frases triviales
+        if score > 0 and len(sent_text_original) > rules.hechos_longitud_minima: # evita frases triviales
             # Usamos el texto original para evitar la pérdida de mayúsculas/minúsculas o formato
             candidatos_hechos[sent_text_original] = score
+            posiciones[sent_text_original] = (sent.start_char, sent.end_char)
 
     # Ordenar los hechos por puntaje de mayor a menor
     # Usamos dict.items() para obtener pares (oración, puntaje)
@@ -96,24 +79,28 @@ def extract_hechos(text: str) -> List[str]:
     # Extraer solo las oraciones, asegurando que no haya duplicados si el mismo hecho
     # fue capturado con diferentes puntuaciones o por otros motivos.
     # Usamos un set para el resultado final para garantizar la unicidad
+    # Además de los duplicados exactos, se descartan los casi duplicados mediante
+    # MinHash/LSH: cada hecho aceptado se indexa y los siguientes solo se comparan
+    # con los candidatos que comparten alguna banda, no con todos los anteriores.
     hechos_finales_unicos: List[str] = []
     seen_hechos: Set[str] = set()
+    lsh_hechos = LSHIndex(num_perm=_hechos_hasher.num_perm, bands=16)
 
     for hecho_text, _ in hechos_ordenados:
-        normalized_hecho = normalize_string_for_comparison(hecho_text)
-        if normalized_hecho not in seen_hechos:
-            hechos_finales_unicos.append(hecho_text)
-            seen_hechos.add(normalized_hecho)
-            if len(hechos_finales_unicos) >= 10: # Limitar a un máximo de 10 hechos
-                break
+        # Forma normalizada para la comparación (minúsculas, espacios colapsados), tomada
+        # de la vista colapsada del documento en lugar de normalizar cada oración
+        normalized_hecho = documento.collapsed_span(*posiciones[hecho_text], lower=True)
+        if normalized_hecho in seen_hechos:
+            continue
+
+        firma = _hechos_hasher.signature(shingles(normalized_hecho, k=5))
+        if lsh_hechos.query(firma, threshold=HECHOS_SIMILARITY_THRESHOLD):
+            continue
+
+        hechos_finales_unicos.append(hecho_text)
+        seen_hechos.add(normalized_hecho)
+        lsh_hechos.add(len(hechos_finales_unicos), firma)
+        if len(hechos_finales_unicos) >= rules.hechos_maximo: # Limitar el número de hechos
+            break
 
     return hechos_finales_unicos
-
-# --- Función auxiliar para normalizar hechos para comparación/deduplicación ---
-def normalize_string_for_comparison(text: str) -> str:
-    """Normaliza un string para propósitos de comparación y deduplicación (lower case, espacios)."""
-    text = re.sub(r"\s+", " ", text).strip().lower()
-    # Podrías ser más agresivo en la limpieza de puntuación si los duplicados
-    # son un problema por diferencias de comas/puntos.
-    # text = re.sub(r"[^\w\sÁÉÍÓÚáéíóúñÑ]", "", text)
-    return text
\ No newline at end of file
@@ -1,87 +1,184 @@
 import re
-from typing import Dict, List, Union
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple, Union
 
-def extract_metadata(text: str) -> Dict[str, Union[str, List[str]]]:
+# Los metadatos de una sentencia están casi siempre en la portada (CUI, número interno,
+# fecha, ponente, sala) o en el bloque de firmas del final. Se buscan primero en esas
+# ventanas y solo los campos que falten se buscan en el texto completo.
+HEADER_WINDOW_CHARS = 5000
+SIGNATURE_WINDOW_CHARS = 3000
+
+UBICACION_ENCABEZADO = "encabezado"
+UBICACION_FIRMA = "firma"
+UBICACION_TEXTO_COMPLETO = "texto_completo"
+# Con extracción parcial (analyzer.extractor.extract_text_for_fields), el "texto completo"
+# son solo las páginas leídas
+UBICACION_PAGINAS_LEIDAS = "paginas_leidas"
+
+_FECHA_PATTERN = (
+    r"(?:(?:[A-Z][a-záéíóúñ]+\s+D\.?C\.?|Bogotá\s+D\.?C\.?),\s*)?(?:uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno|veintidós|veintitrés|veinticuatro|veinticinco|veintiséis|veintisiete|veintiocho|veintinueve|treinta|treinta\s+y\s+uno|\d{1,2})\s*(?:\([\d]{1,2}\))?\s+de\s+(?:enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+de\s+(?:dos\s+mil\s+\d{2}|mil\s+novecient[ao]s\s+\d{2,3}|\d{4})"
+)
+
+# Patrones por campo: (campo, regla, patrón). Cada campo puede tener una regla principal
+# y una alternativa; la principal (la primera de la lista) gana aunque la alternativa
+# aparezca antes en el texto.
+_FIELD_RULES: List[Tuple[str, str, str]] = [
+    # 1. CUI (Código Único de Identificación)
+    ("cui", "cui", r"C(?:U\.?|u)\s*I[:\s]*(?P<cui_valor>[0-9\s]{10,25})"),
+    # 2. Número interno del expediente
+    ("numero_interno", "interno", r"N[ÚU]MERO\s*INTERNO[:\s]*(?P<interno_valor>\d+)"),
+    ("numero_interno", "radicacion", r"Radicación\s*N°\s*(?P<radicacion_valor>\d+)"),
+    # 4. Fecha de la sentencia
+    ("fecha_sentencia", "fecha", _FECHA_PATTERN),
+    ("fecha_sentencia", "fecha_simple", r"\b\d{1,2}\s+de\s+[a-z]+\s+de\s+\d{4}\b"),
+    # 5. Magistrado Ponente
+    ("magistrado_ponente", "ponente", r"(?:Magistrad[ao]\s+Ponente|Ponente)[:\s]*(?P<ponente_valor>.*?)(?=\n)"),
+    # 6. Sala o Corporación (Ej: "Sala de Casación Penal", "Corte Suprema de Justicia")
+    ("corporacion_sala", "sala", r"(?:Sala\s+de\s+Casación\s+(?:Penal|Civil|Laboral|Agraria|Única)|Tribunal\s+Superior\s+de\s+[A-Z][a-záéíóúñ]+\s+de\s+[A-Z][a-záéíóúñ]+|Corte\s+Suprema\s+de\s+Justicia|Consejo\s+de\s+Estado)"),
+    ("corporacion_sala", "sala_generica", r"Sala\s+(?:Especial\s+de\s+Primera\s+Instancia|Penal|Civil|Laboral|de\s+Familia|Única)"),
+]
+
+_FIELDS: Tuple[str, ...] = tuple(dict.fromkeys(campo for campo, _, _ in _FIELD_RULES))
+
+# 3. Referencias tipo (AP, SP, TP, CP, SL, SC, SU, etc.): se citan a lo largo de toda la
+# providencia, así que este campo siempre se busca en el texto completo. La anticipación
+# '(?=[astc])' descarta de inmediato las posiciones que no pueden iniciar una referencia.
+_REFERENCIAS_RE = re.compile(
+    r"\b(?=[astc])(?:AP|SP|TP|CP|SL|SC|SU|STL|SCC|SCL|SJR|SLR)\d{3,6}(?:[\-\s/]\d{2,4})?\b", re.IGNORECASE
+)
+_PONENTE_NOMBRE_RE = re.compile(r"^[A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$")
+_DIGITO_RE = re.compile(r"\d")
+_ESPACIOS_RE = re.compile(r"\s+")
+
+
+# Cada regla se compila una sola vez al importar el módulo. Se probó un único regex con
+# todas las reglas en alternancia, pero es ~10 veces más lento: debe intentar todas las
+# alternativas en cada posición y no puede detenerse en la primera coincidencia de cada campo.
+_COMPILED_RULES: List[Tuple[str, str, Pattern]] = [
+    (campo, regla, re.compile(patron, re.IGNORECASE)) for campo, regla, patron in _FIELD_RULES
+]
+
+
+def _field_value(regla: str, match: "re.Match") -> Optional[str]:
+    """Normaliza el valor capturado por una regla; None si la coincidencia no es válida."""
+    if regla == "cui":
+        return _ESPACIOS_RE.sub("", match.group("cui_valor")).strip()
+    if regla == "interno":
+        return match.group("interno_valor").strip()
+    if regla == "radicacion":
+        return match.group("radicacion_valor").strip()
+    if regla == "fecha":
+        return _ESPACIOS_RE.sub(" ", match.group(0).strip())
+    if regla == "ponente":
+        # Validar si el texto extraído es un nombre de persona válido y no un radicado.
+        candidato = match.group("ponente_valor").strip()
+        if (
+            _PONENTE_NOMBRE_RE.search(candidato) and
+            not _DIGITO_RE.search(candidato) and
+            not any(term in candidato.lower() for term in ["honorables", "sala", "corte"])
+        ):
+            return candidato
+        return None
+    return match.group(0).strip()
+
+
+def _scan(text: str, campos: FrozenSet[str]) -> Dict[str, Tuple[str, int]]:
+    """
+    Busca los campos pedidos en el texto con los patrones precompilados.
+
+    Returns:
+        {campo: (valor, posición)} con la primera coincidencia válida de la regla principal
+        o, si no la hay, de la alternativa.
+    """
+    encontrados: Dict[str, Tuple[str, int]] = {}
+
+    for campo, regla, patron in _COMPILED_RULES:
+        if campo not in campos or campo in encontrados:
+            continue
+        for match in patron.finditer(text):
+            valor = _field_value(regla, match)
+            if valor is not None:
+                encontrados[campo] = (valor, match.start())
+                break
+
+    return encontrados
+
+
+def extract_metadata(text: str) -> Dict[str, Union[str, List[str], Dict[str, str], None]]:
     """
     Extrae metadatos clave de una sentencia, incluyendo CUI, número interno,
     referencias, fecha de la sentencia, magistrado ponente, y corporación/sala.
 
+    Primero se examina la ventana de encabezado (portada) y luego el bloque de firmas;
+    solo los campos que sigan sin encontrarse se buscan en el texto completo.
+
     Args:
         text: El texto completo de la sentencia.
 
     Returns:
         Un diccionario con los metadatos extraídos. Los valores pueden ser strings
-        o listas de strings (para múltiples referencias, por ejemplo).
+        o listas de strings (para múltiples referencias, por ejemplo). La clave
+        'ubicacion_campos' indica dónde se encontró cada campo
+        ('encabezado', 'firma' o 'texto_completo'; ver mark_partial_pages).
     """
-    metadata: Dict[str, Union[str, List[str]]] = {}
-
-    # 1. CUI (Código Único de Identificación)
-    cui_match = re.search(r"C(?:U\.?|u)\s*I[:\s]*([0-9\s]{10,25})", text, re.IGNORECASE)
-    if cui_match:
-        cui_normalized = re.sub(r"\s+", "", cui_match.group(1)).strip()
-        metadata["cui"] = cui_normalized
+    metadata: Dict[str, Union[str, List[str], Dict[str, str], None]] = {}
+    ubicaciones: Dict[str, str] = {}
+    encontrados: Dict[str, str] = {}
 
-    # 2. Número interno del expediente
-    interno_match = re.search(r"N[ÚU]MERO\s*INTERNO[:\s]*(\d+)", text, re.IGNORECASE)
-    if interno_match:
-        metadata["numero_interno"] = interno_match.group(1).strip()
+    if len(text) <= HEADER_WINDOW_CHARS + SIGNATURE_WINDOW_CHARS:
+        # Documento corto: una sola pasada, la ubicación se deduce de la posición.
+        for campo, (valor, pos) in _scan(text, frozenset(_FIELDS)).items():
+            encontrados[campo] = valor
+            if pos < HEADER_WINDOW_CHARS:
+                ubicaciones[campo] = UBICACION_ENCABEZADO
+            elif pos >= len(text) - SIGNATURE_WINDOW_CHARS:
+                ubicaciones[campo] = UBICACION_FIRMA
+            else:
+                ubicaciones[campo] = UBICACION_TEXTO_COMPLETO
     else:
-        radicacion_match = re.search(r"Radicación\s*N°\s*(\d+)", text, re.IGNORECASE)
-        if radicacion_match:
-            metadata["numero_interno"] = radicacion_match.group(1).strip()
-
-    # 3. Referencias tipo (AP, SP, TP, CP, SL, SC, SU, etc.) con número y posible año
-    referencias_match = re.findall(
-        r"\b(?:AP|SP|TP|CP|SL|SC|SU|STL|SCC|SCL|SJR|SLR)\d{3,6}(?:[\-\s/]\d{2,4})?\b",
-        text, re.IGNORECASE
-    )
+        ventanas = [
+            (UBICACION_ENCABEZADO, text[:HEADER_WINDOW_CHARS]),
+            (UBICACION_FIRMA, text[-SIGNATURE_WINDOW_CHARS:]),
+            (UBICACION_TEXTO_COMPLETO, text),
+        ]
+        for ubicacion, ventana in ventanas:
+            faltantes = frozenset(campo for campo in _FIELDS if campo not in encontrados)
+            if not faltantes:
+                break
+            for campo, (valor, _) in _scan(ventana, faltantes).items():
+                encontrados[campo] = valor
+                ubicaciones[campo] = ubicacion
+
+    referencias_match = _REFERENCIAS_RE.findall(text)
     if referencias_match:
-        metadata["referencias"] = list(dict.fromkeys([r.strip().upper() for r in referencias_match]))
+        encontrados["referencias"] = list(dict.fromkeys([r.strip().upper() for r in referencias_match]))
+        ubicaciones["referencias"] = UBICACION_TEXTO_COMPLETO
 
-    # 4. Fecha de la sentencia
-    fecha_match = re.search(
-        r"(?:(?:[A-Z][a-záéíóúñ]+\s+D\.?C\.?|Bogotá\s+D\.?C\.?),\s*)?(?:uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno|veintidós|veintitrés|veinticuatro|veinticinco|veintiséis|veintisiete|veintiocho|veintinueve|treinta|treinta\s+y\s+uno|\d{1,2})\s*(?:\([\d]{1,2}\))?\s+de\s+(?:enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+de\s+(?:dos\s+mil\s+\d{2}|mil\s+novecient[ao]s\s+\d{2,3}|\d{4})",
-        text, re.IGNORECASE | re.DOTALL
-    )
-    if fecha_match:
-        metadata["fecha_sentencia"] = re.sub(r"\s+", " ", fecha_match.group(0).strip())
-    else:
-        fecha_simple_match = re.search(
-            r"\b(\d{1,2}\s+de\s+[a-z]+\s+de\s+\d{4})\b", text, re.IGNORECASE
-        )
-        if fecha_simple_match:
-            metadata["fecha_sentencia"] = fecha_simple_match.group(0).strip()
-
-
-    # 5. Magistrado Ponente - Lógica de extracción mejorada
-    ponente_match = re.search(
-        r"(?:Magistrad[ao]\s+Ponente|Ponente)[:\s]*(.*?)(?=\n)",
-        text,
-        re.IGNORECASE
-    )
-    if ponente_match:
-        ponente_candidato = ponente_match.group(1).strip()
-        
-        # Validar si el texto extraído es un nombre de persona válido y no un radicado.
-        if (
-            re.search(r"^[A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$", ponente_candidato) and
-            not re.search(r'\d', ponente_candidato) and
-            not any(term in ponente_candidato.lower() for term in ["honorables", "sala", "corte"])
-        ):
-            metadata["magistrado_ponente"] = ponente_candidato
-        else:
-            metadata["magistrado_ponente"] = None
-    else:
-        metadata["magistrado_ponente"] = None
+    # Se conserva el orden de claves histórico de la salida
+    for campo in ("cui", "numero_interno", "referencias", "fecha_sentencia", "magistrado_ponente", "corporacion_sala"):
+        if campo in encontrados:
+            metadata[campo] = encontrados[campo]
+        elif campo == "magistrado_ponente":
+            metadata[campo] = None
 
+    metadata["ubicacion_campos"] = ubicaciones
+    return metadata
 
-    # 6. Sala o Corporación (Ej: "Sala de Casación Penal", "Corte Suprema de Justicia")
-    sala_match = re.search(r"(?:Sala\s+de\s+Casación\s+(?:Penal|Civil|Laboral|Agraria|Única)|Tribunal\s+Superior\s+de\s+[A-Z][a-záéíóúñ]+\s+de\s+[A-Z][a-záéíóúñ]+|Corte\s+Suprema\s+de\s+Justicia|Consejo\s+de\s+Estado)", text, re.IGNORECASE)
-    if sala_match:
-        metadata["corporacion_sala"] = sala_match.group(0).strip()
-    else:
-        sala_generica_match = re.search(r"Sala\s+(?:Especial\s+de\s+Primera\s+Instancia|Penal|Civil|Laboral|de\s+Familia|Única)", text, re.IGNORECASE)
-        if sala_generica_match:
-            metadata["corporacion_sala"] = sala_generica_match.group(0).strip()
 
-    return metadata
\ No newline at end of file
+def missing_fields(metadata: Dict[str, Union[str, List[str], Dict[str, str], None]],
+                   campos: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Campos de portada y firma que extract_metadata no encontró, entre 'campos' (por
+    defecto, todos menos 'referencias').
+    """
+    return [campo for campo in (_FIELDS if campos is None else campos) if not metadata.get(campo)]
+
+
+def mark_partial_pages(metadata: Dict[str, Union[str, List[str], Dict[str, str], None]]):
+    """
+    Marca como 'paginas_leidas' los campos buscados en el texto completo cuando el texto
+    es solo algunas páginas: las 'referencias', por ejemplo, son solo las citadas en ellas.
+    """
+    ubicaciones = metadata.get("ubicacion_campos") or {}
+    for campo, ubicacion in ubicaciones.items():
+        if ubicacion == UBICACION_TEXTO_COMPLETO:
+            ubicaciones[campo] = UBICACION_PAGINAS_LEIDAS
@@ -1,33 +1,42 @@
 import spacy
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
-# Usamos una variable global privada para almacenar la instancia del modelo NLP.
-# Optional[spacy.Language] indica que puede ser un objeto SpaCy.Language o None.
-_nlp_model: Optional[spacy.Language] = None
+# Modelo con vectores de palabras que se usa cuando no se indica otro (el índice de
+# precedentes similares depende de sus vectores). Los niveles de análisis de
+# 'config.json' (sección 'tiers', ver nlp.tiers) eligen el modelo de cada análisis.
+DEFAULT_MODEL = "es_core_news_md"
 
-def get_nlp_model() -> spacy.Language:
+# Modelos ya cargados en el proceso, por (nombre, componentes excluidos).
+_nlp_models: Dict[Tuple[str, Tuple[str, ...]], spacy.Language] = {}
+
+def get_nlp_model(model: Optional[str] = None, exclude: Iterable[str] = ()) -> spacy.Language:
     """
-    Retorna una única instancia del modelo de SpaCy 'es_core_news_md'.
+    Retorna una única instancia por proceso de un modelo de SpaCy (por defecto 'es_core_news_md').
     Si el modelo no ha sido cargado previamente, lo carga.
     Si el modelo no está instalado, intenta descargarlo automáticamente.
 
+    Args:
+        model: Nombre del paquete del modelo (p. ej. 'es_core_news_sm').
+        exclude: Componentes del pipeline que no se cargan (p. ej. 'lemmatizer').
+
     Returns:
         Una instancia del objeto spacy.Language (el modelo NLP cargado).
     """
-    global _nlp_model
+    model = model or DEFAULT_MODEL
+    clave = (model, tuple(sorted(exclude)))
 
-    if _nlp_model is None:
+    if clave not in _nlp_models:
         try:
             # Intenta cargar el modelo
-            _nlp_model = spacy.load("es_core_news_md")
+            _nlp_models[clave] = spacy.load(model, exclude=list(clave[1]))
         except OSError:
             # Si el modelo no se encuentra, intenta descargarlo.
-            print("El modelo 'es_core_news_md' de SpaCy no está instalado.")
+            print(f"El modelo '{model}' de SpaCy no está instalado.")
             print("Intentando descargar el modelo. Esto solo sucederá una vez.")
             try:
-                spacy.cli.download("es_core_news_md")
-                _nlp_model = spacy.load("es_core_news_md")
-                print("Modelo 'es_core_news_md' descargado y cargado exitosamente.")
+                spacy.cli.download(model)
+                _nlp_models[clave] = spacy.load(model, exclude=list(clave[1]))
+                print(f"Modelo '{model}' descargado y cargado exitosamente.")
             except Exception as e:
                 print(f"Error al descargar o cargar el modelo de SpaCy: {e}")
                 # Podrías querer levantar una excepción o manejar este error de forma más robusta
@@ -37,4 +46,4 @@ def get_nlp_model() -> spacy.Language:
             print(f"Ocurrió un error inesperado al cargar el modelo de SpaCy: {e}")
             raise RuntimeError(f"Error al inicializar el modelo de SpaCy: {e}")
 
-    return _nlp_model
\ No newline at end of file
+    return _nlp_models[clave]
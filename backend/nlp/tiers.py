@@ -0,0 +1,126 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.rules import CompiledRules, get_rules
+from utils.settings import get_section
+
+# Niveles de análisis: qué modelo de spaCy y qué componentes se cargan para las etapas
+# que lo usan (entities, hechos). Se definen en 'config.json', sección 'tiers', y se
+# eligen por ejecución (main.py --tier) o por petición ('tier' en la cola, el servidor
+# pre-fork o un lote). spaCy se importa solo al cargar el pipeline de un nivel.
+#
+# Un nivel sin 'modelo' no carga ningún modelo estadístico: el texto se divide en
+# oraciones con reglas (spacy.blank + sentencizer) y las entidades salen de los
+# patrones de 'rules.json' (sección 'entidades.patrones_sin_modelo').
+
+# Niveles por defecto si 'config.json' no tiene la sección 'tiers'
+_DEFAULT_TIERS: Dict[str, Dict[str, Any]] = {
+    "estandar": {"modelo": "es_core_news_md"},
+}
+_DEFAULT_TIER = "estandar"
+
+
+class AnalysisTier:
+    """
+    Un nivel de análisis. parse() produce el Doc que usan las etapas (oraciones y
+    entidades); el pipeline se carga una sola vez por proceso y nivel.
+
+    Los niveles con modelo pasan por la caché de Doc en disco (nlp.doc_cache), cuyo
+    directorio depende del modelo y de sus componentes. El nivel sin modelo no la usa:
+    reconstruir un DocBin cuesta lo mismo que volver a aplicar los patrones, y sus
+    entidades dependen de las reglas vigentes.
+    """
+
+    def __init__(self, nombre: str, modelo: Optional[str] = None, excluir: Tuple[str, ...] = (),
+                 descripcion: str = ""):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.excluir = tuple(excluir)
+        self.descripcion = descripcion
+
+    def __repr__(self) -> str:
+        return f"AnalysisTier({self.nombre!r}, modelo={self.modelo!r}, excluir={self.excluir!r})"
+
+    def load(self):
+        """Carga (una vez por proceso) y retorna el pipeline de spaCy del nivel."""
+        if self.modelo is None:
+            return _rules_only_pipeline()
+        from nlp.nlp_utils import get_nlp_model
+        return get_nlp_model(self.modelo, self.excluir)
+
+    def parse(self, text: str, rules: Optional[CompiledRules] = None):
+        """
+        Retorna el Doc de spaCy de un texto según el nivel.
+
+        Args:
+            text: El texto a procesar (normalmente una sección de la sentencia).
+            rules: Reglas compiladas (solo las usa el nivel sin modelo, para las entidades).
+        """
+        if self.modelo is not None:
+            from nlp.doc_cache import parse_cached
+            return parse_cached(text, self.load())
+
+        from spacy.util import filter_spans
+        doc = self.load()(text)
+        spans = []
+        for etiqueta, patron in (rules or get_rules()).entidades_patrones:
+            for coincidencia in patron.finditer(text):
+                inicio, fin = coincidencia.span(1) if patron.groups else coincidencia.span()
+                span = doc.char_span(inicio, fin, label=etiqueta, alignment_mode="contract")
+                if span is not None and len(span):
+                    spans.append(span)
+        doc.ents = filter_spans(spans)
+        return doc
+
+    def describe(self) -> Dict[str, Any]:
+        return {"nivel": self.nombre, "modelo": self.modelo, "excluir": list(self.excluir),
+                "descripcion": self.descripcion}
+
+
+_rules_only = None
+
+
+def _rules_only_pipeline():
+    global _rules_only
+    if _rules_only is None:
+        import spacy
+        nlp = spacy.blank("es")
+        nlp.add_pipe("sentencizer")
+        _rules_only = nlp
+    return _rules_only
+
+
+def _tier_configs() -> Dict[str, Dict[str, Any]]:
+    return get_section("tiers").get("niveles") or _DEFAULT_TIERS
+
+
+def tier_names() -> List[str]:
+    """Nombres de los niveles configurados, en el orden de 'config.json'."""
+    return list(_tier_configs())
+
+
+def default_tier_name() -> str:
+    return get_section("tiers").get("default", _DEFAULT_TIER)
+
+
+_lock = threading.Lock()
+_tiers: Dict[str, AnalysisTier] = {}
+
+
+def get_tier(nombre: Optional[str] = None) -> AnalysisTier:
+    """
+    Retorna un nivel de análisis (por defecto, 'tiers.default').
+
+    Raises:
+        ValueError: Si el nivel no está en 'config.json'.
+    """
+    nombre = nombre or default_tier_name()
+    with _lock:
+        if nombre not in _tiers:
+            configs = _tier_configs()
+            if nombre not in configs:
+                raise ValueError(f"Nivel de análisis desconocido: {nombre} (disponibles: {', '.join(configs)})")
+            config = configs[nombre]
+            _tiers[nombre] = AnalysisTier(nombre, config.get("modelo"), tuple(config.get("excluir") or ()),
+                                          config.get("descripcion", ""))
+        return _tiers[nombre]
@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+from typing import Dict, Any, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+# Permite lanzar la API con 'uvicorn service.api:app' desde 'backend/'.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from service.job_queue import JobQueue, ESTADO_COMPLETADO
+
+app = FastAPI(title="Judicial Sentence Analyzer", description="API asíncrona de análisis de sentencias.")
+
+# FastAPI ejecuta los endpoints síncronos en un pool de hilos y las conexiones
+# sqlite3 no se comparten entre hilos: cada hilo abre la suya.
+_local = threading.local()
+
+
+def get_queue() -> JobQueue:
+    """Retorna la conexión a la cola de trabajos del hilo actual, abriéndola en el primer uso."""
+    queue: Optional[JobQueue] = getattr(_local, "queue", None)
+    if queue is None:
+        queue = JobQueue()
+        _local.queue = queue
+    return queue
+
+
+class JobRequest(BaseModel):
+    archivo: str = Field(..., description="Ruta del documento, visible para los workers.")
+    prioridad: int = Field(0, description="Mayor valor = se procesa antes.")
+    opciones: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    trabajos: List[JobRequest]
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(job: JobRequest) -> Dict[str, Any]:
+    """Encola un documento y retorna inmediatamente su id de trabajo."""
+    job_id = get_queue().submit(job.archivo, job.prioridad, job.opciones)
+    return {"id": job_id, "estado": "pendiente"}
+
+
+@app.post("/jobs/batch", status_code=202)
+def submit_batch(batch: BatchRequest) -> Dict[str, Any]:
+    """Encola cientos de documentos en una sola transacción."""
+    ids = get_queue().submit_many([job.dict() for job in batch.trabajos])
+    return {"ids": ids, "total": len(ids)}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, incluir_resultado: bool = True) -> Dict[str, Any]:
+    """Consulta el estado de un trabajo (y su resultado cuando está completado)."""
+    trabajo = get_queue().get(job_id, include_result=incluir_resultado)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+    return trabajo
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str) -> Dict[str, Any]:
+    """Retorna solo el resultado del análisis; 409 si el trabajo aún no termina."""
+    trabajo = get_queue().get(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+    if trabajo["estado"] != ESTADO_COMPLETADO:
+        raise HTTPException(status_code=409, detail=f"El trabajo está en estado '{trabajo['estado']}'.")
+    return trabajo["resultado"]
+
+
+@app.get("/queue/stats")
+def queue_stats() -> Dict[str, int]:
+    """Número de trabajos por estado."""
+    return get_queue().stats()
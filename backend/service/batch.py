@@ -0,0 +1,496 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Permite ejecutar este módulo como script ('python service/batch.py') desde 'backend/'.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+# Lotes nocturnos repartidos entre varios nodos que montan el mismo sistema de archivos
+# (NFS, CephFS, SMB). No hay coordinador central: todo el estado del lote vive en su
+# directorio y se modifica solo con operaciones atómicas del sistema de archivos
+# (crear con O_EXCL, rename, link), de modo que cualquier nodo puede morir en cualquier
+# momento y otro retoma su trabajo.
+#
+#   <lote>/manifiesto.json            archivos del lote, tamaño de shard y opciones
+#   <lote>/leases/shard-00012.lease   shard reservado por un worker (mtime = última renovación)
+#   <lote>/completados/shard-00012.json
+#   <lote>/resultados/<clave>_analisis.json
+#   <lote>/errores/<clave>.json
+
+MANIFEST_NAME = "manifiesto.json"
+SUBDIRS = ("leases", "completados", "resultados", "errores")
+
+
+def _write_json(ruta: str, datos: Dict[str, Any]):
+    """Escribe un JSON completo o nada: temporal con nombre único por nodo y proceso, y rename."""
+    temporal = f"{ruta}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def _read_json(ruta: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def result_key(archivo: str) -> str:
+    """Nombre estable del resultado de un archivo (dos archivos con el mismo nombre no chocan)."""
+    nombre = os.path.splitext(os.path.basename(archivo))[0]
+    return f"{nombre}-{hashlib.sha1(archivo.encode('utf-8')).hexdigest()[:10]}"
+
+
+def shard_name(indice: int) -> str:
+    return f"shard-{indice:05d}"
+
+
+def create_batch(lote_dir: str, archivos: List[str], shard_size: Optional[int] = None,
+                 opciones: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Crea el manifiesto de un lote. Es idempotente: si el lote ya existe con los mismos
+    archivos se reutiliza (relanzar el cron de la noche no reinicia el progreso).
+
+    Args:
+        lote_dir: Directorio del lote en el sistema de archivos compartido.
+        archivos: Rutas de los documentos, visibles con la misma ruta desde todos los nodos.
+        shard_size: Archivos por shard (sección 'batch', por defecto 25).
+        opciones: Opciones del análisis de cada archivo (p. ej. {'fields': [...], 'tier': 'rapido'}).
+
+    Returns:
+        El manifiesto.
+
+    Raises:
+        ValueError: Si el directorio ya contiene un lote con otros archivos.
+    """
+    archivos = [os.path.abspath(archivo) for archivo in archivos]
+    ruta = os.path.join(lote_dir, MANIFEST_NAME)
+    existente = _read_json(ruta)
+    if existente is not None:
+        if existente["archivos"] != archivos:
+            raise ValueError(f"{lote_dir} ya contiene un lote con otros archivos")
+        return existente
+
+    for subdir in SUBDIRS:
+        os.makedirs(os.path.join(lote_dir, subdir), exist_ok=True)
+    manifiesto = {
+        "creado_en": time.time(),
+        "shard_size": int(shard_size or get_section("batch").get("shard_size", 25)),
+        "opciones": opciones or {},
+        "archivos": archivos,
+    }
+    _write_json(ruta, manifiesto)
+    return manifiesto
+
+
+class ShardLease:
+    """
+    Reserva de un shard: un archivo creado con O_CREAT | O_EXCL (atómico también en
+    NFSv3+), cuyo mtime se renueva mientras el worker vive. Una reserva sin renovar
+    durante 'lease_seconds' se considera de un worker muerto y se puede reclamar.
+
+    El vencimiento compara el mtime (lo fija el servidor de archivos) con el reloj del
+    nodo: los nodos deben tener el reloj sincronizado (NTP) con un desfase muy inferior
+    a 'lease_seconds'.
+    """
+
+    def __init__(self, ruta: str, token: str):
+        self.ruta = ruta
+        self.token = token
+        self.perdida = threading.Event()
+
+    @classmethod
+    def acquire(cls, ruta: str, worker_id: str, lease_seconds: float) -> Optional["ShardLease"]:
+        """Reserva el shard; si hay una reserva vencida, la reclama. None si está tomado."""
+        token = uuid.uuid4().hex
+        if cls._create(ruta, worker_id, token):
+            return cls(ruta, token)
+
+        actual = _read_json(ruta) or {}  # vacía si el worker murió al crearla
+        try:
+            vencida = time.time() - os.stat(ruta).st_mtime > lease_seconds
+        except FileNotFoundError:
+            vencida = False  # se liberó entre tanto: se intenta en la próxima pasada
+        if not vencida:
+            return None
+
+        # Se aparta la reserva vencida con un rename: de varios workers que la reclaman a
+        # la vez, solo uno lo consigue.
+        apartada = f"{ruta}.{token}.vencida"
+        try:
+            os.rename(ruta, apartada)
+        except FileNotFoundError:
+            return None
+        if (_read_json(apartada) or {}).get("token") != actual.get("token"):
+            # Otro worker la reclamó y creó una reserva nueva entre el stat y el rename:
+            # se devuelve esa reserva a su lugar (link falla si ya existe otra).
+            try:
+                os.link(apartada, ruta)
+            except FileExistsError:
+                pass
+            os.unlink(apartada)
+            return None
+        os.unlink(apartada)
+        logger.warning(f"♻️ Reserva vencida de {actual.get('worker')} en {os.path.basename(ruta)}: la toma {worker_id}")
+        return cls(ruta, token) if cls._create(ruta, worker_id, token) else None
+
+    @staticmethod
+    def _create(ruta: str, worker_id: str, token: str) -> bool:
+        try:
+            fd = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": worker_id, "host": socket.gethostname(), "pid": os.getpid(),
+                       "token": token, "tomada_en": time.time()}, f)
+        return True
+
+    def is_ours(self) -> bool:
+        return (_read_json(self.ruta) or {}).get("token") == self.token
+
+    def renew(self) -> bool:
+        """Renueva el mtime si la reserva sigue siendo nuestra; si no, la marca como perdida."""
+        try:
+            if self.is_ours():
+                os.utime(self.ruta)
+                return True
+        except FileNotFoundError:
+            pass
+        self.perdida.set()
+        return False
+
+    def release(self):
+        if self.is_ours():
+            try:
+                os.unlink(self.ruta)
+            except FileNotFoundError:
+                pass
+
+
+class _Heartbeat(threading.Thread):
+    """Renueva una reserva cada 'intervalo' segundos mientras se procesa el shard."""
+
+    def __init__(self, lease: ShardLease, intervalo: float):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.lease = lease
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            if not self.lease.renew():
+                logger.warning(f"⚠️ Se perdió la reserva {os.path.basename(self.lease.ruta)}")
+                return
+
+    def stop(self):
+        self._detener.set()
+        self.join()
+
+
+class BatchCoordinator:
+    """
+    Reparte los shards de un lote entre workers de uno o varios nodos.
+
+    - Reserva: un worker toma un shard creando su archivo de reserva (ShardLease) y lo
+      renueva en segundo plano; las reservas de workers muertos vencen y se reclaman.
+    - Resultados idempotentes: cada archivo produce '<clave>_analisis.json' (o
+      '<clave>.json' en errores) escrito con rename, nunca a medias. Si dos workers
+      llegan a analizar el mismo archivo (una reserva reclamada a un worker lento), el
+      último rename reemplaza un resultado equivalente.
+    - Punto de control: al reanudar un shard se saltan los archivos que ya tienen
+      resultado o error; un shard terminado deja 'completados/<shard>.json' y no se
+      vuelve a reservar. Interrumpir el lote y relanzarlo retoma donde quedó.
+    """
+
+    def __init__(self, lote_dir: str, lease_seconds: Optional[float] = None,
+                 poll_seconds: Optional[float] = None):
+        config = get_section("batch")
+        self.lote_dir = lote_dir
+        self.lease_seconds = float(lease_seconds or config.get("lease_seconds", 600))
+        self.heartbeat_seconds = float(config.get("heartbeat_seconds") or self.lease_seconds / 4)
+        self.poll_seconds = float(poll_seconds or config.get("poll_seconds", 10))
+
+        manifiesto = _read_json(os.path.join(lote_dir, MANIFEST_NAME))
+        if manifiesto is None:
+            raise FileNotFoundError(f"No hay un lote en {lote_dir} (ejecute 'batch.py init')")
+        self.opciones: Dict[str, Any] = manifiesto.get("opciones") or {}
+        archivos = manifiesto["archivos"]
+        tamano = int(manifiesto["shard_size"])
+        self.shards: List[List[str]] = [archivos[i:i + tamano] for i in range(0, len(archivos), tamano)]
+        self.dirs = {subdir: os.path.join(lote_dir, subdir) for subdir in SUBDIRS}
+        self._leases: Dict[int, ShardLease] = {}  # shards reservados por claim() y aún sin procesar
+
+    # --- Rutas y estado ---
+
+    def _lease_path(self, indice: int) -> str:
+        return os.path.join(self.dirs["leases"], f"{shard_name(indice)}.lease")
+
+    def _done_path(self, indice: int) -> str:
+        return os.path.join(self.dirs["completados"], f"{shard_name(indice)}.json")
+
+    def _result_path(self, archivo: str) -> str:
+        return os.path.join(self.dirs["resultados"], f"{result_key(archivo)}_analisis.json")
+
+    def _error_path(self, archivo: str) -> str:
+        return os.path.join(self.dirs["errores"], f"{result_key(archivo)}.json")
+
+    def completed_shards(self) -> Set[int]:
+        completados = set()
+        for nombre in os.listdir(self.dirs["completados"]):
+            if nombre.startswith("shard-") and nombre.endswith(".json"):
+                completados.add(int(nombre[len("shard-"):-len(".json")]))
+        return completados
+
+    def is_finished(self) -> bool:
+        return len(self.completed_shards()) >= len(self.shards)
+
+    # --- Trabajo de un worker ---
+
+    def claim(self, worker_id: str) -> Optional[int]:
+        """Reserva un shard pendiente, empezando en una posición distinta para cada worker."""
+        completados = self.completed_shards()
+        n = len(self.shards)
+        inicio = int(hashlib.sha1(worker_id.encode("utf-8")).hexdigest(), 16) % max(n, 1)
+        for paso in range(n):
+            indice = (inicio + paso) % n
+            if indice in completados:
+                continue
+            lease = ShardLease.acquire(self._lease_path(indice), worker_id, self.lease_seconds)
+            if lease is None:
+                continue
+            if os.path.exists(self._done_path(indice)):
+                # Otro worker lo terminó entre el listado y la reserva
+                lease.release()
+                continue
+            self._leases[indice] = lease
+            return indice
+        return None
+
+    def process_shard(self, indice: int, worker_id: str,
+                      analizar: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> bool:
+        """
+        Analiza los archivos pendientes de un shard reservado y lo marca como completado.
+
+        Returns:
+            False si se perdió la reserva a mitad del shard (otro worker lo retoma).
+        """
+        lease = self._leases.pop(indice)
+        heartbeat = _Heartbeat(lease, self.heartbeat_seconds)
+        heartbeat.start()
+        correctos = fallidos = saltados = 0
+        try:
+            for archivo in self.shards[indice]:
+                if lease.perdida.is_set():
+                    logger.warning(f"⚠️ [{worker_id}] {shard_name(indice)} abandonado: la reserva ya no es suya")
+                    return False
+                if os.path.exists(self._result_path(archivo)) or os.path.exists(self._error_path(archivo)):
+                    saltados += 1
+                    continue
+                inicio = time.time()
+                try:
+                    resultado = analizar(archivo, self.opciones)
+                    _write_json(self._result_path(archivo), resultado)
+                    correctos += 1
+                    logger.info(f"✅ [{worker_id}] {os.path.basename(archivo)} en {time.time() - inicio:.1f}s")
+                except Exception as e:
+                    logger.error(f"❌ [{worker_id}] Error en {archivo}: {e}")
+                    _write_json(self._error_path(archivo), {
+                        "archivo": archivo, "error": f"{type(e).__name__}: {e}",
+                        "worker": worker_id, "en": time.time(),
+                    })
+                    fallidos += 1
+
+            _write_json(self._done_path(indice), {
+                "worker": worker_id, "host": socket.gethostname(), "terminado_en": time.time(),
+                "correctos": correctos, "fallidos": fallidos, "ya_procesados": saltados,
+            })
+            logger.info(f"📦 [{worker_id}] {shard_name(indice)} completado "
+                        f"({correctos} correctos, {fallidos} fallidos, {saltados} ya procesados)")
+            return True
+        finally:
+            heartbeat.stop()
+            lease.release()
+
+    def run_worker(self, worker_id: str, analizar: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None,
+                   esperar: bool = True) -> int:
+        """
+        Bucle de un worker: reserva y procesa shards hasta que el lote termina.
+
+        Args:
+            worker_id: Identificador único del worker (incluye el nodo).
+            analizar: Función (archivo, opciones) -> resultado; por defecto el análisis de
+                la cola de trabajos (service.job_queue.analyze_file).
+            esperar: Si no quedan shards libres pero hay reservas de otros workers, esperar
+                'poll_seconds' y reintentar (para reclamarlas si esos workers mueren). Con
+                False, el worker termina.
+
+        Returns:
+            El número de shards completados por este worker.
+        """
+        if analizar is None:
+            from service.job_queue import analyze_file as analizar
+        completados = 0
+        while True:
+            indice = self.claim(worker_id)
+            if indice is not None:
+                completados += self.process_shard(indice, worker_id, analizar)
+                continue
+            if self.is_finished() or not esperar:
+                return completados
+            time.sleep(self.poll_seconds)
+
+    # --- Consulta y mantenimiento ---
+
+    def status(self) -> Dict[str, Any]:
+        completados = self.completed_shards()
+        ahora = time.time()
+        en_curso, vencidos = [], []
+        for nombre in os.listdir(self.dirs["leases"]):
+            if not nombre.endswith(".lease"):
+                continue
+            ruta = os.path.join(self.dirs["leases"], nombre)
+            datos = _read_json(ruta) or {}
+            try:
+                sin_renovar = ahora - os.stat(ruta).st_mtime
+            except FileNotFoundError:
+                continue
+            reserva = {"shard": nombre[:-len(".lease")], "worker": datos.get("worker"),
+                       "segundos_sin_renovar": round(sin_renovar, 1)}
+            (vencidos if sin_renovar > self.lease_seconds else en_curso).append(reserva)
+
+        resultados = sum(1 for nombre in os.listdir(self.dirs["resultados"]) if nombre.endswith("_analisis.json"))
+        errores = sum(1 for nombre in os.listdir(self.dirs["errores"]) if nombre.endswith(".json"))
+        total = sum(len(shard) for shard in self.shards)
+        return {
+            "archivos": total,
+            "shards": len(self.shards),
+            "shards_completados": len(completados),
+            "correctos": resultados,
+            "fallidos": errores,
+            "pendientes": max(total - resultados - errores, 0),
+            "reservas_activas": en_curso,
+            "reservas_vencidas": vencidos,
+        }
+
+    def retry_failed(self) -> int:
+        """Borra los errores y reabre los shards que los contenían. Retorna cuántos archivos."""
+        reabiertos = 0
+        for indice, shard in enumerate(self.shards):
+            fallidos = [archivo for archivo in shard if os.path.exists(self._error_path(archivo))]
+            if not fallidos:
+                continue
+            # Primero se reabre el shard y luego se borran sus errores, para que un fallo a
+            # mitad no deje un shard completado con archivos sin resultado.
+            try:
+                os.unlink(self._done_path(indice))
+            except FileNotFoundError:
+                pass
+            for archivo in fallidos:
+                os.unlink(self._error_path(archivo))
+            reabiertos += len(fallidos)
+        return reabiertos
+
+
+def worker_id_for(numero: int) -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{numero}"
+
+
+def _worker_main(lote_dir: str, worker_id: str, esperar: bool):
+    BatchCoordinator(lote_dir).run_worker(worker_id, esperar=esperar)
+
+
+def run_workers(lote_dir: str, num_workers: Optional[int] = None, esperar: bool = True):
+    """
+    Lanza los workers de este nodo sobre un lote y espera a que terminen. Se ejecuta
+    igual en cada nodo; varios procesos en una sola máquina sirven para probarlo.
+    """
+    num_workers = num_workers or int(get_section("batch").get("workers") or os.cpu_count() or 1)
+    BatchCoordinator(lote_dir)  # valida el manifiesto antes de lanzar los procesos
+
+    # Con 'fork', precargar el modelo en el padre lo comparte con los workers
+    if get_section("queue").get("preload_model", True) and multiprocessing.get_start_method() == "fork":
+        from service.prefork import preload
+        preload()
+
+    procesos = [
+        multiprocessing.Process(target=_worker_main, args=(lote_dir, worker_id_for(i), esperar))
+        for i in range(num_workers)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    logger.info(f"⚙️ {num_workers} workers de lote en {socket.gethostname()} sobre {lote_dir}")
+    try:
+        for proceso in procesos:
+            proceso.join()
+    except KeyboardInterrupt:
+        for proceso in procesos:
+            proceso.terminate()
+
+
+def _read_file_list(ruta: str) -> List[str]:
+    with open(ruta, "r", encoding="utf-8") as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Lotes de análisis repartidos entre nodos con un sistema de archivos compartido.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    init = subparsers.add_parser("init", help="Crea (o reutiliza) el manifiesto de un lote.")
+    init.add_argument("lote", help="Directorio del lote en el sistema de archivos compartido.")
+    init.add_argument("archivos", nargs="*")
+    init.add_argument("--lista", default=None, help="Archivo de texto con una ruta por línea.")
+    init.add_argument("--shard-size", type=int, default=None, help="Archivos por shard (sección 'batch').")
+    init.add_argument("--fields", default=None, help="Etapas a ejecutar, separadas por comas.")
+    init.add_argument("--tier", default=None, help="Nivel de análisis (sección 'tiers' de config.json).")
+
+    run = subparsers.add_parser("run", help="Procesa shards del lote con los workers de este nodo.")
+    run.add_argument("lote")
+    run.add_argument("--workers", type=int, default=None, help="Procesos worker en este nodo.")
+    run.add_argument("--no-esperar", action="store_true",
+                     help="Terminar cuando no queden shards libres, sin esperar las reservas de otros nodos.")
+
+    status = subparsers.add_parser("status", help="Progreso del lote y reservas activas o vencidas.")
+    status.add_argument("lote")
+
+    retry = subparsers.add_parser("retry-failed", help="Vuelve a poner en cola los archivos fallidos.")
+    retry.add_argument("lote")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    if args.comando == "init":
+        archivos = list(args.archivos) + (_read_file_list(args.lista) if args.lista else [])
+        opciones = {"fields": args.fields.split(",")} if args.fields else {}
+        if args.tier:
+            opciones["tier"] = args.tier
+        manifiesto = create_batch(args.lote, archivos, args.shard_size, opciones)
+        shards = -(-len(manifiesto["archivos"]) // manifiesto["shard_size"])
+        print(f"📋 Lote {args.lote}: {len(manifiesto['archivos'])} archivos en {shards} shards")
+    elif args.comando == "run":
+        run_workers(args.lote, args.workers, esperar=not args.no_esperar)
+    elif args.comando == "status":
+        print(json.dumps(BatchCoordinator(args.lote).status(), ensure_ascii=False, indent=2))
+    elif args.comando == "retry-failed":
+        print(f"🔁 {BatchCoordinator(args.lote).retry_failed()} archivos vuelven a la cola")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
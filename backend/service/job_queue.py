@@ -0,0 +1,539 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import argparse
+import multiprocessing
+from typing import Dict, Any, Iterator, List, Optional
+
+# Permite ejecutar este módulo como script ('python service/job_queue.py') desde 'backend/'.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.settings import get_section, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo en la cola
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_COMPLETADO = "completado"
+ESTADO_FALLIDO = "fallido"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    prioridad INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    opciones TEXT,
+    resultado TEXT,
+    error TEXT,
+    worker TEXT,
+    creado_en REAL NOT NULL,
+    actualizado_en REAL NOT NULL,
+    disponible_en REAL NOT NULL,
+    bloqueado_hasta REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_cola
+    ON trabajos (estado, prioridad DESC, creado_en);
+"""
+
+
+def default_db_path() -> str:
+    """Ruta de la base SQLite de la cola según 'config.json' (sección 'queue')."""
+    return resolve_path(get_section("queue").get("db_path", "outputs/jobs.sqlite3"))
+
+
+class JobQueue:
+    """
+    Cola de trabajos de análisis persistida en un archivo SQLite local.
+
+    Varios procesos (la API y los workers) pueden abrir la misma base: SQLite en modo WAL
+    permite lecturas concurrentes y las reservas se hacen dentro de una transacción
+    'BEGIN IMMEDIATE', de modo que un trabajo nunca se entrega a dos workers a la vez.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_attempts: Optional[int] = None,
+                 lease_seconds: Optional[float] = None):
+        queue_config = get_section("queue")
+        self.db_path = db_path or default_db_path()
+        self.max_attempts = max_attempts or int(queue_config.get("max_attempts", 3))
+        self.lease_seconds = lease_seconds or float(queue_config.get("lease_seconds", 1800))
+        self.heartbeat_seconds = float(queue_config.get("heartbeat_seconds") or self.lease_seconds / 4)
+        self.retry_backoff = float(queue_config.get("retry_backoff_seconds", 5))
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    # --- API de envío y consulta ---
+
+    def submit(self, archivo: str, prioridad: int = 0, opciones: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Encola un archivo para análisis.
+
+        Args:
+            archivo: Ruta del documento a analizar (visible para los workers).
+            prioridad: Los trabajos con mayor prioridad se procesan primero.
+            opciones: Parámetros adicionales del análisis, guardados como JSON.
+
+        Returns:
+            El identificador del trabajo.
+        """
+        return self.submit_many([{"archivo": archivo, "prioridad": prioridad, "opciones": opciones}])[0]
+
+    def submit_many(self, trabajos: List[Dict[str, Any]]) -> List[str]:
+        """
+        Encola varios archivos en una sola transacción (cientos de sentencias a la vez).
+
+        Args:
+            trabajos: Lista de diccionarios con las claves 'archivo', 'prioridad' y 'opciones'.
+
+        Returns:
+            La lista de identificadores, en el mismo orden de entrada.
+        """
+        ahora = time.time()
+        filas = []
+        ids = []
+        for trabajo in trabajos:
+            job_id = uuid.uuid4().hex
+            ids.append(job_id)
+            filas.append((
+                job_id, trabajo["archivo"], int(trabajo.get("prioridad") or 0), ESTADO_PENDIENTE,
+                self.max_attempts, json.dumps(trabajo.get("opciones") or {}, ensure_ascii=False),
+                ahora, ahora, ahora,
+            ))
+
+        with self._transaction():
+            self._conn.executemany(
+                "INSERT INTO trabajos (id, archivo, prioridad, estado, max_intentos, opciones,"
+                " creado_en, actualizado_en, disponible_en) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+        return ids
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Consulta el estado de un trabajo.
+
+        Args:
+            job_id: El identificador devuelto por submit.
+            include_result: Si es False, omite el resultado (útil para sondeos frecuentes).
+
+        Returns:
+            Un diccionario con el estado del trabajo, o None si no existe.
+        """
+        fila = self._conn.execute("SELECT * FROM trabajos WHERE id = ?", (job_id,)).fetchone()
+        if fila is None:
+            return None
+
+        trabajo = {
+            "id": fila["id"],
+            "archivo": fila["archivo"],
+            "estado": fila["estado"],
+            "prioridad": fila["prioridad"],
+            "intentos": fila["intentos"],
+            "max_intentos": fila["max_intentos"],
+            "opciones": json.loads(fila["opciones"] or "{}"),
+            "error": fila["error"],
+            "creado_en": fila["creado_en"],
+            "actualizado_en": fila["actualizado_en"],
+        }
+        if include_result and fila["resultado"] is not None:
+            trabajo["resultado"] = json.loads(fila["resultado"])
+        return trabajo
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna el número de trabajos por estado."""
+        filas = self._conn.execute("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+        conteo = {ESTADO_PENDIENTE: 0, ESTADO_PROCESANDO: 0, ESTADO_COMPLETADO: 0, ESTADO_FALLIDO: 0}
+        conteo.update({fila["estado"]: fila["n"] for fila in filas})
+        return conteo
+
+    # --- API de los workers ---
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva el siguiente trabajo disponible (mayor prioridad, más antiguo primero).
+
+        También recupera trabajos 'procesando' cuyo bloqueo expiró porque el worker murió,
+        mientras les queden intentos; los que ya los agotaron (p. ej. un PDF que mata a
+        cada worker que lo toma) quedan como 'fallido' en la misma transacción.
+
+        Args:
+            worker_id: Identificador del worker que reserva.
+
+        Returns:
+            El trabajo reservado, o None si la cola está vacía.
+        """
+        ahora = time.time()
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, actualizado_en = ?, bloqueado_hasta = NULL"
+                " WHERE estado = ? AND bloqueado_hasta < ? AND intentos >= max_intentos",
+                (ESTADO_FALLIDO, "El bloqueo expiró en el último intento (el worker murió durante el análisis)",
+                 ahora, ESTADO_PROCESANDO, ahora),
+            )
+            fila = self._conn.execute(
+                "SELECT id FROM trabajos"
+                " WHERE (estado = ? AND disponible_en <= ?)"
+                "    OR (estado = ? AND bloqueado_hasta < ? AND intentos < max_intentos)"
+                " ORDER BY prioridad DESC, creado_en LIMIT 1",
+                (ESTADO_PENDIENTE, ahora, ESTADO_PROCESANDO, ahora),
+            ).fetchone()
+            if fila is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE trabajos SET estado = ?, intentos = intentos + 1, worker = ?,"
+                " actualizado_en = ?, bloqueado_hasta = ? WHERE id = ?",
+                (ESTADO_PROCESANDO, worker_id, ahora, ahora + self.lease_seconds, fila["id"]),
+            )
+        return self.get(fila["id"], include_result=False)
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        """
+        Extiende el bloqueo de un trabajo en curso otros 'lease_seconds' (ver _Heartbeat).
+
+        Returns:
+            False si el trabajo ya no pertenecía a este worker.
+        """
+        ahora = time.time()
+        cursor = self._conn.execute(
+            "UPDATE trabajos SET bloqueado_hasta = ?, actualizado_en = ? WHERE id = ? AND worker = ? AND estado = ?",
+            (ahora + self.lease_seconds, ahora, job_id, worker_id, ESTADO_PROCESANDO),
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: str, worker_id: str, resultado: Dict[str, Any]) -> bool:
+        """
+        Marca un trabajo como completado y guarda su resultado por id.
+
+        Solo el worker que tiene el trabajo reservado puede completarlo: si su bloqueo
+        expiró y otro worker lo recuperó, el resultado se descarta.
+
+        Returns:
+            False si el trabajo ya no pertenecía a este worker.
+        """
+        cursor = self._conn.execute(
+            "UPDATE trabajos SET estado = ?, resultado = ?, error = NULL, actualizado_en = ?,"
+            " bloqueado_hasta = NULL WHERE id = ? AND worker = ? AND estado = ?",
+            (ESTADO_COMPLETADO, json.dumps(resultado, ensure_ascii=False), time.time(), job_id, worker_id,
+             ESTADO_PROCESANDO),
+        )
+        if cursor.rowcount == 0:
+            logger.warning(f"⚠️ [{worker_id}] El trabajo {job_id} ya no le pertenece; se descarta su resultado")
+            return False
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Registra un error. Si quedan intentos, el trabajo vuelve a la cola con espera
+        exponencial; de lo contrario queda como 'fallido'. Como en complete(), solo
+        cuenta el error del worker que tiene el trabajo reservado.
+
+        Returns:
+            False si el trabajo ya no pertenecía a este worker.
+        """
+        ahora = time.time()
+        with self._transaction():
+            fila = self._conn.execute(
+                "SELECT intentos, max_intentos FROM trabajos WHERE id = ? AND worker = ? AND estado = ?",
+                (job_id, worker_id, ESTADO_PROCESANDO),
+            ).fetchone()
+            if fila is None:
+                logger.warning(f"⚠️ [{worker_id}] El trabajo {job_id} ya no le pertenece; se descarta su error")
+                return False
+            if fila["intentos"] < fila["max_intentos"]:
+                espera = self.retry_backoff * (2 ** (fila["intentos"] - 1))
+                self._conn.execute(
+                    "UPDATE trabajos SET estado = ?, error = ?, actualizado_en = ?, disponible_en = ?,"
+                    " bloqueado_hasta = NULL WHERE id = ?",
+                    (ESTADO_PENDIENTE, error, ahora, ahora + espera, job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE trabajos SET estado = ?, error = ?, actualizado_en = ?,"
+                    " bloqueado_hasta = NULL WHERE id = ?",
+                    (ESTADO_FALLIDO, error, ahora, job_id),
+                )
+        return True
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn)
+
+
+class _ImmediateTransaction:
+    """Transacción 'BEGIN IMMEDIATE': toma el bloqueo de escritura desde el inicio."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Renueva el bloqueo de un trabajo cada 'heartbeat_seconds' mientras se analiza: un
+    análisis más largo que 'lease_seconds' no se da por muerto ni se entrega a otro
+    worker. Usa su propia conexión (las de sqlite3 no se comparten entre hilos).
+    """
+
+    def __init__(self, db_path: str, job_id: str, worker_id: str):
+        super().__init__(name="job-heartbeat", daemon=True)
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._detener = threading.Event()
+
+    def run(self):
+        queue = JobQueue(self.db_path)
+        try:
+            while not self._detener.wait(queue.heartbeat_seconds):
+                if not queue.renew(self.job_id, self.worker_id):
+                    logger.warning(f"⚠️ [{self.worker_id}] Se perdió el bloqueo del trabajo {self.job_id}")
+                    return
+        finally:
+            queue.close()
+
+    def stop(self):
+        self._detener.set()
+        self.join()
+
+
+# --- Workers de análisis ---
+
+def analyze_file(archivo: str, opciones: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ejecuta el mismo análisis que main.py sobre un archivo.
+
+    Args:
+        archivo: Ruta del documento.
+        opciones: Opciones del trabajo; 'fields' limita las etapas que se ejecutan (y,
+                  con solo metadatos y/o fallo, las páginas que se extraen) y 'tier'
+                  elige el nivel de análisis (sección 'tiers' de config.json).
+
+    Returns:
+        El diccionario de análisis.
+    """
+    from analyzer.extractor import build_analysis, mark_partial_result
+
+    texto, budget, paginas = _extract(archivo, opciones.get("fields"))
+    if not texto.strip():
+        return {}
+    resultado = build_analysis(texto, opciones.get("fields"), budget, opciones.get("tier"))
+    if paginas is None:
+        resultado.update(_register(archivo, texto, resultado))
+    else:
+        # Un texto parcial (algunas páginas) no se registra en los índices del corpus
+        mark_partial_result(resultado, paginas)
+    return resultado
+
+
+def stream_file(archivo: str, opciones: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Como analyze_file, pero emite los eventos de analyzer.executor.AnalysisRun.stream:
+    los metadatos apenas termina la segmentación y después cada sección. El registro
+    en el corpus (duplicados, grafo de citas) se hace al final y su resultado va en el
+    evento 'fin'.
+    """
+    from analyzer.executor import AnalysisRun, DEFAULT_FIELDS
+    from nlp.metadata import mark_partial_pages
+    from nlp.tiers import get_tier
+
+    texto, budget, paginas = _extract(archivo, opciones.get("fields"))
+    if not texto.strip():
+        yield {"evento": "fin", "segundos": 0.0}
+        return
+    run = AnalysisRun(texto, budget=budget, tier=get_tier(opciones.get("tier")))
+    for evento in run.stream(opciones.get("fields") or DEFAULT_FIELDS):
+        if paginas is not None and "metadatos" in evento:
+            mark_partial_pages(evento["metadatos"])
+        if evento["evento"] == "fin":
+            if paginas is None:
+                evento.update(_register(archivo, texto, run.to_result()))
+            else:
+                evento["paginas_extraidas"] = paginas
+        yield evento
+
+
+def _extract(archivo: str, fields: Optional[List[str]] = None):
+    from analyzer.budget import AnalysisBudget
+    from analyzer.extractor import extract_text_for_fields
+
+    if not os.path.exists(archivo):
+        raise FileNotFoundError(f"Archivo no encontrado: {archivo}")
+
+    # Un documento hostil no retiene al worker: el análisis se degrada al agotar el presupuesto
+    budget = AnalysisBudget.from_config()
+    # Con solo metadatos y/o fallo se extraen solo las páginas que los contienen
+    texto, paginas = extract_text_for_fields(archivo, fields, budget)
+    return texto, budget, paginas
+
+
+def _register(archivo: str, texto: str, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Registra el documento en los índices del corpus; retorna los campos que agregan al resultado."""
+    extra: Dict[str, Any] = {}
+
+    # Detección de sentencias casi duplicadas al ingresar al corpus
+    dedup_index = _get_dedup_index()
+    if dedup_index is not None:
+        extra["posibles_duplicados"] = dedup_index.ingest(os.path.basename(archivo), texto)
+
+    # Grafo de citas del corpus (requiere los metadatos y el análisis por sección)
+    citation_graph = _get_citation_graph()
+    if citation_graph is not None and "metadatos" in resultado and "analisis" in resultado:
+        citation_graph.add_analysis(os.path.basename(archivo), resultado)
+
+    # Ids del corpus de las entidades resueltas (se agregan al resultado como 'id_corpus')
+    entity_registry = _get_entity_registry()
+    if entity_registry is not None and "entidades_resueltas" in resultado:
+        extra["entidades_resueltas"] = entity_registry.add_analysis(os.path.basename(archivo), resultado)
+    return extra
+
+
+_dedup_index = None
+
+
+def _get_dedup_index():
+    """Índice de duplicados del worker actual (None si 'dedup.enabled' es falso)."""
+    global _dedup_index
+    if _dedup_index is None and get_section("dedup").get("enabled", True):
+        from corpus.duplicates import CorpusDuplicateIndex
+        _dedup_index = CorpusDuplicateIndex()
+    return _dedup_index
+
+
+_citation_graph = None
+
+
+def _get_citation_graph():
+    """Grafo de citas del worker actual (None si 'citation_graph.enabled' es falso)."""
+    global _citation_graph
+    if _citation_graph is None and get_section("citation_graph").get("enabled", True):
+        from corpus.citation_graph import CitationGraph
+        _citation_graph = CitationGraph()
+    return _citation_graph
+
+
+_entity_registry = None
+
+
+def _get_entity_registry():
+    """Registro de entidades del worker actual (None si 'entity_registry.enabled' es falso)."""
+    global _entity_registry
+    if _entity_registry is None and get_section("entity_registry").get("enabled", True):
+        from corpus.entity_registry import EntityRegistry
+        _entity_registry = EntityRegistry()
+    return _entity_registry
+
+
+def worker_loop(db_path: str, worker_id: str, poll_interval: float = 1.0, max_jobs: Optional[int] = None):
+    """
+    Bucle de un worker: reserva trabajos, los analiza y guarda el resultado.
+
+    El modelo de spaCy se carga una sola vez por worker (al importar el analizador en el
+    primer trabajo) y se reutiliza para todos los documentos siguientes.
+
+    Args:
+        db_path: Ruta de la base SQLite de la cola.
+        worker_id: Identificador legible del worker.
+        poll_interval: Segundos de espera cuando la cola está vacía.
+        max_jobs: Si se indica, el worker termina tras procesar esa cantidad de trabajos.
+    """
+    queue = JobQueue(db_path)
+    procesados = 0
+    try:
+        while max_jobs is None or procesados < max_jobs:
+            trabajo = queue.claim(worker_id)
+            if trabajo is None:
+                time.sleep(poll_interval)
+                continue
+
+            logger.info(f"📄 [{worker_id}] Analizando {trabajo['archivo']} (trabajo {trabajo['id']})")
+            heartbeat = _Heartbeat(db_path, trabajo["id"], worker_id)
+            heartbeat.start()
+            try:
+                try:
+                    resultado = analyze_file(trabajo["archivo"], trabajo["opciones"])
+                finally:
+                    heartbeat.stop()
+                if queue.complete(trabajo["id"], worker_id, resultado):
+                    logger.info(f"✅ [{worker_id}] Trabajo {trabajo['id']} completado")
+            except Exception as e:
+                logger.error(f"❌ [{worker_id}] Error en el trabajo {trabajo['id']}: {e}")
+                queue.fail(trabajo["id"], worker_id, f"{type(e).__name__}: {e}")
+            procesados += 1
+    finally:
+        queue.close()
+
+
+def run_workers(num_workers: Optional[int] = None, db_path: Optional[str] = None,
+                poll_interval: float = 1.0):
+    """
+    Lanza un pool de procesos worker y espera a que terminen.
+
+    Por defecto se usa un worker por CPU para drenar la cola con la máxima utilización.
+
+    Args:
+        num_workers: Número de procesos; por defecto 'queue.workers' o os.cpu_count().
+        db_path: Ruta de la base SQLite de la cola.
+        poll_interval: Segundos de espera cuando la cola está vacía.
+    """
+    db_path = db_path or default_db_path()
+    num_workers = num_workers or int(get_section("queue").get("workers") or os.cpu_count() or 1)
+
+    # Crear el esquema antes de lanzar los procesos
+    JobQueue(db_path).close()
+
+    # Con el método 'fork' (el predeterminado en Linux), precargar el modelo en el
+    # padre permite que todos los workers compartan sus páginas en copy-on-write.
+    if get_section("queue").get("preload_model", True) and multiprocessing.get_start_method() == "fork":
+        from service.prefork import preload
+        preload()
+
+    procesos = []
+    for i in range(num_workers):
+        proceso = multiprocessing.Process(
+            target=worker_loop, args=(db_path, f"worker-{os.getpid()}-{i}", poll_interval), daemon=False
+        )
+        proceso.start()
+        procesos.append(proceso)
+
+    logger.info(f"⚙️ {num_workers} workers de análisis en ejecución sobre {db_path}")
+    try:
+        for proceso in procesos:
+            proceso.join()
+    except KeyboardInterrupt:
+        for proceso in procesos:
+            proceso.terminate()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Workers de la cola de análisis de sentencias.")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos worker.")
+    parser.add_argument("--db", default=None, help="Ruta de la base SQLite de la cola.")
+    parser.add_argument("--poll", type=float, default=1.0, help="Segundos de espera con la cola vacía.")
+    args = parser.parse_args()
+
+    run_workers(args.workers, args.db, args.poll)
@@ -0,0 +1,317 @@
+import os
+import gc
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Any, Iterator, Optional
+
+# Permite ejecutar este módulo como script ('python service/prefork.py') desde 'backend/'.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+# Texto breve para ejercitar todas las etapas antes de hacer fork: así las
+# inicializaciones perezosas (spaCy, caché de 're', escáneres de metadatos)
+# ocurren una sola vez en el proceso padre.
+_WARMUP_TEXT = (
+    "CUI: 11001 60 00102 2016 00502 04\nNÚMERO INTERNO 69531\n"
+    "Bogotá D.C., diez (10) de junio de dos mil 25\nCorte Suprema de Justicia\n"
+    "I. ASUNTO\nSe pronuncia la Sala respecto al recurso de apelación.\n"
+    "II. ACTUACIÓN PROCESAL RELEVANTE\nEl 29 de noviembre de 2017 la Fiscalía formuló imputación "
+    "contra MARIO BENAVIDES por el delito de falsedad, artículo 286 del Código Penal, Ley 906 de 2004.\n"
+    "VI. CONSIDERACIONES DE LA CORTE\nSegún la sentencia C-134 de 2023 y el artículo 7.\n"
+    "RESUELVE:\nCONFIRMAR la decisión impugnada. Comuníquese y cúmplase."
+)
+
+
+def preload():
+    """
+    Carga en el proceso padre todo lo que los workers comparten en modo copy-on-write:
+    los modelos de spaCy de los niveles de 'tiers.preload' (por defecto, solo el nivel
+    por defecto) y las tablas de reglas compiladas. Un nivel no precargado se carga en
+    cada worker que lo use.
+
+    Al final se recolecta la basura y se congela el heap (gc.freeze): los objetos ya
+    existentes pasan a la generación permanente y el recolector de los workers no los
+    recorre, de modo que no escribe en (ni duplica) las páginas compartidas.
+    """
+    from nlp.tiers import default_tier_name, get_tier
+    from analyzer.executor import run_analysis, STAGES
+
+    for nombre in get_section("tiers").get("preload") or [default_tier_name()]:
+        get_tier(nombre).load()
+        run_analysis(_WARMUP_TEXT, fields=list(STAGES), tier=nombre)
+
+    gc.collect()
+    gc.freeze()
+
+
+class _AnalysisHandler(BaseHTTPRequestHandler):
+    """
+    POST /analyze con {"archivo": ..., "fields": [...]} o {"texto": ..., "fields": [...]} y,
+    opcionalmente, "tier" (nivel de análisis de la sección 'tiers' de config.json).
+    Con la cabecera 'X-Profile: 1' el análisis se perfila y la respuesta incluye 'perfil'.
+    Con 'Accept: application/x-ndjson' o 'Accept: text/event-stream' (o "stream":
+    "ndjson"|"sse" en el cuerpo) la respuesta se emite por partes: los metadatos apenas
+    termina la segmentación y luego el análisis de cada sección, un evento por línea.
+    GET /health para comprobar que el worker responde.
+    """
+
+    server_version = "JudicialSentenceAnalyzer/prefork"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"estado": "ok", "pid": os.getpid()})
+        else:
+            self._send_json(404, {"error": f"Ruta no encontrada: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/analyze":
+            self._send_json(404, {"error": f"Ruta no encontrada: {self.path}"})
+            return
+        try:
+            longitud = int(self.headers.get("Content-Length") or 0)
+            peticion = json.loads(self.rfile.read(longitud) or b"{}")
+            formato = _stream_format(peticion, self.headers.get("Accept") or "")
+            if formato:
+                self._send_stream(formato, stream_request(peticion))
+            elif (self.headers.get("X-Profile") or "").strip().lower() in ("1", "true", "yes", "si", "sí"):
+                self._send_json(200, _profiled_request(peticion))
+            else:
+                self._send_json(200, analyze_request(peticion))
+        except (ValueError, FileNotFoundError) as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"❌ [{os.getpid()}] Error durante el análisis: {e}")
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _send_stream(self, formato: str, eventos: Iterator[Dict[str, Any]]):
+        """
+        Envía los eventos a medida que se producen, sin Content-Length: la respuesta
+        termina al cerrarse la conexión (HTTP/1.0). Los errores de validación se detectan
+        antes de la primera escritura y se responden con su código; un error posterior
+        se emite como evento 'error'.
+        """
+        try:
+            primero = next(eventos)
+        except StopIteration:
+            primero = None
+        self.send_response(200)
+        self.send_header("Content-Type", _STREAM_CONTENT_TYPES[formato])
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            if primero is not None:
+                self._write_event(formato, primero)
+            for evento in eventos:
+                self._write_event(formato, evento)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"[{os.getpid()}] El cliente cerró la conexión durante el streaming.")
+        except Exception as e:
+            logger.error(f"❌ [{os.getpid()}] Error durante el análisis: {e}")
+            self._write_event(formato, {"evento": "error", "error": f"{type(e).__name__}: {e}"})
+
+    def _write_event(self, formato: str, evento: Dict[str, Any]):
+        data = json.dumps(evento, ensure_ascii=False)
+        if formato == "sse":
+            data = f"event: {evento['evento']}\ndata: {data}\n\n"
+        else:
+            data += "\n"
+        self.wfile.write(data.encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"[{os.getpid()}] {format % args}")
+
+
+def analyze_request(peticion: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Atiende una petición de análisis (texto en línea o ruta de archivo).
+
+    Args:
+        peticion: Diccionario con 'texto' o 'archivo' y, opcionalmente, 'fields' y 'tier'.
+
+    Returns:
+        El diccionario de análisis.
+    """
+    fields = peticion.get("fields")
+    tier = peticion.get("tier")
+    if peticion.get("texto"):
+        from analyzer.executor import run_analysis
+        return run_analysis(peticion["texto"], fields, tier=tier)
+    if peticion.get("archivo"):
+        from service.job_queue import analyze_file
+        opciones = {clave: valor for clave, valor in (("fields", fields), ("tier", tier)) if valor}
+        return analyze_file(peticion["archivo"], opciones)
+    raise ValueError("La petición debe incluir 'texto' o 'archivo'.")
+
+
+_STREAM_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "sse": "text/event-stream; charset=utf-8",
+}
+
+
+def _stream_format(peticion: Dict[str, Any], accept: str) -> Optional[str]:
+    """'ndjson', 'sse' o None (respuesta JSON completa), según el cuerpo o la cabecera Accept."""
+    formato = peticion.get("stream")
+    if formato:
+        if formato not in _STREAM_CONTENT_TYPES:
+            raise ValueError(f"Formato de streaming desconocido: {formato} (disponibles: ndjson, sse)")
+        return formato
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    if "text/event-stream" in accept:
+        return "sse"
+    return None
+
+
+def stream_request(peticion: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Como analyze_request, pero emite los eventos del análisis a medida que se producen
+    (ver analyzer.executor.AnalysisRun.stream).
+    """
+    fields = peticion.get("fields")
+    tier = peticion.get("tier")
+    if peticion.get("texto"):
+        from analyzer.executor import stream_analysis
+        return stream_analysis(peticion["texto"], fields, tier=tier)
+    if peticion.get("archivo"):
+        from service.job_queue import stream_file
+        opciones = {clave: valor for clave, valor in (("fields", fields), ("tier", tier)) if valor}
+        return stream_file(peticion["archivo"], opciones)
+    raise ValueError("La petición debe incluir 'texto' o 'archivo'.")
+
+
+def _profiled_request(peticion: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Atiende una petición perfilando el análisis (ver utils.profiling). Las pilas
+    colapsadas y el resumen se escriben en el directorio de perfiles y la respuesta
+    agrega 'perfil' con sus rutas, el tiempo por etapa y las funciones más costosas.
+    """
+    from utils.profiling import profile_call
+
+    resultado, perfil = profile_call(analyze_request, peticion)
+    top = int(get_section("profiling").get("top", 25))
+    # Dos peticiones perfiladas en el mismo segundo y proceso no comparten archivos
+    rutas = perfil.write(f"peticion_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{uuid.uuid4().hex[:8]}", n=top)
+    return {
+        **resultado,
+        "perfil": {"segundos_por_etapa": perfil.stages(), "funciones": perfil.top(top), "archivos": rutas},
+    }
+
+
+def _worker_main(listen_socket: socket.socket, max_documents: int):
+    """Bucle de un worker hijo: atiende hasta max_documents peticiones y termina."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    server = HTTPServer(listen_socket.getsockname(), _AnalysisHandler, bind_and_activate=False)
+    server.socket = listen_socket
+
+    for _ in range(max_documents):
+        server.handle_request()
+    # Terminar sin ejecutar los finalizadores del padre ni vaciar sus buffers
+    os._exit(0)
+
+
+class PreforkServer:
+    """
+    Servidor HTTP pre-fork: el padre carga el modelo una vez, abre el socket y hace
+    fork de N workers que comparten esas páginas de memoria en copy-on-write.
+
+    Cada worker termina tras max_documents peticiones (acotando el crecimiento de
+    memoria por fragmentación o cachés) y el padre lo reemplaza por otro fork, que
+    vuelve a partir de las páginas compartidas.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8100, workers: Optional[int] = None,
+                 max_documents: Optional[int] = None):
+        prefork_config = get_section("prefork")
+        self.host = host
+        self.port = port
+        self.num_workers = workers or int(prefork_config.get("workers") or os.cpu_count() or 1)
+        self.max_documents = max_documents or int(prefork_config.get("max_documents_per_worker", 500))
+        self.children: Dict[int, int] = {}  # pid -> número de reinicios de ese puesto
+        self._running = False
+        self._socket: Optional[socket.socket] = None
+
+    def _spawn(self, generation: int = 0) -> int:
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(self._socket, self.max_documents)
+        self.children[pid] = generation
+        return pid
+
+    def serve_forever(self, preload_model: bool = True):
+        """Precarga, abre el socket, lanza los workers y los reemplaza cuando terminan."""
+        if preload_model:
+            inicio = time.time()
+            preload()
+            logger.info(f"⚙️ Modelo y reglas precargados en {time.time() - inicio:.1f}s (pid {os.getpid()})")
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(128)
+
+        for _ in range(self.num_workers):
+            self._spawn()
+        logger.info(f"✅ {self.num_workers} workers escuchando en http://{self.host}:{self.port}")
+
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while self._running:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            generation = self.children.pop(pid, 0)
+            if self._running:
+                nuevo = self._spawn(generation + 1)
+                logger.info(f"🔄 Worker {pid} reciclado; nuevo worker {nuevo}")
+
+        self._socket.close()
+
+    def _stop(self, signum, frame):
+        self._running = False
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    prefork_config = get_section("prefork")
+    parser = argparse.ArgumentParser(description="Servidor de análisis pre-fork con modelo compartido.")
+    parser.add_argument("--host", default=prefork_config.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(prefork_config.get("port", 8100)))
+    parser.add_argument("--workers", type=int, default=None, help="Número de workers (por defecto, uno por CPU).")
+    parser.add_argument("--max-documents", type=int, default=None,
+                        help="Peticiones atendidas por un worker antes de reciclarlo.")
+    args = parser.parse_args()
+
+    PreforkServer(args.host, args.port, args.workers, args.max_documents).serve_forever()
@@ -0,0 +1,436 @@
+import os
+import sys
+import json
+import time
+import queue
+import re
+import uuid
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+# Permite ejecutar este módulo como script ('python service/watch_folder.py') desde 'backend/'.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.settings import get_section, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# Subcarpeta de la carpeta de entrada donde esperan los archivos ya enviados a la cola.
+# Al arrancar, lo que quedó ahí (el demonio murió) se devuelve a la entrada.
+IN_PROGRESS_DIR = ".en_proceso"
+
+# Sufijo que hace único el nombre de cada archivo en '.en_proceso/' ("fallo__1a2b3c4d.pdf"):
+# dos archivos con el mismo nombre nunca se pisan mientras esperan o se analizan.
+_SUFIJO_RE = re.compile(r"__[0-9a-f]{8}(?=\.[^.]*$)")
+
+
+def _unique_name(nombre: str) -> str:
+    base, extension = os.path.splitext(nombre)
+    return f"{base}__{uuid.uuid4().hex[:8]}{extension}"
+
+
+def _original_name(nombre_unico: str) -> str:
+    return _SUFIJO_RE.sub("", nombre_unico, count=1)
+
+
+# Ventana (segundos) sobre la que se calcula el ritmo de procesamiento
+RATE_WINDOW = 60.0
+
+
+# --- Vigilancia de la carpeta: inotify (Linux) con respaldo por sondeo ---
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _InotifyWatcher:
+    """
+    Vigila una carpeta con inotify (vía ctypes, sin dependencias). wait() retorna los
+    nombres que cambiaron desde la última llamada, o None si la cola de eventos del
+    kernel se desbordó y hay que volver a listar la carpeta.
+    """
+
+    modo = "inotify"
+
+    def __init__(self, directorio: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mascara = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY
+        if libc.inotify_add_watch(self.fd, os.fsencode(directorio), mascara) < 0:
+            numero = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(numero, "inotify_add_watch")
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        nombres: Set[str] = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return nombres
+        while True:
+            try:
+                datos = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return nombres
+            posicion = 0
+            while posicion < len(datos):
+                _, mascara, _, longitud = _EVENT_HEADER.unpack_from(datos, posicion)
+                posicion += _EVENT_HEADER.size
+                nombre = datos[posicion:posicion + longitud].rstrip(b"\0")
+                posicion += longitud
+                if mascara & _IN_Q_OVERFLOW:
+                    return None
+                if nombre:
+                    nombres.add(os.fsdecode(nombre))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """Respaldo sin inotify (otro sistema operativo, NFS): vuelve a listar la carpeta."""
+
+    modo = "sondeo"
+
+    def __init__(self, directorio: str, intervalo: float):
+        self.intervalo = intervalo
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(min(timeout, self.intervalo))
+        return None
+
+    def close(self):
+        pass
+
+
+# Sistemas de archivos de red: inotify solo ve los cambios hechos desde esta máquina,
+# no los que otro cliente escribe en el servidor, así que se vigilan por sondeo.
+_NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "ceph", "glusterfs", "lustre", "afs"}
+
+
+def _mount_fstype(directorio: str) -> Optional[str]:
+    """Tipo de sistema de archivos del punto de montaje que contiene 'directorio' (Linux)."""
+    ruta = os.path.realpath(directorio)
+    mejor, tipo = "", None
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            for linea in f:
+                campos = linea.split()
+                if len(campos) < 3:
+                    continue
+                # Los espacios y otros caracteres van escapados en octal ("\040")
+                punto = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), campos[1])
+                dentro = ruta == punto or ruta.startswith(punto.rstrip("/") + "/")
+                if dentro and len(punto) >= len(mejor):
+                    mejor, tipo = punto, campos[2]
+    except OSError:
+        return None
+    return tipo
+
+
+def _open_watcher(directorio: str, intervalo: float, usar_inotify: bool = True):
+    if usar_inotify and sys.platform.startswith("linux"):
+        tipo = _mount_fstype(directorio)
+        if tipo in _NETWORK_FS:
+            logger.warning(f"⚠️ {directorio} está en un sistema de archivos de red ({tipo}); se vigila por sondeo")
+            return _PollingWatcher(directorio, intervalo)
+        try:
+            return _InotifyWatcher(directorio)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"⚠️ inotify no disponible ({e}); se vigila la carpeta por sondeo")
+    return _PollingWatcher(directorio, intervalo)
+
+
+# --- Workers ---
+
+def _write_json(ruta: str, datos: Dict):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def _worker_loop(trabajos: "multiprocessing.Queue", eventos: "multiprocessing.Queue",
+                 dirs: Dict[str, str], worker_id: str):
+    """
+    Analiza los archivos que llegan por 'trabajos' (su nombre único en '.en_proceso/')
+    hasta recibir None. El resultado se guarda como '<nombre>_analisis.json' (igual que
+    main.py, con el nombre original) y el archivo se mueve con su nombre original a la
+    carpeta de procesados o de fallidos.
+    """
+    from service.job_queue import analyze_file
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # el padre coordina el apagado
+    while True:
+        unico = trabajos.get()
+        if unico is None:
+            return
+        eventos.put(("inicio", unico))
+        ruta = os.path.join(dirs["en_proceso"], unico)
+        nombre = _original_name(unico)
+        inicio = time.time()
+        try:
+            resultado = analyze_file(ruta, {})
+            if not resultado:
+                # analyze_file retorna {} si no se pudo extraer texto (PDF corrupto, escaneado o vacío)
+                raise ValueError("No se pudo extraer texto significativo del documento")
+            salida = os.path.join(dirs["salida"], f"{os.path.splitext(nombre)[0]}_analisis.json")
+            _write_json(salida, resultado)
+            os.replace(ruta, os.path.join(dirs["procesados"], nombre))
+            logger.info(f"✅ [{worker_id}] {nombre} en {time.time() - inicio:.1f}s → {salida}")
+            eventos.put(("fin", unico, True))
+        except Exception as e:
+            logger.error(f"❌ [{worker_id}] Error en {nombre}: {e}")
+            try:
+                os.replace(ruta, os.path.join(dirs["fallidos"], nombre))
+                with open(os.path.join(dirs["fallidos"], f"{nombre}.error.txt"), "w", encoding="utf-8") as f:
+                    f.write(f"{type(e).__name__}: {e}\n")
+            except OSError as mover:
+                logger.error(f"❌ [{worker_id}] No se pudo mover {nombre} a fallidos: {mover}")
+            eventos.put(("fin", unico, False))
+
+
+# --- Demonio ---
+
+class WatchFolderDaemon:
+    """
+    Vigila una carpeta de entrada y analiza cada PDF/DOCX que aparece en ella con un
+    pool fijo de procesos worker que cargan el modelo una sola vez.
+
+    - Antirrebote: un archivo se encola solo cuando su tamaño y fecha de modificación
+      no cambian durante 'debounce_seconds' (las copias a medio escribir esperan).
+    - Contrapresión: la cola hacia los workers tiene a lo sumo 'queue_size' archivos.
+      Si está llena, los archivos listos se quedan en la carpeta de entrada hasta que
+      haya lugar; nunca se crean procesos adicionales.
+    - Cada archivo encolado se mueve a '.en_proceso/' con un nombre único (un rename en
+      el mismo sistema de archivos) y al terminar, con su nombre original, a la carpeta
+      de procesados o de fallidos. Un archivo que llega con el nombre de otro que aún
+      está en cola o en análisis espera en la entrada a que ese termine.
+    - Contadores (en cola, procesando, completados, fallidos, ritmo por minuto) en
+      status() y en un archivo JSON que se reescribe periódicamente.
+    """
+
+    def __init__(self, input_dir: Optional[str] = None, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, debounce_seconds: Optional[float] = None,
+                 usar_inotify: bool = True):
+        config = get_section("watch")
+        self.input_dir = input_dir or resolve_path(config.get("input_dir", "inbox"))
+        self.dirs = {
+            "en_proceso": os.path.join(self.input_dir, IN_PROGRESS_DIR),
+            "procesados": resolve_path(config.get("done_dir", "inbox_procesados")),
+            "fallidos": resolve_path(config.get("failed_dir", "inbox_fallidos")),
+            "salida": resolve_path(config.get("output_dir", "outputs")),
+        }
+        self.status_path = resolve_path(config.get("status_file", "outputs/watch_estado.json"))
+        self.workers = workers or int(config.get("workers") or os.cpu_count() or 1)
+        self.queue_size = queue_size or int(config.get("queue_size", 32))
+        self.debounce = float(config.get("debounce_seconds", 2.0) if debounce_seconds is None else debounce_seconds)
+        self.poll_interval = float(config.get("poll_interval", 1.0))
+        # Con inotify, cada tanto se lista toda la carpeta igualmente: cubre eventos que no
+        # llegan (montajes de red no detectados, archivos copiados mientras el demonio arrancaba)
+        self.rescan_interval = float(config.get("rescan_seconds", 30.0))
+        self.usar_inotify = usar_inotify and bool(config.get("inotify", True))
+
+        # Archivos vistos en la entrada: nombre -> (tamaño, mtime, instante del último cambio)
+        self._pendientes: Dict[str, Tuple[int, float, float]] = {}
+        # Nombres únicos en '.en_proceso/' (ver _unique_name)
+        self._en_cola: Set[str] = set()
+        self._procesando: Set[str] = set()
+        self._completados = 0
+        self._fallidos = 0
+        self._terminados: Deque[float] = deque()
+        self._inicio = time.time()
+        self._modo: Optional[str] = None
+        self._detener = False
+
+    # --- Contadores ---
+
+    def status(self) -> Dict[str, object]:
+        ahora = time.time()
+        while self._terminados and ahora - self._terminados[0] > RATE_WINDOW:
+            self._terminados.popleft()
+        ventana = min(RATE_WINDOW, max(ahora - self._inicio, 1e-9))
+        return {
+            "modo": self._modo,
+            "workers": self.workers,
+            "capacidad_cola": self.queue_size,
+            "en_espera": len(self._pendientes),
+            "en_cola": len(self._en_cola),
+            "procesando": len(self._procesando),
+            "completados": self._completados,
+            "fallidos": self._fallidos,
+            "por_minuto": round(len(self._terminados) * 60.0 / ventana, 2),
+            "actualizado_en": ahora,
+        }
+
+    def _write_status(self):
+        os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+        _write_json(self.status_path, self.status())
+
+    # --- Carpeta de entrada ---
+
+    def _is_candidate(self, nombre: str) -> bool:
+        from analyzer.extractor import SUPPORTED_EXTENSIONS
+        # Los temporales de rsync, scp o editores suelen empezar por '.' o terminar distinto
+        return not nombre.startswith(".") and nombre.lower().endswith(SUPPORTED_EXTENSIONS)
+
+    def _scan(self) -> Set[str]:
+        with os.scandir(self.input_dir) as entradas:
+            return {e.name for e in entradas if e.is_file(follow_symlinks=False) and self._is_candidate(e.name)}
+
+    def _observe(self, nombres: Set[str], ahora: float):
+        """Registra cambios de tamaño/mtime; un cambio reinicia el antirrebote."""
+        for nombre in nombres:
+            if not self._is_candidate(nombre):
+                continue
+            try:
+                info = os.stat(os.path.join(self.input_dir, nombre))
+            except FileNotFoundError:
+                self._pendientes.pop(nombre, None)
+                continue
+            previo = self._pendientes.get(nombre)
+            if previo is None or previo[:2] != (info.st_size, info.st_mtime):
+                self._pendientes[nombre] = (info.st_size, info.st_mtime, ahora)
+
+    def _dispatch(self, trabajos: "multiprocessing.Queue", ahora: float):
+        """
+        Envía a los workers los archivos estables, hasta llenar la cola. Un archivo con el
+        nombre de otro que sigue en cola o en análisis se queda pendiente hasta que termine.
+        """
+        en_vuelo = {_original_name(unico) for unico in self._en_cola | self._procesando}
+        listos = sorted(
+            (visto, nombre) for nombre, (_, _, visto) in self._pendientes.items() if ahora - visto >= self.debounce
+        )
+        for _, nombre in listos:
+            if len(self._en_cola) >= self.queue_size:
+                return  # contrapresión: el resto espera en la carpeta de entrada
+            if nombre in en_vuelo:
+                continue
+            unico = _unique_name(nombre)
+            try:
+                os.replace(os.path.join(self.input_dir, nombre), os.path.join(self.dirs["en_proceso"], unico))
+            except FileNotFoundError:
+                self._pendientes.pop(nombre, None)
+                continue
+            del self._pendientes[nombre]
+            self._en_cola.add(unico)
+            trabajos.put(unico)
+
+    def _drain_events(self, eventos: "multiprocessing.Queue"):
+        while True:
+            try:
+                evento = eventos.get_nowait()
+            except queue.Empty:
+                return
+            nombre = evento[1]
+            if evento[0] == "inicio":
+                self._en_cola.discard(nombre)
+                self._procesando.add(nombre)
+            else:
+                self._procesando.discard(nombre)
+                self._terminados.append(time.time())
+                if evento[2]:
+                    self._completados += 1
+                else:
+                    self._fallidos += 1
+
+    # --- Ciclo principal ---
+
+    def _recover(self):
+        """
+        Devuelve a la entrada, con su nombre original, los archivos que quedaron en proceso
+        en una ejecución anterior. Si mientras tanto llegó a la entrada otro archivo con ese
+        nombre, no se pisa: el recuperado conserva su nombre único.
+        """
+        for unico in os.listdir(self.dirs["en_proceso"]):
+            nombre = _original_name(unico)
+            if os.path.exists(os.path.join(self.input_dir, nombre)):
+                nombre = unico
+            os.replace(os.path.join(self.dirs["en_proceso"], unico), os.path.join(self.input_dir, nombre))
+            logger.info(f"↩️ {nombre} quedó a medio procesar; se vuelve a encolar")
+
+    def stop(self, *_):
+        self._detener = True
+
+    def run(self, status_interval: float = 5.0):
+        for directorio in (self.input_dir, *self.dirs.values()):
+            os.makedirs(directorio, exist_ok=True)
+        self._recover()
+
+        # Con 'fork', precargar el modelo en el padre lo comparte con los workers
+        if get_section("queue").get("preload_model", True) and multiprocessing.get_start_method() == "fork":
+            from service.prefork import preload
+            preload()
+
+        trabajos: multiprocessing.Queue = multiprocessing.Queue()
+        eventos: multiprocessing.Queue = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=_worker_loop, args=(trabajos, eventos, self.dirs, f"watch-{i}"))
+            for i in range(self.workers)
+        ]
+        for proceso in procesos:
+            proceso.start()
+
+        watcher = _open_watcher(self.input_dir, self.poll_interval, self.usar_inotify)
+        self._modo = watcher.modo
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"👀 Vigilando {self.input_dir} ({watcher.modo}) con {self.workers} workers y cola de {self.queue_size}")
+
+        ultimo_estado = 0.0
+        ultimo_listado = 0.0
+        cambios: Optional[Set[str]] = None  # None: listar toda la carpeta
+        try:
+            while not self._detener:
+                ahora = time.time()
+                if cambios is None or ahora - ultimo_listado >= self.rescan_interval:
+                    cambios = None
+                    ultimo_listado = ahora
+                self._observe(self._scan() if cambios is None else cambios, ahora)
+                # Los archivos en antirrebote se vuelven a comprobar aunque no lleguen eventos
+                self._observe(set(self._pendientes), ahora)
+                self._drain_events(eventos)
+                self._dispatch(trabajos, ahora)
+
+                if ahora - ultimo_estado >= status_interval:
+                    self._write_status()
+                    ultimo_estado = ahora
+                espera = min(self.debounce / 2, self.poll_interval) if self._pendientes else self.poll_interval
+                cambios = watcher.wait(espera)
+        finally:
+            watcher.close()
+            logger.info("🛑 Deteniendo: se terminan los archivos ya encolados")
+            for _ in procesos:
+                trabajos.put(None)
+            for proceso in procesos:
+                proceso.join()
+            self._drain_events(eventos)
+            self._write_status()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Analiza las sentencias que llegan a una carpeta vigilada.")
+    parser.add_argument("--input", default=None, help="Carpeta de entrada (sección 'watch').")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos worker.")
+    parser.add_argument("--queue-size", type=int, default=None, help="Archivos encolados como máximo.")
+    parser.add_argument("--debounce", type=float, default=None, help="Segundos sin cambios antes de procesar un archivo.")
+    parser.add_argument("--poll", action="store_true", help="Usar sondeo en lugar de inotify.")
+    args = parser.parse_args()
+
+    WatchFolderDaemon(args.input, args.workers, args.queue_size, args.debounce, usar_inotify=not args.poll).run()
@@ -0,0 +1,136 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Union
+
+# Plegado de acentos del español carácter a carácter (la 'ñ' se conserva): al no cambiar
+# la longitud del texto, las posiciones del texto plegado coinciden con las originales.
+_ACCENT_FOLD = str.maketrans("áéíóúüàèìòùÁÉÍÓÚÜÀÈÌÒÙ", "aeiouuaeiouAEIOUUAEIOU")
+
+_NON_SPACE_RE = re.compile(r"\S+")
+
+
+def collapse_whitespace(text: str) -> str:
+    """Une cualquier secuencia de espacios en blanco en un solo espacio y recorta los extremos."""
+    return " ".join(text.split())
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas y sin tildes (la 'ñ' se conserva), con la misma longitud que el texto."""
+    return text.lower().translate(_ACCENT_FOLD)
+
+
+class SentenciaDocument:
+    """
+    Texto de una sentencia (o de una de sus secciones) con sus vistas normalizadas,
+    calculadas la primera vez que se piden y reutilizadas por todas las etapas del
+    análisis:
+
+      - lower:           minúsculas, alineada 1:1 con el texto original.
+      - collapsed:       espacios en blanco colapsados (mayúsculas originales).
+      - collapsed_lower: espacios colapsados y minúsculas.
+
+    Las vistas colapsadas comparten un mapa de posiciones con el texto original:
+    to_raw_offset y to_collapsed_offset convierten posiciones entre ambos, y
+    collapsed_span da un fragmento del original (p. ej. una oración o una entidad de
+    spaCy) ya colapsado, sin volver a normalizarlo.
+    """
+
+    __slots__ = ("raw", "_lower", "_collapsed", "_collapsed_lower", "_collapsed_starts", "_raw_starts", "_raw_ends")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self._lower: Optional[str] = None
+        self._collapsed: Optional[str] = None
+        self._collapsed_lower: Optional[str] = None
+        # Inicio de cada palabra en la vista colapsada, y su inicio y fin en el texto original
+        self._collapsed_starts: Optional[List[int]] = None
+        self._raw_starts: Optional[List[int]] = None
+        self._raw_ends: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __str__(self) -> str:
+        return self.raw
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            lower = self.raw.lower()
+            if len(lower) != len(self.raw):
+                # Algunos caracteres (p. ej. 'İ') se expanden al pasar a minúsculas; se dejan
+                # como están para conservar la alineación con el original.
+                lower = "".join(c if len(c.lower()) != 1 else c.lower() for c in self.raw)
+            self._lower = lower
+        return self._lower
+
+    @property
+    def collapsed(self) -> str:
+        if self._collapsed is None:
+            self._build_collapsed()
+        return self._collapsed
+
+    @property
+    def collapsed_lower(self) -> str:
+        if self._collapsed_lower is None:
+            # Se parte de la vista en minúsculas (alineada), así comparte el mapa de posiciones
+            self._collapsed_lower = " ".join(self.lower.split())
+        return self._collapsed_lower
+
+    def _build_collapsed(self):
+        partes: List[str] = []
+        collapsed_starts: List[int] = []
+        raw_starts: List[int] = []
+        raw_ends: List[int] = []
+        posicion = 0
+        for match in _NON_SPACE_RE.finditer(self.raw):
+            if partes:
+                posicion += 1  # el espacio que separa las palabras
+            collapsed_starts.append(posicion)
+            raw_starts.append(match.start())
+            raw_ends.append(match.end())
+            partes.append(match.group())
+            posicion += match.end() - match.start()
+        self._collapsed = " ".join(partes)
+        self._collapsed_starts = collapsed_starts
+        self._raw_starts = raw_starts
+        self._raw_ends = raw_ends
+
+    def to_raw_offset(self, collapsed_offset: int) -> int:
+        """
+        Convierte una posición de la vista colapsada (o colapsada en minúsculas) en la
+        posición equivalente del texto original.
+        """
+        if self._collapsed_starts is None:
+            self._build_collapsed()
+        i = bisect_right(self._collapsed_starts, collapsed_offset) - 1
+        if i < 0:
+            return collapsed_offset
+        desplazamiento = collapsed_offset - self._collapsed_starts[i]
+        return self._raw_starts[i] + desplazamiento
+
+    def to_collapsed_offset(self, raw_offset: int) -> int:
+        """
+        Convierte una posición del texto original en la de la vista colapsada; una
+        posición dentro de un tramo de espacios va al espacio que lo reemplaza.
+        """
+        if self._raw_starts is None:
+            self._build_collapsed()
+        i = bisect_right(self._raw_starts, raw_offset) - 1
+        if i < 0:
+            return 0
+        desplazamiento = min(raw_offset, self._raw_ends[i]) - self._raw_starts[i]
+        return self._collapsed_starts[i] + desplazamiento
+
+    def collapsed_span(self, inicio: int, fin: int, lower: bool = False) -> str:
+        """
+        El fragmento raw[inicio:fin] con los espacios colapsados (en minúsculas si 'lower'),
+        igual que collapse_whitespace sobre el fragmento pero leído de la vista ya calculada.
+        """
+        vista = self.collapsed_lower if lower else self.collapsed
+        return vista[self.to_collapsed_offset(inicio):self.to_collapsed_offset(fin)].strip()
+
+
+def as_document(text: Union[str, SentenciaDocument]) -> SentenciaDocument:
+    """Retorna el documento tal cual o envuelve un texto plano."""
+    return text if isinstance(text, SentenciaDocument) else SentenciaDocument(text)
@@ -0,0 +1,157 @@
+import re
+import random
+import struct
+import hashlib
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from utils.document import collapse_whitespace
+
+# Primo de Mersenne 2^61 - 1: módulo de las permutaciones universales (a*x + b) mod p.
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Shingles por bloque al calcular una firma: acota la matriz temporal num_perm x bloque
+_SIGNATURE_CHUNK = 8192
+
+Signature = Tuple[int, ...]
+
+
+def _hash_token(token: str) -> int:
+    """Hash estable de 32 bits (no depende de PYTHONHASHSEED, a diferencia de hash())."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def shingles(text: str, k: int = 5, unit: str = "char") -> Set[int]:
+    """
+    Convierte un texto en su conjunto de 'shingles' (k-gramas) hasheados.
+
+    El texto se normaliza antes (minúsculas, espacios colapsados) para que las diferencias
+    de formato de pdfplumber no cuenten como diferencias de contenido.
+
+    Args:
+        text: El texto de entrada.
+        k: Tamaño del k-grama.
+        unit: 'char' para k-gramas de caracteres (oraciones) o 'word' para
+              k-gramas de palabras (documentos completos).
+
+    Returns:
+        Un conjunto de enteros de 32 bits.
+    """
+    normalized = collapse_whitespace(text).lower()
+
+    if unit == "word":
+        tokens = re.findall(r"\w+", normalized)
+        if len(tokens) <= k:
+            return {_hash_token(" ".join(tokens))} if tokens else set()
+        return {_hash_token(" ".join(tokens[i:i + k])) for i in range(len(tokens) - k + 1)}
+
+    if len(normalized) <= k:
+        return {_hash_token(normalized)} if normalized else set()
+    return {_hash_token(normalized[i:i + k]) for i in range(len(normalized) - k + 1)}
+
+
+class MinHasher:
+    """
+    Calcula firmas MinHash de tamaño fijo cuya coincidencia por posición estima
+    la similitud de Jaccard entre los conjuntos de shingles.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        a = np.array([a for a, _ in self._perms], dtype=np.uint64)[:, None]
+        self._a_alto, self._a_bajo = a >> np.uint64(32), a & np.uint64(_MAX_HASH)
+        self._b = np.array([b for _, b in self._perms], dtype=np.uint64)[:, None]
+
+    def signature(self, shingle_set: Iterable[int]) -> Signature:
+        """
+        Args:
+            shingle_set: Conjunto de shingles hasheados (ver shingles()).
+
+        Returns:
+            Una tupla de num_perm enteros. Un conjunto vacío produce la firma máxima.
+        """
+        values = np.fromiter(shingle_set, dtype=np.uint64)
+        minimos = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for inicio in range(0, len(values), _SIGNATURE_CHUNK):
+            hashes = self._permute(values[None, inicio:inicio + _SIGNATURE_CHUNK])
+            np.minimum(minimos, (hashes & np.uint64(_MAX_HASH)).min(axis=1), out=minimos)
+        return tuple(minimos.tolist())
+
+    def _permute(self, x: np.ndarray) -> np.ndarray:
+        """
+        (a*x + b) mod p para todas las permutaciones, exacto en uint64: a*x no cabe en 64
+        bits, así que a se parte en a_alto*2^32 + a_bajo y se reduce con 2^61 ≡ 1 (mod p).
+        """
+        p = np.uint64(_MERSENNE_PRIME)
+        alto = self._a_alto * x  # < 2^61; alto * 2^32 ≡ (alto >> 29) + ((alto mod 2^29) << 32)
+        total = (alto >> np.uint64(29)) + ((alto & np.uint64((1 << 29) - 1)) << np.uint64(32))
+        bajo = self._a_bajo * x  # < 2^64
+        total += (bajo & p) + (bajo >> np.uint64(61)) + self._b  # < 4p: no desborda
+        total = (total & p) + (total >> np.uint64(61))
+        return np.where(total >= p, total - p, total)
+
+
+def estimate_jaccard(sig_a: Signature, sig_b: Signature) -> float:
+    """Estima la similitud de Jaccard como la fracción de posiciones iguales de dos firmas."""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def band_keys(signature: Signature, bands: int) -> List[Tuple[int, int]]:
+    """
+    Divide la firma en 'bands' bandas y retorna (banda, cubeta) para cada una.
+
+    Dos firmas son candidatas si coinciden en al menos una cubeta de la misma banda:
+    así se evita comparar todos contra todos.
+    """
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(struct.pack(f"<{rows}I", *chunk), digest_size=8).digest()
+        # SQLite solo almacena enteros con signo de 64 bits
+        keys.append((band, int.from_bytes(digest, "little", signed=True)))
+    return keys
+
+
+class LSHIndex:
+    """
+    Índice LSH en memoria sobre firmas MinHash.
+
+    Con b bandas de r filas, el umbral aproximado a partir del cual dos textos se vuelven
+    candidatos es (1/b)^(1/r). Los candidatos se verifican después con estimate_jaccard.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.bands = bands
+        self._buckets: Dict[Tuple[int, int], List[Hashable]] = {}
+        self._signatures: Dict[Hashable, Signature] = {}
+
+    def add(self, key: Hashable, signature: Signature):
+        self._signatures[key] = signature
+        for band_key in band_keys(signature, self.bands):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def query(self, signature: Signature, threshold: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """
+        Retorna las claves candidatas con similitud estimada >= threshold,
+        ordenadas de mayor a menor similitud.
+        """
+        candidates: Set[Hashable] = set()
+        for band_key in band_keys(signature, self.bands):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        scored = [(key, estimate_jaccard(signature, self._signatures[key])) for key in candidates]
+        return sorted([item for item in scored if item[1] >= threshold], key=lambda item: item[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
@@ -0,0 +1,89 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+# Número de líneas no vacías al inicio y al final de cada página donde se buscan
+# encabezados y pies de página repetidos.
+EDGE_LINES = 5
+
+# Fracción mínima de páginas en cuyo borde debe aparecer una línea para considerarla
+# repetida (encabezado corrido, número de página, pie institucional...).
+MIN_PAGE_RATIO = 0.5
+
+# Con menos páginas no hay evidencia suficiente para distinguir un encabezado de texto real.
+MIN_PAGES = 3
+
+_DIGITS_RE = re.compile(r"\d+")
+
+# Claves de los números de página ('#', 'página # de #', 'pág. #', '# / #'): no se
+# conservan en la copia del encabezado que queda al inicio del documento.
+_PAGE_NUMBER_KEY_RE = re.compile(r"^(?:p[aá]g(?:ina)?\.?\s*)?#(?:\s*(?:de|/)\s*#)?$")
+
+
+def _line_key(line: str) -> str:
+    """Clave de comparación de una línea: espacios colapsados, minúsculas y números
+    reemplazados por '#' (así '2', '3', ... o 'Página 4 de 20' cuentan como la misma línea)."""
+    return _DIGITS_RE.sub("#", " ".join(line.split())).lower()
+
+
+def strip_repeated_page_lines(
+    pages: Sequence[str], edge_lines: int = EDGE_LINES, min_page_ratio: float = MIN_PAGE_RATIO
+) -> Tuple[List[str], int]:
+    """
+    Elimina las líneas que se repiten en el borde superior o inferior de las páginas,
+    como el encabezado "CUI: ... / NÚMERO INTERNO ... / SEGUNDA INSTANCIA / ..." que
+    pdfplumber deja en medio de las secciones, y los números de página.
+
+    Se quitan todas las apariciones en los bordes, también la primera: una copia dejada
+    en su lugar quedaría en medio de una sección. Como de ahí se leen metadatos como el
+    CUI o el número interno, una sola copia de las líneas repetidas (sin los números de
+    página), en el orden en que aparecen por primera vez, se antepone a la primera
+    página. El costo es lineal en el tamaño del texto: una pasada para contar las claves
+    de los bordes y otra para filtrarlas.
+
+    Args:
+        pages: El texto de cada página, en orden.
+        edge_lines: Líneas no vacías de cada borde que se examinan.
+        min_page_ratio: Fracción mínima de páginas en que debe aparecer una línea.
+
+    Returns:
+        Una tupla (páginas sin las líneas repetidas, número de caracteres eliminados).
+    """
+    if len(pages) < MIN_PAGES:
+        return list(pages), 0
+
+    lineas_por_pagina = [pagina.split("\n") for pagina in pages]
+    bordes: List[Dict[int, str]] = []
+    conteo: Counter = Counter()
+
+    for lineas in lineas_por_pagina:
+        no_vacias = [i for i, linea in enumerate(lineas) if linea.strip()]
+        indices = set(no_vacias[:edge_lines]) | set(no_vacias[-edge_lines:])
+        claves = {i: _line_key(lineas[i]) for i in indices}
+        conteo.update(set(claves.values()))
+        bordes.append(claves)
+
+    minimo = max(2, math.ceil(min_page_ratio * len(pages)))
+    repetidas = {clave for clave, veces in conteo.items() if veces >= minimo}
+    if not repetidas:
+        return list(pages), 0
+
+    resultado: List[str] = []
+    encabezado: Dict[str, str] = {}  # clave -> primera aparición (el orden de inserción se conserva)
+    eliminados = 0
+    for lineas, claves in zip(lineas_por_pagina, bordes):
+        quitar = {i for i, clave in claves.items() if clave in repetidas}
+        if quitar:
+            for i in sorted(quitar):
+                if not _PAGE_NUMBER_KEY_RE.match(claves[i]):
+                    encabezado.setdefault(claves[i], lineas[i].strip())
+            eliminados += sum(len(lineas[i]) + 1 for i in quitar)
+            lineas = [linea for i, linea in enumerate(lineas) if i not in quitar]
+        resultado.append("\n".join(lineas))
+
+    if encabezado:
+        copia = "\n".join(encabezado.values())
+        resultado[0] = f"{copia}\n{resultado[0]}"
+        eliminados -= len(copia) + 1
+    return resultado, eliminados
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.settings import get_section, resolve_path
+
+# Perfilado bajo demanda de un análisis (main.py --profile, cabecera X-Profile del
+# servidor pre-fork). Este módulo solo se importa cuando se pide un perfil: sin él,
+# el análisis no tiene ningún gancho ni costo adicional.
+#
+# Un hilo muestrea cada 'interval_ms' la pila del hilo perfilado (sys._current_frames)
+# y acumula el tiempo transcurrido desde la muestra anterior en esa pila. Los marcos
+# de AnalysisRun.get se etiquetan con la etapa que calculan ('etapa:segment', ...), de
+# modo que el tiempo de clean_text, segment_sections, spaCy o cada extractor de reglas
+# queda bajo la etapa que lo pidió.
+#
+# Las funciones en C (una búsqueda de re, los componentes de spaCy en Cython) no tienen
+# marco propio: su tiempo se atribuye a la función de Python que las llamó.
+
+
+def default_profile_dir() -> str:
+    """Directorio de los perfiles según 'config.json' (sección 'profiling')."""
+    return resolve_path(get_section("profiling").get("dir", "outputs/profiles"))
+
+
+def _frame_label(frame: FrameType, stage_code: Any) -> str:
+    code = frame.f_code
+    if code is stage_code:
+        nombre = frame.f_locals.get("name")
+        if isinstance(nombre, str):
+            return f"etapa:{nombre}"
+    archivo = os.path.basename(code.co_filename)
+    # ';' separa los marcos en el formato de pilas colapsadas
+    return f"{code.co_name} ({archivo}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackProfile:
+    """Tiempo (en segundos) acumulado por pila, de la raíz a la hoja."""
+
+    def __init__(self, stacks: Counter, duracion: float, muestras: int):
+        self.stacks = stacks
+        self.duracion = duracion
+        self.muestras = muestras
+
+    def collapsed(self) -> str:
+        """
+        Pilas colapsadas ('raíz;...;hoja <microsegundos>' por línea), el formato que leen
+        flamegraph.pl, speedscope o inferno.
+        """
+        lineas = [f"{';'.join(pila)} {round(segundos * 1e6)}" for pila, segundos in self.stacks.most_common() if pila]
+        return "\n".join(lineas) + "\n"
+
+    def stages(self) -> Dict[str, float]:
+        """Tiempo inclusivo por etapa del análisis (sin contar dos veces etapas anidadas)."""
+        tiempos: Counter = Counter()
+        for pila, segundos in self.stacks.items():
+            etapas = [marco for marco in pila if marco.startswith("etapa:")]
+            if etapas:
+                # La etapa más interna es la que realmente se estaba calculando
+                tiempos[etapas[-1][len("etapa:"):]] += segundos
+        return {etapa: round(segundos, 4) for etapa, segundos in tiempos.most_common()}
+
+    def top(self, n: int = 25) -> List[Dict[str, Any]]:
+        """Funciones con más tiempo propio (en la hoja de la pila), con su tiempo inclusivo."""
+        propio: Counter = Counter()
+        total: Counter = Counter()
+        for pila, segundos in self.stacks.items():
+            if not pila:
+                continue
+            propio[pila[-1]] += segundos
+            for marco in set(pila):
+                total[marco] += segundos
+        return [
+            {"funcion": marco, "propio_ms": round(segundos * 1000, 2), "total_ms": round(total[marco] * 1000, 2)}
+            for marco, segundos in propio.most_common(n)
+        ]
+
+    def summary(self, n: int = 25) -> str:
+        lineas = [f"Duración: {self.duracion * 1000:.1f} ms ({self.muestras} muestras)", "", "Etapas:"]
+        lineas += [f"  {etapa:<16}{segundos * 1000:>10.1f} ms" for etapa, segundos in self.stages().items()]
+        lineas += ["", f"{'propio ms':>10}{'total ms':>10}  función"]
+        lineas += [f"{f['propio_ms']:>10.1f}{f['total_ms']:>10.1f}  {f['funcion']}" for f in self.top(n)]
+        return "\n".join(lineas) + "\n"
+
+    def write(self, nombre: str, directorio: Optional[str] = None, n: int = 25) -> Dict[str, str]:
+        """Escribe '<nombre>.folded' y '<nombre>.txt' (resumen) y retorna sus rutas."""
+        directorio = directorio or default_profile_dir()
+        os.makedirs(directorio, exist_ok=True)
+        rutas = {
+            "folded": os.path.join(directorio, f"{nombre}.folded"),
+            "resumen": os.path.join(directorio, f"{nombre}.txt"),
+        }
+        with open(rutas["folded"], "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(rutas["resumen"], "w", encoding="utf-8") as f:
+            f.write(self.summary(n))
+        return rutas
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float, raiz: FrameType):
+        super().__init__(name="profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.raiz = raiz
+        self.stacks: Counter = Counter()
+        self.muestras = 0
+        self._detener = threading.Event()
+        from analyzer.executor import AnalysisRun
+        self._stage_code = AnalysisRun.get.__code__
+
+    def run(self):
+        anterior = time.perf_counter()
+        while not self._detener.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            ahora = time.perf_counter()
+            if frame is None:
+                continue
+            pila: List[str] = []
+            while frame is not None and frame is not self.raiz:
+                pila.append(_frame_label(frame, self._stage_code))
+                frame = frame.f_back
+            pila.reverse()
+            # Se atribuye a la pila todo el tiempo desde la muestra anterior: si el hilo
+            # perfilado retuvo el GIL (p. ej. dentro de una búsqueda de re), la muestra
+            # llega tarde pero el tiempo no se pierde.
+            self.stacks[tuple(pila)] += ahora - anterior
+            self.muestras += 1
+            anterior = ahora
+
+    def stop(self):
+        self._detener.set()
+        self.join()
+
+
+def profile_call(func: Callable[..., Any], *args, interval_ms: Optional[float] = None, **kwargs) -> Tuple[Any, StackProfile]:
+    """
+    Ejecuta func(*args, **kwargs) mientras se muestrea su pila.
+
+    Args:
+        func: La función a perfilar (p. ej. el análisis de un documento).
+        interval_ms: Intervalo de muestreo (sección 'profiling', por defecto 1 ms).
+
+    Returns:
+        El resultado de func y el perfil de la llamada.
+    """
+    intervalo = (interval_ms or float(get_section("profiling").get("interval_ms", 1.0))) / 1000
+    sampler = _Sampler(threading.get_ident(), intervalo, sys._getframe())
+    inicio = time.perf_counter()
+    sampler.start()
+    try:
+        resultado = func(*args, **kwargs)
+    finally:
+        sampler.stop()
+    return resultado, StackProfile(sampler.stacks, time.perf_counter() - inicio, sampler.muestras)
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Pattern, Tuple
+
+from utils.document import fold_accents
+from utils.settings import get_section, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# Reglas del análisis (patrones de sección, palabras clave de clasificación, hechos y
+# fallo, patrones de normas y términos de entidades a ignorar) en un solo archivo JSON,
+# 'rules.json' en la raíz del proyecto (sección 'rules' de 'config.json').
+
+
+def rules_path() -> str:
+    """Ruta del archivo de reglas según 'config.json' (sección 'rules')."""
+    return resolve_path(get_section("rules").get("path", "rules.json"))
+
+
+class CompiledRules:
+    """
+    Reglas ya compiladas: expresiones regulares, tuplas y conjuntos inmutables que las
+    etapas usan directamente. Una instancia no cambia nunca; al editar el archivo se
+    construye otra y se reemplaza la referencia completa.
+
+    'version' es un hash del contenido normalizado del archivo: dos archivos con las
+    mismas reglas (aunque cambie el formato) tienen la misma versión, y cualquier
+    cambio de una regla la cambia. Sirve como parte de las claves de caché de
+    resultados.
+    """
+
+    __slots__ = (
+        "version", "secciones", "nombres_secciones", "factuales", "procesales",
+        "hechos_terminos", "hechos_peso_entidades", "hechos_descartar_si_contiene",
+        "hechos_descartar_si_empieza", "hechos_longitud_minima", "hechos_maximo",
+        "fallo_bloques", "fallo_decisiones", "normas", "entidades_ignorar",
+        "entidades_ignorar_prefijos", "entidades_codigos", "entidades_longitud_minima",
+        "entidades_patrones", "entidades_tratamientos", "entidades_particulas",
+    )
+
+    def __init__(self, fuente: Dict[str, Any]):
+        canonico = json.dumps(fuente, sort_keys=True, ensure_ascii=False)
+        self.version: str = hashlib.sha256(canonico.encode("utf-8")).hexdigest()[:12]
+
+        # Secciones, en el orden del archivo
+        self.secciones: Tuple[Tuple[str, Pattern], ...] = tuple(
+            (nombre, re.compile(patron, re.IGNORECASE)) for nombre, patron in fuente["secciones"].items()
+        )
+        self.nombres_secciones: Tuple[str, ...] = tuple(nombre for nombre, _ in self.secciones)
+
+        clasificacion = fuente["clasificacion"]
+        self.factuales: Tuple[str, ...] = tuple(clasificacion["factuales"])
+        self.procesales: Tuple[str, ...] = tuple(clasificacion["procesales"])
+
+        hechos = fuente["hechos"]
+        self.hechos_terminos: Tuple[Tuple[FrozenSet[str], int], ...] = tuple(
+            (frozenset(grupo["palabras"]), int(grupo["peso"])) for grupo in hechos["terminos"].values()
+        )
+        self.hechos_peso_entidades: Mapping[str, int] = MappingProxyType(dict(hechos.get("peso_entidades", {})))
+        self.hechos_descartar_si_contiene: Tuple[str, ...] = tuple(hechos.get("descartar_si_contiene", ()))
+        self.hechos_descartar_si_empieza: Tuple[str, ...] = tuple(hechos.get("descartar_si_empieza", ()))
+        self.hechos_longitud_minima: int = int(hechos.get("longitud_minima", 20))
+        self.hechos_maximo: int = int(hechos.get("maximo", 10))
+
+        fallo = fuente["fallo"]
+        self.fallo_bloques: Tuple[Pattern, ...] = tuple(
+            re.compile(patron, re.IGNORECASE | re.DOTALL) for patron in fallo["bloques"]
+        )
+        self.fallo_decisiones: Tuple[Tuple[str, Pattern], ...] = tuple(
+            (clave, re.compile(patron, re.IGNORECASE)) for clave, patron in fallo["decisiones"].items()
+        )
+
+        self.normas: Tuple[Pattern, ...] = tuple(
+            re.compile(patron, re.IGNORECASE | re.DOTALL) for patron in fuente["normas"]["patrones"]
+        )
+
+        entidades = fuente["entidades"]
+        self.entidades_ignorar: FrozenSet[str] = frozenset(t.lower() for t in entidades["ignorar"])
+        self.entidades_ignorar_prefijos: Tuple[str, ...] = tuple(sorted(self.entidades_ignorar))  # para str.startswith
+        self.entidades_codigos: Pattern = re.compile(entidades["codigos"])
+        self.entidades_longitud_minima: int = int(entidades.get("longitud_minima", 3))
+        # Entidades del nivel de análisis sin modelo (nlp.tiers): (etiqueta, patrón). Los
+        # patrones distinguen mayúsculas; si tienen un grupo, la entidad es el grupo 1.
+        self.entidades_patrones: Tuple[Tuple[str, Pattern], ...] = tuple(
+            (etiqueta, re.compile(patron))
+            for etiqueta, patrones in entidades.get("patrones_sin_modelo", {}).items() for patron in patrones
+        )
+        # Resolución de entidades (nlp.entity_resolution): palabras que se quitan al inicio
+        # de una mención ('el procesado', 'doctora') y partículas de los nombres ('de', 'del').
+        # Se guardan sin tildes y en minúsculas, como los tokens con que se comparan.
+        resolucion = entidades.get("resolucion", {})
+        self.entidades_tratamientos: FrozenSet[str] = frozenset(fold_accents(t) for t in resolucion.get("tratamientos", ()))
+        self.entidades_particulas: FrozenSet[str] = frozenset(fold_accents(t) for t in resolucion.get("particulas", ()))
+
+
+def load_rules(path: Optional[str] = None) -> CompiledRules:
+    """
+    Lee y compila un archivo de reglas.
+
+    Raises:
+        OSError, ValueError (JSON inválido), KeyError (falta una sección) o re.error.
+    """
+    with open(path or rules_path(), "r", encoding="utf-8") as f:
+        return CompiledRules(json.load(f))
+
+
+# --- Reglas vigentes del proceso, con recarga en caliente ---
+
+_lock = threading.Lock()
+_vigentes: Optional[CompiledRules] = None
+_estado_archivo: Optional[Tuple[int, int, int]] = None  # (inodo, tamaño, mtime_ns)
+_proxima_revision = 0.0
+
+
+def get_rules() -> CompiledRules:
+    """
+    Retorna las reglas vigentes del proceso.
+
+    Las reglas se compilan una sola vez; como mucho cada 'rules.check_interval_seconds'
+    (por defecto 2 s) se hace un stat del archivo, y solo si cambió se compila el
+    nuevo conjunto y se reemplaza la referencia (una asignación atómica: una petición
+    en curso conserva el conjunto que ya tomó). Si el archivo editado no es válido se
+    registra el error y siguen vigentes las reglas anteriores.
+    """
+    global _proxima_revision
+    ahora = time.monotonic()
+    if _vigentes is not None and ahora < _proxima_revision:
+        return _vigentes
+    with _lock:
+        if _vigentes is None or ahora >= _proxima_revision:
+            _proxima_revision = ahora + float(get_section("rules").get("check_interval_seconds", 2.0))
+            _reload_if_changed()
+    return _vigentes
+
+
+def _reload_if_changed():
+    global _vigentes, _estado_archivo
+    ruta = rules_path()
+    try:
+        info = os.stat(ruta)
+    except OSError as e:
+        if _vigentes is None:
+            raise
+        logger.error(f"❌ No se pudo leer el archivo de reglas {ruta}: {e}; se mantienen las reglas {_vigentes.version}")
+        return
+
+    estado = (info.st_ino, info.st_size, info.st_mtime_ns)
+    if estado == _estado_archivo:
+        return
+    _estado_archivo = estado
+
+    try:
+        nuevas = load_rules(ruta)
+    except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+        if _vigentes is None:
+            raise
+        logger.error(f"❌ Reglas inválidas en {ruta}: {e}; se mantienen las reglas {_vigentes.version}")
+        return
+
+    if _vigentes is not None and nuevas.version != _vigentes.version:
+        logger.info(f"🔁 Reglas recargadas: {_vigentes.version} → {nuevas.version}")
+    _vigentes = nuevas
@@ -1,27 +1,12 @@
-import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
-# Diccionario de patrones para identificar las secciones clave por sus encabezados específicos.
-# Se usarán números romanos exactos para asegurar la segmentación correcta de las principales secciones.
-SECTION_PATTERNS = {
-    # Coincide con "I. ASUNTO"
-    "asunto": r"\bI\.\s*asunto\b",
-    # Coincide con "II. ACTUACIÓN PROCESAL RELEVANTE" (considerado el antecedente principal)
-    "actuacion_procesal_relevante": r"\bII\.\s*actuación\s+procesal\s+relevante\b",
-    # Coincide con "III. DECISIÓN IMPUGNADA"
-    "decision_impugnada": r"\bIII\.\s*decisión\s+impugnada\b",
-    # Coincide con "IV. SUSTENTACIÓN DEL RECURSO"
-    "sustentacion_recurso": r"\bIV\.\s*sustentación\s+del\s+recurso\b",
-    # Coincide con "V. PRONUNCIAMIENTO DE NO RECURRENTES"
-    "pronunciamiento_no_recurrentes": r"\bV\.\s*pronunciamiento\s+de\s+no\s+recurrentes\b",
-    # Coincide con "VI. CONSIDERACIONES DE LA CORTE"
-    "consideraciones": r"\bVI\.\s*consideraciones\s+de\s+la\s+corte\b",
-    # El "fallo" real en este documento es la sección que comienza con "RESUELVE:",
-    # la cual aparece al final del documento.
-    "fallo": r"\bresuelve:\b"
-}
+from utils.document import SentenciaDocument, as_document
+from utils.rules import CompiledRules, get_rules
 
-def segment_sections(text: str) -> Dict[str, str]:
+# Los patrones de los encabezados de sección (números romanos exactos, p. ej. "I. ASUNTO",
+# y "RESUELVE:" para el fallo) están en 'rules.json', sección 'secciones'.
+
+def segment_sections(text: Union[str, SentenciaDocument], rules: Optional[CompiledRules] = None) -> Dict[str, str]:
     """
     Intenta dividir el texto completo de una sentencia en secciones clave
     basándose en patrones comunes de encabezados, incluyendo numeración romana.
@@ -30,7 +15,9 @@ def segment_sections(text: str) -> Dict[str, str]:
     bajo la clave 'full_text'. Las secciones se extraen incluyendo su encabezado.
 
     Args:
-        text: El texto completo de la sentencia.
+        text: El texto completo de la sentencia (o su SentenciaDocument, cuya vista en
+              minúsculas se reutiliza).
+        rules: Reglas compiladas a usar (por defecto, las vigentes).
 
     Returns:
         Un diccionario donde las claves son los nombres de las secciones
@@ -38,19 +25,21 @@ def segment_sections(text: str) -> Dict[str, str]:
         de esas secciones como strings.
     """
     # Convertimos todo el texto a minúsculas para realizar la búsqueda de patrones
-    # y usamos re.IGNORECASE para que los patrones definidos aquí coincidan
+    # y usamos re.IGNORECASE para que los patrones de 'rules.json' coincidan
     # sin importar las mayúsculas/minúsculas en el texto original.
-    text_lower = text.lower() 
+    documento = as_document(text)
+    text = documento.raw
+    text_lower = documento.lower
 
     sections: Dict[str, str] = {}
     
     # Lista para almacenar las secciones encontradas junto con su índice de inicio
     found_sections: List[Tuple[str, int]] = []
     
-    # Iterar sobre cada patrón de sección definido
-    for section_name, pattern_str in SECTION_PATTERNS.items():
+    # Iterar sobre cada patrón de sección definido (ya compilado, con re.IGNORECASE)
+    for section_name, pattern in (rules or get_rules()).secciones:
         # Buscar la primera ocurrencia del patrón en el texto en minúsculas
-        match = re.search(pattern_str, text_lower, re.IGNORECASE)
+        match = pattern.search(text_lower)
         if match:
             # Si se encuentra una coincidencia, añadir el nombre de la sección
             # y su índice de inicio a la lista.
@@ -0,0 +1,49 @@
+import os
+import json
+from typing import Dict, Any, Optional
+
+# Ruta del archivo de configuración compartido con main.py ('config.json' en la raíz del proyecto).
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "config.json")
+
+_settings: Optional[Dict[str, Any]] = None
+
+def load_settings() -> Dict[str, Any]:
+    """
+    Carga (una sola vez por proceso) la configuración desde 'config.json'.
+
+    A diferencia de main.load_config, no termina el proceso si el archivo no existe:
+    los servicios de larga duración deben poder arrancar con valores por defecto.
+
+    Returns:
+        Un diccionario con la configuración cargada (vacío si no hay archivo).
+    """
+    global _settings
+
+    if _settings is None:
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                _settings = json.load(f)
+        else:
+            _settings = {}
+
+    return _settings
+
+def get_section(name: str) -> Dict[str, Any]:
+    """
+    Retorna una sección de la configuración (ej. 'queue') o un diccionario vacío.
+
+    Args:
+        name: El nombre de la sección en 'config.json'.
+
+    Returns:
+        El diccionario de la sección solicitada.
+    """
+    section = load_settings().get(name, {})
+    return section if isinstance(section, dict) else {}
+
+def resolve_path(path: str) -> str:
+    """Convierte una ruta relativa de la configuración en absoluta respecto a la raíz del proyecto."""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(PROJECT_ROOT, path)
@@ -1,5 +1,4 @@
 import re
-from typing import str
 
 def clean_text(text: str) -> str:
     """
@@ -21,7 +20,9 @@ def clean_text(text: str) -> str:
         La cadena de texto limpia y normalizada.
     """
     # 1. Unificar múltiples espacios en un solo espacio
-    text = re.sub(r'\s+', ' ', text)
+    #    Solo espacios horizontales: los saltos de línea se normalizan en el paso 2
+    #    y los necesitan patrones como el del magistrado ponente.
+    text = re.sub(r'[^\S\n]+', ' ', text)
 
     # 2. Normalizar múltiples saltos de línea a un solo salto de línea
     #    Primero, nos aseguramos de que los saltos de línea no estén precedidos/seguidos por espacios extras,
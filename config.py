@@ -6,11 +6,12 @@ DOCS_DIR = os.path.join(BASE_DIR, "..", "docs")
 OUTPUT_DIR = os.path.join(BASE_DIR, "..", "outputs")
 
 # === Modelo de spaCy ===
-SPACY_MODEL = "es_core_news_md"
+# El modelo y sus componentes los elige el nivel de análisis: sección 'tiers' de
+# 'config.json' (reglas, rapido, estandar, preciso; ver backend/nlp/tiers.py).
 
 # === Configuraciones NLP ===
-MIN_ENT_LEN = 4  # Longitud mínima para entidades válidas
-BLACKLIST_ENTITIES = ["ley", "artículo", "norma", "sentencia"]
+# La longitud mínima y los términos a ignorar de las entidades están en 'rules.json'
+# (sección 'entidades'), junto con el resto de reglas del análisis.
 
 # === Parámetros de análisis ===
 MAX_RESUMEN_FALLO = 5